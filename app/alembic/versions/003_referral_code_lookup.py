@@ -0,0 +1,46 @@
+"""referral_code code index and expires_at
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # колонка без значения по умолчанию добавляется без перезаписи
+    # таблицы; у существующих кодов (JWT) срок задан в самом коде
+    op.add_column(
+        "referral_code",
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # CREATE INDEX CONCURRENTLY не выполняется внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_referral_code_code",
+            "referral_code",
+            ["code"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_referral_code_code",
+            table_name="referral_code",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("referral_code", "expires_at")
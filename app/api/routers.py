@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
+from app.api.v1.admin import admin_router
 from app.api.v1.auth import router as auth_router
+from app.api.v1.monitoring import monitoring_router
 from app.api.v1.referral import referral_router
 from app.config import settings
 
@@ -17,3 +19,15 @@ v1.include_router(
     prefix="/auth",
     tags=["Authorization"],
 )
+
+v1.include_router(
+    monitoring_router,
+    prefix="/monitoring",
+    tags=["Monitoring"],
+)
+
+v1.include_router(
+    admin_router,
+    prefix="/admin",
+    tags=["Administration"],
+)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, UploadFile, status
+
+from app.schemas.user_import import ImportFormatQuery, UserImportJobDTO
+from app.services.auth import admin_user
+from app.services.user_import import user_import_jobs
+
+admin_router = APIRouter(dependencies=[Depends(admin_user)])
+
+
+@admin_router.post(
+    "/users/import",
+    summary="Массовый импорт пользователей из файла (фоновая задача)",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def import_users(
+    file: UploadFile, file_format: ImportFormatQuery = "csv"
+) -> UserImportJobDTO:
+    return await user_import_jobs.start(file, file_format)
+
+
+@admin_router.get(
+    "/users/import/{job_id}", summary="Ход задачи импорта пользователей"
+)
+async def get_import_job(job_id: str) -> UserImportJobDTO:
+    return await user_import_jobs.get(job_id)
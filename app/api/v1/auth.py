@@ -1,50 +1,58 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.exceptions import (
-    AuthorizationErrorException,
-    ReferralCodeNotFoundException,
+from app.common.exceptions import AuthorizationErrorException
+from app.database import get_async_session
+from app.schemas.auth import (
+    Token,
+    UserCreateDTO,
+    UserPrincipalDTO,
+    UserReadDTO,
 )
-from app.logger import logger
-from app.models.user import User
-from app.schemas.auth import Token, UserCreateDTO, UserReadDTO
 from app.schemas.referral_code import ReferralCodeQuery
-from app.services.auth import AuthService, current_user
-from app.services.referral_code import ReferralCodeService
+from app.services.auth import AuthService, current_user, oauth2_scheme
+from app.services.login_throttle import login_throttle
 
 router = APIRouter()
 
 
+def client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+
 @router.post(
     "/register",
     description="Регистрация нового пользователя",
     status_code=status.HTTP_201_CREATED,
 )
 async def register_user(
-    user_data: UserCreateDTO, referral_code: ReferralCodeQuery = None
+    request: Request,
+    user_data: UserCreateDTO,
+    referral_code: ReferralCodeQuery = None,
 ):
-    referrer_id = None
-    if referral_code:
-        try:
-            referrer_id = await ReferralCodeService.get_referrer_user_id(
-                referral_code
-            )
-        except ReferralCodeNotFoundException as e:
-            logger.exception(e, exc_info=True)
-    await AuthService.register(user_data, referrer_id)
+    # без сессии запроса: сессия открывается после хэширования пароля,
+    # чтобы соединение не удерживалось на время его вычисления
+    await login_throttle.check("register", client_ip(request), user_data.email)
+    await AuthService.register(user_data, referral_code)
 
 
 @router.get("/me", description="Информация о текущем пользователе")
-async def get_user_me(user: User = Depends(current_user)) -> UserReadDTO:
-    return AuthService.user_info(user)
+async def get_user_me(
+    user: UserPrincipalDTO = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> UserReadDTO:
+    return await AuthService.get_user_info(user.id, session)
 
 
 @router.post("/login", description="Авторизация в учетной записи")
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
+    await login_throttle.check("login", client_ip(request), form_data.username)
     user = await AuthService.authenticate_user(
         form_data.username,
         form_data.password,
@@ -53,3 +61,15 @@ async def login_for_access_token(
         raise AuthorizationErrorException()
     access_token = AuthService.create_access_token(user)
     return Token(access_token=access_token, token_type="bearer")
+
+
+@router.post(
+    "/logout",
+    description="Выход из учетной записи (отзыв токена доступа)",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def logout(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    user: UserPrincipalDTO = Depends(current_user),
+):
+    await AuthService.revoke_token(token)
@@ -0,0 +1,62 @@
+from dataclasses import asdict
+from typing import Optional
+
+from fastapi import APIRouter
+
+from app.common.exceptions import ServiceNotReadyException
+from app.database import engine, get_pool_stats, get_replicas_stats
+from app.schemas.monitoring import (
+    CacheTierStatsDTO,
+    CacheWarmupDTO,
+    CircuitBreakerStatsDTO,
+    DbPoolStatsDTO,
+    LoginThrottleStatsDTO,
+    ReplicaStatsDTO,
+)
+from app.services.cache_warmup import cache_warmup
+from app.services.login_throttle import login_throttle
+from app.services.redis_cache import get_cache_breaker_stats, get_cache_stats
+
+monitoring_router = APIRouter()
+
+
+@monitoring_router.get("/db_pool", summary="Статистика пула соединений с БД")
+async def get_db_pool_stats() -> DbPoolStatsDTO:
+    return DbPoolStatsDTO(**get_pool_stats(engine))
+
+
+@monitoring_router.get("/db_replicas", summary="Состояние реплик БД")
+async def get_db_replicas_stats() -> list[ReplicaStatsDTO]:
+    return [ReplicaStatsDTO(**stats) for stats in get_replicas_stats()]
+
+
+@monitoring_router.get("/cache", summary="Статистика кэша по уровням")
+async def get_cache_tiers_stats() -> list[CacheTierStatsDTO]:
+    return [CacheTierStatsDTO(**stats) for stats in get_cache_stats()]
+
+
+@monitoring_router.get(
+    "/cache_breaker", summary="Состояние размыкателя цепи Redis"
+)
+async def get_cache_breaker() -> Optional[CircuitBreakerStatsDTO]:
+    stats = get_cache_breaker_stats()
+    return CircuitBreakerStatsDTO(**stats) if stats is not None else None
+
+
+@monitoring_router.get(
+    "/login_throttle", summary="Ограничение попыток входа и регистрации"
+)
+async def get_login_throttle() -> LoginThrottleStatsDTO:
+    return LoginThrottleStatsDTO(**login_throttle.get_stats())
+
+
+@monitoring_router.get("/cache_warmup", summary="Ход прогрева кэша")
+async def get_cache_warmup() -> CacheWarmupDTO:
+    return CacheWarmupDTO(**asdict(cache_warmup.progress))
+
+
+@monitoring_router.get("/ready", summary="Готовность к обслуживанию запросов")
+async def get_readiness() -> CacheWarmupDTO:
+    if not cache_warmup.ready:
+        raise ServiceNotReadyException()
+    return CacheWarmupDTO(**asdict(cache_warmup.progress))
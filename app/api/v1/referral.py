@@ -1,7 +1,17 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, status
+from typing import Optional
 
-from app.models.user import User
-from app.schemas.auth import ReferralsListDTO, UserEmail
+from fastapi import APIRouter, BackgroundTasks, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.pagination import decode_cursor
+from app.config import settings
+from app.database import get_async_session
+from app.schemas.auth import (
+    PageLimitQuery,
+    ReferralsPageDTO,
+    UserEmail,
+    UserPrincipalDTO,
+)
 from app.schemas.referral_code import ReferralCodeReadDTO, ReferralCodeWriteDTO
 from app.services.auth import AuthService, current_user
 from app.services.email import send_referral_code_email
@@ -13,11 +23,13 @@ referral_router = APIRouter()
 @referral_router.post("/referral_code", summary="Создать реферальный код")
 async def renew_referral_code(
     code: ReferralCodeWriteDTO,
-    user: User = Depends(current_user),
+    user: UserPrincipalDTO = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
     return await ReferralCodeService.renew_user_code(
         user=user,
         life_time=code.code_lifetime,
+        session=session,
     )
 
 
@@ -25,25 +37,43 @@ async def renew_referral_code(
     "/referral_code", summary="Прочитать реферальный код текущего пользователя"
 )
 async def get_referral_code(
-    user: User = Depends(current_user),
+    user: UserPrincipalDTO = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
 ) -> ReferralCodeReadDTO:
-    return await ReferralCodeService.get_by_user_id(user_id=user.id)
+    return await ReferralCodeService.get_by_user_id(
+        user_id=user.id, session=session
+    )
 
 
 @referral_router.get(
     "/referral_code/{email}",
     summary="Получить реферальный код для заданного email",
 )
-async def get_referral_code_for_email(email: UserEmail) -> ReferralCodeReadDTO:
-    return await ReferralCodeService.get_by_user_email(email)
+async def get_referral_code_for_email(
+    email: UserEmail,
+    session: AsyncSession = Depends(get_async_session),
+) -> ReferralCodeReadDTO:
+    return await ReferralCodeService.get_by_user_email(email, session)
 
 
 @referral_router.get(
     "/referrals/{referrer_id}",
-    summary="Получить список всех рефералов по referrer_id",
+    summary="Получить список рефералов по referrer_id",
+    response_model_exclude_none=True,
 )
-async def get_referrals_by_referrer(referrer_id: int) -> ReferralsListDTO:
-    return await AuthService.get_users_by_referrer_id(referrer_id)
+async def get_referrals_by_referrer(
+    referrer_id: int,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: PageLimitQuery = settings.REFERRALS_PAGE_SIZE,
+    with_total: bool = False,
+    session: AsyncSession = Depends(get_async_session),
+) -> ReferralsPageDTO:
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+    return await AuthService.get_referrals_page(
+        referrer_id, after_id, limit, with_total, session
+    )
 
 
 @referral_router.get(
@@ -51,17 +81,26 @@ async def get_referrals_by_referrer(referrer_id: int) -> ReferralsListDTO:
     summary="Отправить реферальный код пользователя на почту",
 )
 async def email_referral_code(
-    bg_tasks: BackgroundTasks, user: User = Depends(current_user)
+    bg_tasks: BackgroundTasks,
+    user: UserPrincipalDTO = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    code_dto = await ReferralCodeService.get_by_user_id(user_id=user.id)
+    code_dto = await ReferralCodeService.get_by_user_id(
+        user_id=user.id, session=session
+    )
     bg_tasks.add_task(send_referral_code_email, user.email, code_dto.code)
 
 
 @referral_router.get(
     "/validate_referral_code", summary="Валидировать реферальный код"
 )
-async def validate_referral_code(referral_code: str) -> int:
-    return await ReferralCodeService.get_referrer_user_id(referral_code)
+async def validate_referral_code(
+    referral_code: str,
+    session: AsyncSession = Depends(get_async_session),
+) -> int:
+    return await ReferralCodeService.get_referrer_user_id(
+        referral_code, session
+    )
 
 
 @referral_router.get(
@@ -69,7 +108,7 @@ async def validate_referral_code(referral_code: str) -> int:
     summary="Отправить реферальный код на почту",
 )
 async def get_referral_code_by_email(
-    user: User = Depends(current_user),
+    user: UserPrincipalDTO = Depends(current_user),
 ):
     return {"message": "Код будет отправлен на почту"}
 
@@ -79,5 +118,8 @@ async def get_referral_code_by_email(
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Удалить реферальный код",
 )
-async def delete_referral_code(user: User = Depends(current_user)):
-    await ReferralCodeService.delete_by_user_id(user.id)
+async def delete_referral_code(
+    user: UserPrincipalDTO = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    await ReferralCodeService.delete_by_user_id(user.id, session)
@@ -0,0 +1,60 @@
+"""Служебные команды приложения.
+
+Запуск:
+
+    python -m app.cli calibrate-password-hash --target-ms 250
+"""
+
+import argparse
+from typing import Optional
+
+from app.config import settings
+from app.services.password import calibrate_argon2
+
+
+def calibrate_password_hash(args: argparse.Namespace) -> None:
+    """Подбирает параметры argon2id и выводит их в формате .env."""
+    params = calibrate_argon2(
+        args.target_ms / 1000,
+        max_memory_cost=args.max_memory_kib,
+        parallelism=args.parallelism,
+        samples=args.samples,
+    )
+    memory = params["memory_cost"] * settings.PASSWORD_HASH_WORKERS / 1024
+    print(
+        f"# argon2id: {params['duration'] * 1e3:.0f} мс на хэш, "
+        f"до {memory:.0f} МиБ на {settings.PASSWORD_HASH_WORKERS} "
+        f"одновременных вычислений"
+    )
+    print("PASSWORD_HASH_SCHEME=argon2")
+    print(f"PASSWORD_ARGON2_TIME_COST={params['time_cost']}")
+    print(f"PASSWORD_ARGON2_MEMORY_COST={params['memory_cost']}")
+    print(f"PASSWORD_ARGON2_PARALLELISM={params['parallelism']}")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate = commands.add_parser(
+        "calibrate-password-hash",
+        help="подобрать параметры argon2id под целевое время хэширования",
+    )
+    calibrate.add_argument("--target-ms", type=float, default=250)
+    calibrate.add_argument(
+        "--max-memory-kib",
+        type=int,
+        default=settings.PASSWORD_ARGON2_MEMORY_COST,
+    )
+    calibrate.add_argument(
+        "--parallelism", type=int, default=settings.PASSWORD_ARGON2_PARALLELISM
+    )
+    calibrate.add_argument("--samples", type=int, default=5)
+    calibrate.set_defaults(handler=calibrate_password_hash)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,14 @@ class Messages:
     )
     REFERRAL_CODE_EXPIRED: Final = "Срок жизни реферального кода истек"
     AUTHORIZATION_ERROR: Final = "Ошибка авторизации"
+    INVALID_CURSOR: Final = "Некорректный курсор страницы"
+    FORBIDDEN: Final = "Недостаточно прав"
+    IMPORT_PASSWORD_REQUIRED: Final = "Не задан password или hashed_password"
+    IMPORT_JOB_NOT_FOUND: Final = "Задача импорта не найдена"
+    IMPORT_JOB_INTERRUPTED: Final = "Импорт прерван остановкой сервиса"
+    SERVICE_NOT_READY: Final = "Сервис не готов: выполняется прогрев кэша"
+    PASSWORD_HASHING_BUSY: Final = "Сервер перегружен, повторите попытку позже"
+    TOO_MANY_ATTEMPTS: Final = "Слишком много попыток, повторите позже"
 
 
 class LogMessages:
@@ -19,8 +27,55 @@ class LogMessages:
     NEW_REGISTRATION: Final = "Зарегистрирован новый пользователь {}"
     AUTHENTICATED: Final = "Пользователь {} аутентифицирован"
     AUTHENTICATION_FAILED: Final = "Ошибка аутентификации пользователя {}"
+    PASSWORD_REHASHED: Final = "Хэш пароля пользователя {} пересчитан"
+    TOKEN_REVOKED: Final = "Токен доступа пользователя {} отозван"
+    TOKEN_CODEC_FALLBACK: Final = (
+        "TOKEN_CODEC=hs256 не поддерживает алгоритм {}, используется jose"
+    )
     REFCODE_UPDATED: Final = "Пользователь {} обновил реферальный код"
-    REFCODE_CREATED: Final = "Пользователь {} создал реферальный код"
     USER_REFCODE_DELETED: Final = "Реферальный код {} пользователя {} удален"
     REFCODE_DELETED: Final = "Реферальный код {} удален"
     REFCODE_EMAILED: Final = "реферальный код отправлен на почту {}"
+    REPLICA_UNAVAILABLE: Final = "Реплика БД {} недоступна: {}"
+    USERS_IMPORT_BATCH: Final = (
+        "Импорт пользователей: пакет {}, получено {}, добавлено {}"
+    )
+    USERS_IMPORT_FINISHED: Final = (
+        "Импорт пользователей {} завершен: получено {}, добавлено {}"
+    )
+    USERS_IMPORT_FAILED: Final = "Ошибка импорта пользователей {}: {}"
+    CACHE_GET_FAILED: Final = "Ошибка чтения ключа кэша {}"
+    CACHE_SET_FAILED: Final = "Ошибка записи ключа кэша {}"
+    CACHE_DELETE_FAILED: Final = "Ошибка удаления ключей кэша {}"
+    CACHE_LOCK_FAILED: Final = "Ошибка блокировки ключа кэша {}"
+    CACHE_THROTTLE_FAILED: Final = (
+        "Ошибка проверки лимита попыток, попытка разрешена"
+    )
+    CACHE_INVALIDATION_FAILED: Final = (
+        "Ошибка подписки на инвалидацию локального кэша: {}"
+    )
+    CACHE_WARMUP_FINISHED: Final = (
+        "Прогрев кэша завершен: рефереров {}, время {:.1f} с"
+    )
+    CACHE_WARMUP_FAILED: Final = "Ошибка прогрева кэша: {}"
+    CIRCUIT_OPENED: Final = "Цепь {} разомкнута, доля ошибок {:.0%}"
+    CIRCUIT_CLOSED: Final = "Цепь {} замкнута"
+    CACHE_PENDING_DELETES_OVERFLOW: Final = (
+        "Переполнена очередь удаления ключей кэша, кэш {} будет очищен"
+    )
+
+
+class CacheKeys:
+    """Шаблоны ключей кэша (без префикса приложения)"""
+
+    REFERRAL_CODE_BY_ID: Final = "referral_code:id:{id}"
+    REFERRAL_CODE_BY_USER_ID: Final = "referral_code:user:{user_id}"
+    REFERRAL_CODE_BY_EMAIL: Final = "referral_code:email:{email}"
+    REFERRAL_CODE_CHECK: Final = "referral_code:check:{code_hash}"
+    REFERRAL_CODE_CHECK_BY_USER: Final = (
+        "referral_code:check_by_user:{user_id}"
+    )
+    REFERRALS_COUNT: Final = "referrals:count:{referrer_id}"
+    REVOKED_TOKEN: Final = "auth:revoked:{token_hash}"
+    AUTH_THROTTLE: Final = "auth:throttle:{scope}:{kind}:{value}"
+    USER_IMPORT_JOB: Final = "admin:user_import:{job_id}"
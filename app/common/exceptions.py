@@ -41,6 +41,52 @@ class AuthorizationErrorException(ReferralException):
     detail = Messages.AUTHORIZATION_ERROR
 
 
+class ForbiddenException(ReferralException):
+    """Недостаточно прав."""
+
+    status_code = status.HTTP_403_FORBIDDEN
+    detail = Messages.FORBIDDEN
+
+
+class InvalidCursorException(ReferralException):
+    """Некорректный курсор постраничной выдачи."""
+
+    status_code = status.HTTP_400_BAD_REQUEST
+    detail = Messages.INVALID_CURSOR
+
+
+class ServiceNotReadyException(ReferralException):
+    """Сервис еще не готов обслуживать запросы."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = Messages.SERVICE_NOT_READY
+
+
+class PasswordHashingBusyException(ReferralException):
+    """Пул хэширования паролей перегружен."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = Messages.PASSWORD_HASHING_BUSY
+
+
+class TooManyAttemptsException(ReferralException):
+    """Превышен лимит попыток входа или регистрации."""
+
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    detail = Messages.TOO_MANY_ATTEMPTS
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class ImportJobNotFoundException(ReferralException):
+    """Задача импорта пользователей не найдена."""
+
+    status_code = status.HTTP_404_NOT_FOUND
+    detail = Messages.IMPORT_JOB_NOT_FOUND
+
+
 class UserAlreadyExistsException(ReferralException):
     status_code = status.HTTP_409_CONFLICT
     detail = "Пользователь уже существует"
@@ -0,0 +1,35 @@
+import base64
+import binascii
+
+from app.common.exceptions import InvalidCursorException
+
+
+def encode_cursor(last_id: int) -> str:
+    """Формирует непрозрачный курсор по идентификатору последней записи.
+
+    Args:
+        last_id: Идентификатор последней записи страницы.
+
+    Returns:
+        Курсор следующей страницы.
+    """
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Возвращает идентификатор записи, закодированный в курсоре.
+
+    Args:
+        cursor: Курсор, полученный от encode_cursor.
+
+    Returns:
+        Идентификатор последней записи предыдущей страницы.
+
+    Raises:
+        InvalidCursorException: Если курсор некорректен.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorException()
@@ -20,18 +20,77 @@ class Settings(BaseSettings):
     TEST_DB_PASS: str
     TEST_DB_NAME: str
 
+    # Пул соединений с БД
+    DB_USE_NULLPOOL: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_USE_LIFO: bool = True
+    DB_POOL_PREWARM: int = 5
+
+    # Кэш скомпилированных запросов и подготовленных выражений asyncpg
+    DB_QUERY_CACHE_SIZE: int = 500
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
+    # Реплики для чтения
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_POLICY: Literal["round_robin", "least_connections"] = (
+        "round_robin"
+    )
+    DB_REPLICA_MAX_LAG: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0
+    DB_REPLICA_CHECK_TIMEOUT: float = 2.0
+
     # Auth
     SECRET_KEY: str
     ALGORITHM: str
     JWT_LIFETIME_SECONDS: int = 3600
+    # Реализация JWT: python-jose, PyJWT или встроенная HS256 (только
+    # для ALGORITHM=HS256, иначе используется python-jose)
+    TOKEN_CODEC: Literal["jose", "pyjwt", "hs256"] = "jose"
     # COOKIE_LIFETIME: int = 3600
     # COOKIE_NAME: str = "referral_access_token"
     # RESET_PASSWORD_SECRET: str
+    # Формат новых реферальных кодов: короткий случайный (base62) или JWT.
+    # Коды формата JWT, выданные ранее, принимаются в обоих случаях.
+    REFERRAL_CODE_FORMAT: Literal["opaque", "jwt"] = "opaque"
+    REFERRAL_CODE_LENGTH: int = 12
     CACHE_EXPIRE: int = 0
+    CACHE_NOT_FOUND_EXPIRE: int = 30
+    # Защита от одновременного обновления ключа (cache stampede)
+    CACHE_STALE_TTL: int = 60
+    CACHE_LOCK_TIMEOUT: float = 5.0
+    CACHE_LOCK_WAIT: float = 2.0
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05
+    # Кэш в памяти процесса перед Redis
+    CACHE_LOCAL_ENABLED: bool = False
+    CACHE_LOCAL_MAXSIZE: int = 10000
+    CACHE_LOCAL_TTL: float = 5.0
+    CACHE_INVALIDATION_CHANNEL: str = "refcache:invalidate"
+    # Прогрев кэша при запуске
+    CACHE_WARMUP_ENABLED: bool = False
+    CACHE_WARMUP_TOP_REFERRERS: int = 1000
+    CACHE_WARMUP_BATCH_SIZE: int = 100
+    CACHE_WARMUP_CONCURRENCY: int = 10
+    # Размыкатель цепи (circuit breaker) для Redis
+    CACHE_BREAKER_ENABLED: bool = True
+    CACHE_BREAKER_CALL_TIMEOUT: float = 0.25
+    CACHE_BREAKER_WINDOW: int = 20
+    CACHE_BREAKER_MIN_CALLS: int = 10
+    CACHE_BREAKER_FAILURE_RATE: float = 0.5
+    CACHE_BREAKER_RESET_TIMEOUT: float = 5.0
+    CACHE_BREAKER_MAX_PENDING_DELETES: int = 10000
 
     # Redis
     REDIS_HOST: str
     REDIS_PORT: str
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 1.0
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 1.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
 
     # email smtp host
     SMTP_HOST: str
@@ -63,6 +122,44 @@ class Settings(BaseSettings):
     def redis_url(self):
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}"
 
+    # Постраничная выдача рефералов
+    REFERRALS_PAGE_SIZE: int = 100
+    REFERRALS_PAGE_SIZE_MAX: int = 1000
+
+    # Администраторы и импорт пользователей
+    ADMIN_EMAILS: list[str] = []
+    BULK_IMPORT_BATCH_SIZE: int = 10000
+    # не более стольких мест общего пула хэширования паролей на импорт
+    BULK_IMPORT_HASH_WORKERS: int = 4
+    BULK_IMPORT_MAX_ERRORS: int = 1000
+    # сколько секунд хранится состояние задачи импорта в Redis
+    BULK_IMPORT_JOB_TTL: int = 86400
+
+    # Хэширование паролей вне цикла событий
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    # Политика хэширования: argon2id (по умолчанию) или bcrypt
+    PASSWORD_HASH_SCHEME: Literal["argon2", "bcrypt"] = "argon2"
+    PASSWORD_ARGON2_TIME_COST: int = 2
+    PASSWORD_ARGON2_MEMORY_COST: int = 19456
+    PASSWORD_ARGON2_PARALLELISM: int = 1
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    # Кэш проверенных токенов доступа и пользователей в памяти процесса
+    AUTH_TOKEN_CACHE_ENABLED: bool = True
+    AUTH_TOKEN_CACHE_MAXSIZE: int = 10000
+    AUTH_PRINCIPAL_CACHE_TTL: float = 30.0
+    # Адреса прокси (через запятую, * - любой), которым доверяются
+    # заголовки X-Forwarded-For и X-Forwarded-Proto
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    # Ограничение попыток входа и регистрации: попыток за период (секунд)
+    # с одного IP и для одного email
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_IP_ATTEMPTS: int = 30
+    LOGIN_THROTTLE_IP_PERIOD: float = 60.0
+    LOGIN_THROTTLE_EMAIL_ATTEMPTS: int = 10
+    LOGIN_THROTTLE_EMAIL_PERIOD: float = 300.0
+
     # Настройки приложения
     API_V1_PREFIX: str = "/api/v1"
     TITLE: str = "Referral application"
@@ -1,9 +1,11 @@
 from typing import Any, Generic, Optional, TypeVar
 
 from sqlalchemy import Sequence, delete, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.engine import Result
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import async_session_maker
+from app.database import session_scope
 from app.models.base import pk_type
 
 T = TypeVar("T")
@@ -13,94 +15,174 @@ class BaseDAO(Generic[T]):
     model: T = None
 
     @classmethod
-    async def get_by_id(cls, id: pk_type) -> Optional[T]:
+    async def get_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[T]:
         """Получить объект с заданным идентификатором.
 
         Args:
             id (pk_type): идентификатор запрашиваемого объекта.
+            session (AsyncSession | None): сессия запроса.
 
         Returns:
             Model | None: объект с заданным id.
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             query = select(cls.model).filter_by(id=id)
             result: Result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @classmethod
-    async def get_one_or_none(cls, **filter_by) -> Optional[T]:
+    async def get_one_or_none(
+        cls, session: Optional[AsyncSession] = None, **filter_by
+    ) -> Optional[T]:
         """Получить один объект по заданному фильтру.
 
         Args:
+            session (AsyncSession | None): сессия запроса.
             filter_by (dict): параметры для поиска объекта.
 
         Returns:
             Model | None: объект удовлетворяющий фильтру поиска.
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             query = select(cls.model).filter_by(**filter_by)
             result: Result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @classmethod
-    async def get_all(cls, **filter_by) -> Sequence[T]:
+    async def get_all(
+        cls, session: Optional[AsyncSession] = None, **filter_by
+    ) -> Sequence[T]:
         """Получить все объекты по заданному фильтру.
 
         Args:
+            session (AsyncSession | None): сессия запроса.
             filter_by (dict): параметры для поиска объектов.
 
         Returns:
             list(Model): список объектов, удовлетворяющих фильтру поиска.
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             query = select(cls.model).filter_by(**filter_by)
             result: Result = await session.execute(query)
             return result.scalars().all()
 
     @classmethod
-    async def create(cls, **data) -> Optional[T]:
+    async def create(
+        cls, session: Optional[AsyncSession] = None, **data
+    ) -> Optional[T]:
         """Создать новый объект.
 
         Args:
+            session (AsyncSession | None): сессия запроса.
             **data: значения полей создаваемого объекта.
 
         Returns:
             Model: созданный объект.
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             stmt = insert(cls.model).values(**data).returning(cls.model)
             result = await session.execute(stmt)
-            await session.commit()
             return result.scalar()
 
     @classmethod
-    async def create_list(cls, data: list[dict[str, Any]]) -> Sequence[T]:
+    async def create_list(
+        cls,
+        data: list[dict[str, Any]],
+        session: Optional[AsyncSession] = None,
+    ) -> Sequence[T]:
         """Создать список новых объектов.
 
         Args:
             data (dict[str, Any]): список значений создаваемых объектов.
+            session (AsyncSession | None): сессия запроса.
 
         Returns:
             list[Model]: список созданных объектов.
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             objects = [cls.model(**item) for item in data]
             session.add_all(objects)
-            await session.commit()
+            await session.flush()
             return objects
 
     @classmethod
-    async def update_(cls, id: pk_type, **data) -> Optional[T]:
+    async def upsert(
+        cls,
+        index_elements: Sequence[str],
+        session: Optional[AsyncSession] = None,
+        **data,
+    ) -> T:
+        """Создать объект или обновить существующий одним запросом.
+
+        Выполняет INSERT ... ON CONFLICT (index_elements) DO UPDATE
+        ... RETURNING, без предварительного чтения.
+
+        Args:
+            index_elements (list[str]): поля уникального ограничения.
+            session (AsyncSession | None): сессия запроса.
+            **data: значения полей объекта.
+
+        Returns:
+            Model: созданный или обновленный объект.
+        """
+        objects = await cls.upsert_many([data], index_elements, session)
+        return objects[0]
+
+    @classmethod
+    async def upsert_many(
+        cls,
+        data: list[dict[str, Any]],
+        index_elements: Sequence[str],
+        session: Optional[AsyncSession] = None,
+    ) -> Sequence[T]:
+        """Создать или обновить список объектов одним запросом.
+
+        Значения index_elements в пределах data не должны повторяться.
+
+        Args:
+            data (list[dict[str, Any]]): список значений объектов.
+            index_elements (list[str]): поля уникального ограничения.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            list[Model]: список созданных или обновленных объектов.
+        """
+        if not data:
+            return []
+        stmt = pg_insert(cls.model).values(data)
+        stmt = (
+            stmt.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={
+                    name: stmt.excluded[name]
+                    for name in data[0]
+                    if name not in index_elements
+                },
+            )
+            .returning(cls.model)
+            .execution_options(populate_existing=True)
+        )
+        async with session_scope(session) as session:
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
+    @classmethod
+    async def update_(
+        cls, id: pk_type, session: Optional[AsyncSession] = None, **data
+    ) -> Optional[T]:
         """Обновить значения объекта с заданным идентификатором.
 
         Args:
             id (pk_type): идентификатор модифицируемого объекта.
+            session (AsyncSession | None): сессия запроса.
             data: значения модифицируемых параметров.
 
         Returns:
             Model: модифицированный объект.
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             stmt = (
                 update(cls.model)
                 .where(cls.model.id == id)
@@ -108,19 +190,20 @@ class BaseDAO(Generic[T]):
                 .returning(cls.model)
             )
             result = await session.execute(stmt)
-            await session.commit()
             return result.scalar()
 
     @classmethod
-    async def delete_(cls, id: pk_type) -> None:
+    async def delete_(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> None:
         """Удалить объект с заданным идентификатором.
 
         Args:
             id (pk_type): идентификатор удаляемого объекта.
+            session (AsyncSession | None): сессия запроса.
 
         Returns: None
         """
-        async with async_session_maker() as session:
+        async with session_scope(session) as session:
             stmt = delete(cls.model).where(cls.model.id == id)
             await session.execute(stmt)
-            await session.commit()
@@ -1,51 +1,246 @@
-from typing import Optional
+from typing import Optional, Sequence
 
-from sqlalchemy import Result, select
+from sqlalchemy import Result, Row, bindparam, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.crud.base_dao import BaseDAO
-from app.database import async_session_maker
+from app.database import session_scope
 from app.models.base import pk_type
 from app.models.referral_code import ReferralCode
+from app.models.user import User
+
+# Запросы строятся один раз и выполняются с параметрами через bindparam
+REFERRAL_CODE_BY_ID_QUERY = (
+    select(ReferralCode)
+    .where(ReferralCode.id == bindparam("id"))
+    .options(joinedload(ReferralCode.user))
+)
+REFERRAL_CODE_BY_USER_ID_QUERY = (
+    select(ReferralCode)
+    .where(ReferralCode.user_id == bindparam("user_id"))
+    .options(joinedload(ReferralCode.user))
+)
+CODE_BY_ID_QUERY = select(ReferralCode.id, ReferralCode.code).where(
+    ReferralCode.id == bindparam("id")
+)
+CODE_BY_USER_ID_QUERY = select(ReferralCode.id, ReferralCode.code).where(
+    ReferralCode.user_id == bindparam("user_id")
+)
+CODE_BY_USER_EMAIL_QUERY = (
+    select(ReferralCode.id, ReferralCode.code)
+    .join(User, User.id == ReferralCode.user_id)
+    .where(User.email == bindparam("email"))
+)
+CODE_OWNER_QUERY = select(ReferralCode.user_id, ReferralCode.expires_at).where(
+    ReferralCode.code == bindparam("code")
+)
+CODES_BY_USER_IDS_QUERY = (
+    select(ReferralCode.id, ReferralCode.code, User.id, User.email)
+    .join(User, User.id == ReferralCode.user_id)
+    .where(ReferralCode.user_id.in_(bindparam("user_ids", expanding=True)))
+)
+# Удаление возвращает владельца кода для инвалидации кэша. Используются
+# таблицы, а не ORM-сущности: ORM DELETE не включает в RETURNING колонки
+# таблицы из USING.
+referral_code_table = ReferralCode.__table__
+user_table = User.__table__
+DELETE_CODE_BY_ID_QUERY = (
+    delete(referral_code_table)
+    .where(
+        referral_code_table.c.id == bindparam("id"),
+        referral_code_table.c.user_id == user_table.c.id,
+    )
+    .returning(
+        referral_code_table.c.id,
+        referral_code_table.c.user_id,
+        user_table.c.email,
+    )
+)
+DELETE_CODE_BY_USER_ID_QUERY = (
+    delete(referral_code_table)
+    .where(
+        referral_code_table.c.user_id == bindparam("user_id"),
+        referral_code_table.c.user_id == user_table.c.id,
+    )
+    .returning(
+        referral_code_table.c.id,
+        referral_code_table.c.user_id,
+        user_table.c.email,
+    )
+)
 
 
 class ReferralCodeDAO(BaseDAO):
     model = ReferralCode
 
     @classmethod
-    async def get_by_id(cls, id: pk_type) -> Optional[ReferralCode]:
+    async def get_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[ReferralCode]:
         """Получить реферальный код с заданным идентификатором.
 
         Args:
             id (pk_type): идентификатор записи.
+            session (AsyncSession | None): сессия запроса.
 
         Returns:
             ReferralCode | None: объект ReferralCode заданным id.
         """
-        async with async_session_maker() as session:
-            query = (
-                select(cls.model)
-                .filter_by(id=id)
-                .options(joinedload(ReferralCode.user))
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                REFERRAL_CODE_BY_ID_QUERY, {"id": id}
             )
-            result: Result = await session.execute(query)
             return result.unique().scalar_one_or_none()
 
     @classmethod
-    async def get_by_user_id(cls, user_id: pk_type) -> Optional[ReferralCode]:
+    async def get_by_user_id(
+        cls, user_id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[ReferralCode]:
         """Получить реферальный код для заданного идентификатора пользователя.
 
         Args:
             user_id (pk_type): идентификатор пользователя.
+            session (AsyncSession | None): сессия запроса.
 
         Returns:
             ReferralCode | None: объект ReferralCode заданным user_id.
         """
-        async with async_session_maker() as session:
-            query = (
-                select(cls.model)
-                .filter_by(user_id=user_id)
-                .options(joinedload(ReferralCode.user))
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                REFERRAL_CODE_BY_USER_ID_QUERY, {"user_id": user_id}
             )
-            result: Result = await session.execute(query)
             return result.unique().scalar_one_or_none()
+
+    @classmethod
+    async def get_code_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Получить id и код реферального кода с заданным идентификатором.
+
+        Args:
+            id (pk_type): идентификатор записи.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (id, code).
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                CODE_BY_ID_QUERY, {"id": id}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def get_code_by_user_id(
+        cls, user_id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Получить id и код реферального кода пользователя.
+
+        Args:
+            user_id (pk_type): идентификатор пользователя.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (id, code).
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                CODE_BY_USER_ID_QUERY, {"user_id": user_id}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def get_code_by_user_email(
+        cls, email: str, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Получить id и код реферального кода пользователя по email.
+
+        Args:
+            email (str): email пользователя.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (id, code).
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                CODE_BY_USER_EMAIL_QUERY, {"email": email}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def get_code_owner(
+        cls, code: str, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Получить владельца и срок действия кода по значению кода.
+
+        Args:
+            code (str): реферальный код.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (user_id, expires_at).
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                CODE_OWNER_QUERY, {"code": code}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def delete_code_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Удалить реферальный код с заданным идентификатором.
+
+        Args:
+            id (pk_type): идентификатор записи.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (id, user_id, email) удаленного кода.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                DELETE_CODE_BY_ID_QUERY, {"id": id}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def delete_code_by_user_id(
+        cls, user_id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Удалить реферальный код пользователя.
+
+        Args:
+            user_id (pk_type): идентификатор пользователя.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (id, user_id, email) удаленного кода.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                DELETE_CODE_BY_USER_ID_QUERY, {"user_id": user_id}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def get_codes_by_user_ids(
+        cls, user_ids: list[pk_type], session: Optional[AsyncSession] = None
+    ) -> Sequence[Row]:
+        """Получить коды пользователей вместе с их email.
+
+        Args:
+            user_ids (list[pk_type]): идентификаторы пользователей.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            list[Row]: строки (id, code, user_id, email).
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                CODES_BY_USER_IDS_QUERY, {"user_ids": user_ids}
+            )
+            return result.all()
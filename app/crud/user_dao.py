@@ -1,34 +1,413 @@
-from typing import Optional
+from typing import Optional, Sequence
 
-from sqlalchemy import Result, select
+from sqlalchemy import (
+    Column,
+    MetaData,
+    Result,
+    Row,
+    String,
+    Table,
+    bindparam,
+    func,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.schema import CreateTable
 
 from app.crud.base_dao import BaseDAO
-from app.database import async_session_maker
+from app.database import session_scope
 from app.models.base import pk_type
+from app.models.referral_code import ReferralCode
 from app.models.user import User
 
+# Промежуточная таблица массового импорта, удаляется при фиксации транзакции
+user_import_staging = Table(
+    "user_import_staging",
+    MetaData(),
+    Column("email", String(length=320)),
+    Column("hashed_password", String(length=1024)),
+    Column("referral_code", String),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+# Часто выполняемые запросы строятся один раз при импорте модуля: ключ
+# кэша компиляции SQLAlchemy для готовой конструкции вычисляется
+# однократно, а значения передаются через bindparam при выполнении.
+USER_BY_ID_QUERY = (
+    select(User)
+    .where(User.id == bindparam("id"))
+    .options(
+        joinedload(User.referrer),
+        joinedload(User.referral_code),
+        selectinload(User.referrals),
+    )
+)
+USER_BY_EMAIL_QUERY = select(User).where(User.email == bindparam("email"))
+USER_PRINCIPAL_QUERY = select(User.id, User.email).where(
+    User.id == bindparam("id")
+)
+REFERRALS_QUERY = (
+    select(User.id, User.email)
+    .where(User.referrer_id == bindparam("referrer_id"))
+    .order_by(User.id)
+)
+REFERRALS_PAGE_QUERY = REFERRALS_QUERY.where(
+    User.id > bindparam("after_id")
+).limit(bindparam("limit"))
+REFERRALS_COUNT_QUERY = select(func.count()).where(
+    User.referrer_id == bindparam("referrer_id")
+)
+REFERRALS_COUNTS_QUERY = (
+    select(User.referrer_id, func.count().label("referrals"))
+    .where(User.referrer_id.in_(bindparam("referrer_ids", expanding=True)))
+    .group_by(User.referrer_id)
+)
+TOP_REFERRERS_QUERY = (
+    select(User.referrer_id, func.count().label("referrals"))
+    .where(User.referrer_id.is_not(None))
+    .group_by(User.referrer_id)
+    .order_by(func.count().desc(), User.referrer_id)
+    .limit(bindparam("limit"))
+)
+# Core-таблица: ORM UPDATE синхронизировал бы сессию лишним запросом
+user_table = User.__table__
+UPDATE_PASSWORD_HASH_QUERY = (
+    update(user_table)
+    .where(
+        user_table.c.id == bindparam("user_id"),
+        user_table.c.hashed_password == bindparam("old_hash"),
+    )
+    .values(hashed_password=bindparam("new_hash"))
+)
+# Регистрация одним запросом: если email занят (в том числе одновременной
+# регистрацией), строка не вставляется и RETURNING ничего не возвращает
+CREATE_USER_QUERY = (
+    pg_insert(user_table)
+    .values(
+        email=bindparam("email"),
+        hashed_password=bindparam("hashed_password"),
+        referrer_id=bindparam("referrer_id"),
+    )
+    .on_conflict_do_nothing(index_elements=[user_table.c.email])
+    .returning(user_table.c.id)
+)
+
 
 class UserDAO(BaseDAO):
     model = User
 
     @classmethod
-    async def get_by_id(cls, id: pk_type) -> Optional[User]:
+    async def get_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[User]:
         """Получить пользователя с заданным идентификатором.
 
         Args:
             id (pk_type): идентификатор запрашиваемого пользователя.
+            session (AsyncSession | None): сессия запроса.
 
         Returns:
             User | None: пользователь с заданным id.
         """
-        async with async_session_maker() as session:
-            query = (
-                select(cls.model)
-                .filter_by(id=id)
-                .options(joinedload(User.referrer))
-                .options(joinedload(User.referral_code))
-                .options(selectinload(User.referrals))
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                USER_BY_ID_QUERY, {"id": id}
             )
-            result: Result = await session.execute(query)
             return result.unique().scalar_one_or_none()
+
+    @classmethod
+    async def get_by_email(
+        cls, email: str, session: Optional[AsyncSession] = None
+    ) -> Optional[User]:
+        """Получить пользователя с заданным email.
+
+        Args:
+            email (str): email пользователя.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            User | None: пользователь с заданным email.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                USER_BY_EMAIL_QUERY, {"email": email}
+            )
+            return result.scalar_one_or_none()
+
+    @classmethod
+    async def create_if_not_exists(
+        cls,
+        email: str,
+        hashed_password: str,
+        referrer_id: Optional[pk_type] = None,
+        session: Optional[AsyncSession] = None,
+    ) -> Optional[pk_type]:
+        """Создать пользователя, если email не занят.
+
+        Выполняет INSERT ... ON CONFLICT (email) DO NOTHING RETURNING id,
+        без предварительной проверки email.
+
+        Args:
+            email (str): email пользователя.
+            hashed_password (str): хэш пароля.
+            referrer_id (pk_type | None): идентификатор реферера.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            pk_type | None: идентификатор созданного пользователя или None,
+                если пользователь с таким email уже существует.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                CREATE_USER_QUERY,
+                {
+                    "email": email,
+                    "hashed_password": hashed_password,
+                    "referrer_id": referrer_id,
+                },
+            )
+            return result.scalar_one_or_none()
+
+    @classmethod
+    async def get_principal(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Optional[Row]:
+        """Получить id и email пользователя без загрузки связей.
+
+        Args:
+            id (pk_type): идентификатор пользователя.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            Row | None: строка (id, email) пользователя.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                USER_PRINCIPAL_QUERY, {"id": id}
+            )
+            return result.one_or_none()
+
+    @classmethod
+    async def get_referrals(
+        cls, referrer_id: pk_type, session: Optional[AsyncSession] = None
+    ) -> Sequence[Row]:
+        """Получить всех рефералов реферера в порядке возрастания id.
+
+        Args:
+            referrer_id (pk_type): идентификатор реферера.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            list[Row]: строки (id, email) рефералов.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                REFERRALS_QUERY, {"referrer_id": referrer_id}
+            )
+            return result.all()
+
+    @classmethod
+    async def get_referrals_page(
+        cls,
+        referrer_id: pk_type,
+        after_id: Optional[pk_type] = None,
+        limit: int = 100,
+        session: Optional[AsyncSession] = None,
+    ) -> Sequence[Row]:
+        """Получить страницу рефералов в порядке возрастания id.
+
+        Args:
+            referrer_id (pk_type): идентификатор реферера.
+            after_id (pk_type | None): id последнего реферала предыдущей
+                страницы.
+            limit (int): размер страницы.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            list[Row]: строки (id, email) рефералов.
+        """
+        params = {
+            "referrer_id": referrer_id,
+            # id начинаются с 1, поэтому первая страница - после id 0
+            "after_id": after_id if after_id is not None else 0,
+            "limit": limit,
+        }
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                REFERRALS_PAGE_QUERY, params
+            )
+            return result.all()
+
+    @classmethod
+    async def count_referrals(
+        cls, referrer_id: pk_type, session: Optional[AsyncSession] = None
+    ) -> int:
+        """Получить количество рефералов реферера.
+
+        Args:
+            referrer_id (pk_type): идентификатор реферера.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            int: количество рефералов.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                REFERRALS_COUNT_QUERY, {"referrer_id": referrer_id}
+            )
+            return result.scalar_one()
+
+    @classmethod
+    async def count_referrals_by_ids(
+        cls,
+        referrer_ids: list[pk_type],
+        session: Optional[AsyncSession] = None,
+    ) -> Sequence[Row]:
+        """Получить количество рефералов нескольких рефереров.
+
+        Args:
+            referrer_ids (list[pk_type]): идентификаторы рефереров.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            list[Row]: строки (referrer_id, referrals) рефереров, у которых
+                есть рефералы.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                REFERRALS_COUNTS_QUERY, {"referrer_ids": referrer_ids}
+            )
+            return result.all()
+
+    @classmethod
+    async def get_top_referrers(
+        cls, limit: int, session: Optional[AsyncSession] = None
+    ) -> Sequence[Row]:
+        """Получить рефереров с наибольшим количеством рефералов.
+
+        Args:
+            limit (int): количество рефереров.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            list[Row]: строки (referrer_id, referrals) в порядке убывания
+                количества рефералов.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                TOP_REFERRERS_QUERY, {"limit": limit}
+            )
+            return result.all()
+
+    @classmethod
+    async def update_password_hash(
+        cls,
+        id: pk_type,
+        old_hash: str,
+        new_hash: str,
+        session: Optional[AsyncSession] = None,
+    ) -> bool:
+        """Заменить хэш пароля одним UPDATE.
+
+        Хэш заменяется, только если он не изменился с момента чтения
+        (например, пароль не был сменен одновременно).
+
+        Args:
+            id (pk_type): идентификатор пользователя.
+            old_hash (str): прочитанный хэш пароля.
+            new_hash (str): новый хэш пароля.
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            bool: хэш заменен.
+        """
+        async with session_scope(session) as session:
+            result: Result = await session.execute(
+                UPDATE_PASSWORD_HASH_QUERY,
+                {"user_id": id, "old_hash": old_hash, "new_hash": new_hash},
+            )
+            return bool(result.rowcount)
+
+    @classmethod
+    async def copy_import_batch(
+        cls,
+        records: list[tuple[str, str, Optional[str]]],
+        session: Optional[AsyncSession] = None,
+    ) -> tuple[int, int, list[pk_type]]:
+        """Загрузить пакет пользователей через COPY и промежуточную таблицу.
+
+        Записи копируются в user_import_staging, после чего переносятся в
+        user одним INSERT ... SELECT с определением referrer_id по
+        действующему (не истекшему) реферальному коду. Пользователи с
+        существующим email пропускаются.
+
+        Args:
+            records (list[tuple]): строки (email, hashed_password,
+                referral_code).
+            session (AsyncSession | None): сессия запроса.
+
+        Returns:
+            tuple[int, int, list[pk_type]]: количество добавленных
+                пользователей, количество нераспознанных (неизвестных или
+                истекших) реферальных кодов и идентификаторы рефереров
+                добавленных пользователей.
+        """
+        staging = user_import_staging
+        valid_code = (ReferralCode.code == staging.c.referral_code) & or_(
+            ReferralCode.expires_at.is_(None),
+            ReferralCode.expires_at > func.now(),
+        )
+        async with session_scope(session) as session:
+            await session.execute(CreateTable(staging))
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                staging.name,
+                records=records,
+                columns=[column.name for column in staging.columns],
+            )
+            unresolved_query = (
+                select(func.count())
+                .select_from(staging)
+                .outerjoin(ReferralCode, valid_code)
+                .where(
+                    staging.c.referral_code.is_not(None),
+                    ReferralCode.id.is_(None),
+                )
+            )
+            unresolved = (await session.execute(unresolved_query)).scalar_one()
+            source = (
+                select(
+                    staging.c.email,
+                    staging.c.hashed_password,
+                    ReferralCode.user_id,
+                )
+                .outerjoin(ReferralCode, valid_code)
+                .distinct(staging.c.email)
+                .order_by(staging.c.email)
+            )
+            inserted = (
+                pg_insert(User.__table__)
+                .from_select(
+                    ["email", "hashed_password", "referrer_id"], source
+                )
+                .on_conflict_do_nothing(index_elements=["email"])
+                .returning(User.__table__.c.referrer_id)
+                .cte("inserted")
+            )
+            result: Result = await session.execute(
+                select(inserted.c.referrer_id, func.count()).group_by(
+                    inserted.c.referrer_id
+                )
+            )
+            rows = result.all()
+            return (
+                sum(count for _, count in rows),
+                unresolved,
+                [referrer_id for referrer_id, _ in rows if referrer_id],
+            )
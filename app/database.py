@@ -1,26 +1,389 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Literal,
+    Optional,
+)
 
-from sqlalchemy import NullPool
+from sqlalchemy import NullPool, exc, make_url, text
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
+from app.common.constants import LogMessages
 from app.config import settings
+from app.logger import logger
+
+
+@dataclass
+class PoolStats:
+    """Накопительная статистика выдачи соединений из пула."""
+
+    checkouts: int = 0
+    waiting: int = 0
+    timeouts: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+
+    def record_wait(self, wait_time: float) -> None:
+        self.checkouts += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений с учетом ожидающих клиентов и времени ожидания."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        self.stats.waiting += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.waiting -= 1
+            self.stats.record_wait(time.perf_counter() - started)
+
 
 if settings.MODE == "TEST":
     DATABASE_URL = settings.test_database_url
+    # каждый тест работает в собственном event loop, соединения
+    # между ними переиспользовать нельзя
+    DATABASE_PARAMS = {"poolclass": NullPool}
+elif settings.DB_USE_NULLPOOL:
+    # явный выбор для воркеров, создаваемых через fork
+    DATABASE_URL = settings.database_url
     DATABASE_PARAMS = {"poolclass": NullPool}
 else:
     DATABASE_URL = settings.database_url
-    DATABASE_PARAMS = {"poolclass": NullPool}  # for celery background
+    DATABASE_PARAMS = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_use_lifo": settings.DB_POOL_USE_LIFO,
+    }
+
+# Кэш скомпилированных SQLAlchemy конструкций и кэш подготовленных
+# выражений asyncpg (последний живет вместе с соединением, поэтому
+# эффективен только при пуле соединений)
+DATABASE_PARAMS.update(
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    connect_args={
+        "prepared_statement_cache_size": (
+            settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+        ),
+    },
+)
 
 engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS)
 
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+# Отставание реплики: 0, если весь полученный WAL уже применен
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()"
+    " THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    " END"
+)
+
+
+class Replica:
+    """Реплика БД для чтения."""
+
+    def __init__(self, url: str, **engine_params: Any) -> None:
+        self.url = url
+        self.engine = create_async_engine(url, **engine_params)
+        self.healthy = True
+        self.lag: Optional[float] = None
+
+    @property
+    def display_url(self) -> str:
+        return make_url(self.url).render_as_string(hide_password=True)
+
+    @property
+    def checked_out(self) -> int:
+        pool = self.engine.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            return pool.checkedout()
+        return 0
+
+
+class ReplicaRouter:
+    """Выбор реплики для чтения с учетом ее доступности и отставания."""
+
+    def __init__(
+        self,
+        replicas: list[Replica],
+        policy: Literal["round_robin", "least_connections"] = "round_robin",
+        max_lag: float = settings.DB_REPLICA_MAX_LAG,
+        check_timeout: float = settings.DB_REPLICA_CHECK_TIMEOUT,
+    ) -> None:
+        self.replicas = replicas
+        self.policy = policy
+        self.max_lag = max_lag
+        self.check_timeout = check_timeout
+        self._counter = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[Replica]:
+        """Возвращает реплику для чтения или None, если исправных нет."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.policy == "least_connections":
+            return min(healthy, key=lambda replica: replica.checked_out)
+        return healthy[next(self._counter) % len(healthy)]
+
+    @staticmethod
+    async def get_replica_lag(replica: Replica) -> Optional[float]:
+        async with replica.engine.connect() as conn:
+            return (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+
+    async def check_replica(self, replica: Replica) -> None:
+        try:
+            lag = await asyncio.wait_for(
+                self.get_replica_lag(replica), self.check_timeout
+            )
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(
+                    LogMessages.REPLICA_UNAVAILABLE.format(
+                        replica.display_url, repr(e)
+                    )
+                )
+            replica.healthy = False
+            replica.lag = None
+            return
+        replica.lag = float(lag) if lag is not None else 0.0
+        replica.healthy = replica.lag <= self.max_lag
+
+    async def check_health(self) -> None:
+        """Проверяет доступность и отставание всех реплик."""
+        await asyncio.gather(
+            *(self.check_replica(replica) for replica in self.replicas)
+        )
+
+    async def _run_health_checks(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    def start(self, interval: float = settings.DB_REPLICA_CHECK_INTERVAL):
+        """Запускает периодическую проверку реплик."""
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(
+                self._run_health_checks(interval)
+            )
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+if settings.MODE != "TEST" and settings.DB_REPLICA_URLS:
+    replica_router: Optional[ReplicaRouter] = ReplicaRouter(
+        [Replica(url, **DATABASE_PARAMS) for url in settings.DB_REPLICA_URLS],
+        policy=settings.DB_REPLICA_POLICY,
+    )
+else:
+    replica_router = None
+
+
+class RoutingSession(Session):
+    """Сессия, направляющая чтение на реплики.
+
+    SELECT без FOR UPDATE выполняются на реплике, выбранной при первом
+    чтении в сессии. Любая запись закрепляет сессию за основной БД, и
+    все последующие запросы сессии (в т.ч. чтение) видят свои изменения.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        router = replica_router
+        if router is None or self.info.get("pinned_to_primary"):
+            return super().get_bind(mapper, clause=clause, **kw)
+        is_read = (
+            not self._flushing
+            and clause is not None
+            and getattr(clause, "is_select", False)
+            and getattr(clause, "_for_update_arg", None) is None
+        )
+        if not is_read:
+            self.info["pinned_to_primary"] = True
+            return super().get_bind(mapper, clause=clause, **kw)
+        replica = self.info.get("replica")
+        if replica is None or not replica.healthy:
+            replica = router.choose()
+            self.info["replica"] = replica
+        if replica is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+        return replica.engine.sync_engine
+
+
+async_session_maker = async_sessionmaker(
+    engine, expire_on_commit=False, sync_session_class=RoutingSession
+)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Сессия БД (unit of work) на время обработки запроса.
+
+    Все DAO-вызовы в рамках запроса выполняются в одной транзакции,
+    которая фиксируется при успешном завершении обработчика и
+    откатывается при исключении.
+    """
     async with async_session_maker() as session:
+        async with session.begin():
+            yield session
+        await run_commit_callbacks(session)
+
+
+@asynccontextmanager
+async def session_scope(
+    session: Optional[AsyncSession] = None,
+) -> AsyncIterator[AsyncSession]:
+    """Сессия для DAO-вызова.
+
+    Args:
+        session: Сессия запроса. Если не задана, открывается отдельная
+            сессия с собственной транзакцией.
+    """
+    if session is not None:
         yield session
+        return
+    async with async_session_maker() as session:
+        async with session.begin():
+            yield session
+        await run_commit_callbacks(session)
+
+
+def pin_to_primary(session: AsyncSession) -> None:
+    """Направлять все запросы сессии на основную БД.
+
+    Для чтения, которое должно видеть последние зафиксированные данные
+    (реплика может отставать).
+    """
+    session.info["pinned_to_primary"] = True
+
+
+async def after_commit(
+    session: Optional[AsyncSession],
+    callback: Callable[[], Awaitable[Any]],
+) -> None:
+    """Выполнить действие после фиксации транзакции сессии.
+
+    Используется для обновления внешних хранилищ (кэша), которые не должны
+    видеть незафиксированные изменения. Если сессия не задана или не
+    находится в транзакции, действие выполняется сразу. При откате
+    транзакции отложенные действия отбрасываются вместе с сессией.
+
+    Args:
+        session: Сессия запроса.
+        callback: Асинхронная функция без аргументов.
+    """
+    if session is None or not session.in_transaction():
+        await callback()
+        return
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def run_commit_callbacks(session: AsyncSession) -> None:
+    """Выполнить действия, отложенные до фиксации транзакции."""
+    for callback in session.info.pop("after_commit", []):
+        await callback()
+
+
+async def prewarm_pool(engine: AsyncEngine, size: int) -> int:
+    """Заранее открывает соединения пула.
+
+    Args:
+        engine: Движок, пул которого прогревается.
+        size: Желаемое количество соединений.
+
+    Returns:
+        Количество открытых соединений.
+    """
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return 0
+    size = min(size, pool.size())
+    if size <= 0:
+        return 0
+    connections = await asyncio.gather(
+        *(engine.connect() for _ in range(size))
+    )
+    for connection in connections:
+        await connection.close()
+    return len(connections)
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict[str, Any]:
+    """Текущее состояние пула соединений движка.
+
+    Args:
+        engine: Движок, для которого собирается статистика.
+
+    Returns:
+        Словарь со значениями счетчиков пула.
+    """
+    pool = engine.pool
+    result: dict[str, Any] = {"pool_class": type(pool).__name__}
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return result
+    result.update(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+    )
+    stats = getattr(pool, "stats", None)
+    if isinstance(stats, PoolStats):
+        result.update(
+            waiting=stats.waiting,
+            checkouts=stats.checkouts,
+            timeouts=stats.timeouts,
+            wait_time_avg=(
+                stats.wait_time_total / stats.checkouts
+                if stats.checkouts
+                else 0.0
+            ),
+            wait_time_max=stats.wait_time_max,
+        )
+    return result
+
+
+def get_replicas_stats() -> list[dict[str, Any]]:
+    """Состояние реплик для чтения."""
+    if replica_router is None:
+        return []
+    return [
+        {
+            "url": replica.display_url,
+            "healthy": replica.healthy,
+            "lag": replica.lag,
+            "checked_out": replica.checked_out,
+        }
+        for replica in replica_router.replicas
+    ]
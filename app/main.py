@@ -1,15 +1,36 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
 from app.api import routers
 from app.config import settings
+from app.database import engine, prewarm_pool, replica_router
+from app.services.cache_warmup import cache_warmup
+from app.services.password import password_hasher
 from app.services.redis_cache import init_redis_cache
+from app.services.token_cache import token_cache
+from app.services.user_import import user_import_jobs
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_redis_cache()
+    cache_backend = init_redis_cache()
+    cache_backend.add_invalidation_listener(token_cache.invalidate)
+    cache_backend.start()
+    await prewarm_pool(engine, settings.DB_POOL_PREWARM)
+    if replica_router is not None:
+        await replica_router.check_health()
+        replica_router.start()
+    if settings.CACHE_WARMUP_ENABLED:
+        cache_warmup.start()
     yield
+    await user_import_jobs.stop()
+    await cache_warmup.stop()
+    if replica_router is not None:
+        await replica_router.stop()
+    await cache_backend.stop()
+    password_hasher.shutdown()
+    await engine.dispose()
 
 
 app = FastAPI(
@@ -22,4 +43,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# адрес клиента из X-Forwarded-For, если запрос пришел от доверенного
+# прокси (gateway); по нему ограничиваются попытки входа
+app.add_middleware(
+    ProxyHeadersMiddleware, trusted_hosts=settings.FORWARDED_ALLOW_IPS
+)
+
 app.include_router(routers.v1)
@@ -1,6 +1,7 @@
-from typing import TYPE_CHECKING
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import ForeignKey, Integer
+from sqlalchemy import DateTime, ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, pk_type
@@ -19,7 +20,12 @@ class ReferralCode(Base):
         primary_key=True,
         autoincrement=True,
     )
-    code: Mapped[str]
+    # проверка кода - поиск по уникальному индексу
+    code: Mapped[str] = mapped_column(String, unique=True, index=True)
+    # None - срок не ограничен (или задан в самом коде формата JWT)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True)
+    )
     user_id: Mapped[pk_type] = mapped_column(
         ForeignKey("user.id", ondelete="CASCADE"), unique=True
     )
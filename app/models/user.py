@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy import ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, pk_type
@@ -9,6 +9,11 @@ from app.models.referral_code import ReferralCode
 
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        # выборка рефералов по referrer_id с keyset-пагинацией по id
+        Index("ix_user_referrer_id", "referrer_id", "id"),
+    )
+
     id: Mapped[pk_type] = mapped_column(
         Integer,
         primary_key=True,
@@ -1,8 +1,14 @@
 from typing import Annotated, List, Optional
+from fastapi import Query
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, SecretStr
 
+from app.config import settings
 
 UserEmail = Annotated[EmailStr, Field(description="email адрес")]
+PageLimitQuery = Annotated[
+    int,
+    Query(ge=1, le=settings.REFERRALS_PAGE_SIZE_MAX, title="Размер страницы"),
+]
 
 
 class Token(BaseModel):
@@ -15,12 +21,31 @@ class ReferralReadDTO(BaseModel):
     id: Annotated[int, Field(description="Идентификатор реферала")]
     email: UserEmail
 
+    @classmethod
+    def from_row(cls, row: tuple[int, str]) -> "ReferralReadDTO":
+        """Создает DTO из строки (id, email) без повторной валидации.
+
+        email проверяется при регистрации пользователя, поэтому данные из
+        БД считаются корректными.
+        """
+        id, email = row
+        return cls.model_construct(id=id, email=email)
+
 
 class ReferralsListDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     referrals: Annotated[List[ReferralReadDTO], Field(description="Рефералы")]
 
 
+class ReferralsPageDTO(ReferralsListDTO):
+    next_cursor: Annotated[
+        Optional[str], Field(description="Курсор следующей страницы")
+    ] = None
+    total: Annotated[
+        Optional[int], Field(description="Общее количество рефералов")
+    ] = None
+
+
 class UserReadDTO(ReferralsListDTO):
     model_config = ConfigDict(from_attributes=True)
     id: Annotated[int, Field(description="Идентификатор пользователя")]
@@ -30,6 +55,14 @@ class UserReadDTO(ReferralsListDTO):
     ]
 
 
+class UserPrincipalDTO(BaseModel):
+    """Аутентифицированный пользователь."""
+
+    model_config = ConfigDict(from_attributes=True)
+    id: Annotated[int, Field(description="Идентификатор пользователя")]
+    email: UserEmail
+
+
 class UserAuthDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     email: UserEmail
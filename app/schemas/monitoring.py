@@ -0,0 +1,113 @@
+from typing import Annotated, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ReplicaStatsDTO(BaseModel):
+    """Состояние реплики БД для чтения."""
+
+    url: Annotated[str, Field(description="Адрес реплики")]
+    healthy: Annotated[bool, Field(description="Реплика исправна")]
+    lag: Annotated[
+        Optional[float], Field(description="Отставание реплики (с)")
+    ] = None
+    checked_out: Annotated[int, Field(description="Выданных соединений")]
+
+
+class DbPoolStatsDTO(BaseModel):
+    """Состояние пула соединений с БД."""
+
+    pool_class: Annotated[str, Field(description="Класс пула соединений")]
+    size: Annotated[Optional[int], Field(description="Размер пула")] = None
+    checked_in: Annotated[
+        Optional[int], Field(description="Свободных соединений")
+    ] = None
+    checked_out: Annotated[
+        Optional[int], Field(description="Выданных соединений")
+    ] = None
+    overflow: Annotated[
+        Optional[int], Field(description="Соединений сверх размера пула")
+    ] = None
+    waiting: Annotated[
+        Optional[int], Field(description="Ожидающих соединение")
+    ] = None
+    checkouts: Annotated[
+        Optional[int], Field(description="Всего выдач соединений")
+    ] = None
+    timeouts: Annotated[
+        Optional[int], Field(description="Превышений времени ожидания")
+    ] = None
+    wait_time_avg: Annotated[
+        Optional[float], Field(description="Среднее ожидание выдачи (с)")
+    ] = None
+    wait_time_max: Annotated[
+        Optional[float], Field(description="Максимальное ожидание выдачи (с)")
+    ] = None
+
+
+class CacheTierStatsDTO(BaseModel):
+    """Счетчики уровня кэша."""
+
+    tier: Annotated[str, Field(description="Уровень кэша (local, redis)")]
+    hits: Annotated[int, Field(description="Попаданий")]
+    misses: Annotated[int, Field(description="Промахов")]
+    evictions: Annotated[
+        Optional[int], Field(description="Вытеснено по размеру")
+    ] = None
+    size: Annotated[Optional[int], Field(description="Записей")] = None
+    maxsize: Annotated[
+        Optional[int], Field(description="Максимум записей")
+    ] = None
+
+
+class CacheWarmupDTO(BaseModel):
+    """Ход прогрева кэша."""
+
+    status: Annotated[
+        Literal["idle", "running", "done", "failed"],
+        Field(description="Состояние прогрева"),
+    ]
+    total: Annotated[int, Field(description="Рефереров к загрузке")]
+    processed: Annotated[int, Field(description="Загружено рефереров")]
+    started_at: Annotated[
+        Optional[float], Field(description="Время начала (unix time)")
+    ] = None
+    finished_at: Annotated[
+        Optional[float], Field(description="Время окончания (unix time)")
+    ] = None
+    error: Annotated[Optional[str], Field(description="Ошибка")] = None
+
+
+class CircuitBreakerStatsDTO(BaseModel):
+    """Состояние размыкателя цепи."""
+
+    name: Annotated[str, Field(description="Защищаемый сервис")]
+    state: Annotated[
+        Literal["closed", "open", "half_open"],
+        Field(description="Состояние цепи"),
+    ]
+    failure_rate: Annotated[
+        float, Field(description="Доля ошибок в окне последних вызовов")
+    ]
+    calls: Annotated[int, Field(description="Выполнено вызовов")]
+    failures: Annotated[int, Field(description="Ошибок (в т.ч. таймаутов)")]
+    timeouts: Annotated[int, Field(description="Таймаутов")]
+    rejected: Annotated[int, Field(description="Отклонено вызовов")]
+    opened: Annotated[int, Field(description="Размыканий цепи")]
+    pending_deletes: Annotated[
+        int, Field(description="Ключей, ожидающих удаления")
+    ]
+    pending_flush: Annotated[
+        bool, Field(description="Ожидается очистка всего кэша")
+    ]
+
+
+class LoginThrottleStatsDTO(BaseModel):
+    """Ограничение попыток входа и регистрации."""
+
+    enabled: Annotated[bool, Field(description="Ограничение включено")]
+    allowed: Annotated[int, Field(description="Разрешено попыток")]
+    rejected: Annotated[
+        dict[str, int],
+        Field(description="Отклонено попыток по виду и ключу лимита"),
+    ]
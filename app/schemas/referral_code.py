@@ -13,6 +13,12 @@ class ReferralCodeReadDTO(BaseModel):
     id: Annotated[int, Field(description="Идентификатор")]
     code: Annotated[str, Field(description="Реферальный код")]
 
+    @classmethod
+    def from_row(cls, row: tuple[int, str]) -> "ReferralCodeReadDTO":
+        """Создает DTO из строки (id, code) без повторной валидации."""
+        id, code = row
+        return cls.model_construct(id=id, code=code)
+
 
 class ReferralCodeWriteDTO(BaseModel):
     """Реферальный код для записи."""
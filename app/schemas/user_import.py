@@ -0,0 +1,95 @@
+from typing import Annotated, List, Literal, Optional
+
+from fastapi import Query
+from pydantic import BaseModel, Field, model_validator
+
+from app.common.constants import Messages
+from app.schemas.auth import UserEmail
+
+ImportFormatQuery = Annotated[
+    Literal["csv", "ndjson"], Query(title="Формат файла импорта")
+]
+
+
+class UserImportRowDTO(BaseModel):
+    """Строка файла импорта пользователей."""
+
+    email: UserEmail
+    password: Annotated[Optional[str], Field(description="Пароль")] = None
+    hashed_password: Annotated[
+        Optional[str], Field(description="Хэш пароля")
+    ] = None
+    referral_code: Annotated[
+        Optional[str], Field(description="Реферальный код реферера")
+    ] = None
+
+    @model_validator(mode="after")
+    def check_password(self) -> "UserImportRowDTO":
+        if not self.password and not self.hashed_password:
+            raise ValueError(Messages.IMPORT_PASSWORD_REQUIRED)
+        return self
+
+
+class UserImportErrorDTO(BaseModel):
+    """Ошибка разбора строки файла импорта."""
+
+    line: Annotated[int, Field(description="Номер строки")]
+    error: Annotated[str, Field(description="Описание ошибки")]
+
+
+class UserImportBatchDTO(BaseModel):
+    """Результат загрузки пакета пользователей."""
+
+    batch: Annotated[int, Field(description="Номер пакета")]
+    received: Annotated[int, Field(description="Получено корректных строк")]
+    inserted: Annotated[int, Field(description="Добавлено пользователей")]
+    skipped: Annotated[int, Field(description="Пропущено (email занят)")]
+    unresolved_referral_codes: Annotated[
+        int, Field(description="Нераспознанных реферальных кодов")
+    ]
+    elapsed: Annotated[float, Field(description="Время загрузки (с)")]
+
+
+class UserImportReportDTO(BaseModel):
+    """Отчет об импорте пользователей."""
+
+    batches: Annotated[
+        List[UserImportBatchDTO], Field(description="Загруженные пакеты")
+    ] = []
+    errors: Annotated[
+        List[UserImportErrorDTO], Field(description="Ошибки разбора строк")
+    ] = []
+    invalid: Annotated[int, Field(description="Некорректных строк")] = 0
+    received: Annotated[int, Field(description="Корректных строк")] = 0
+    inserted: Annotated[int, Field(description="Добавлено пользователей")] = 0
+
+
+class UserImportJobDTO(BaseModel):
+    """Фоновая задача импорта пользователей и ее ход."""
+
+    id: Annotated[str, Field(description="Идентификатор задачи")]
+    status: Annotated[
+        Literal["queued", "running", "done", "failed"],
+        Field(description="Состояние задачи"),
+    ] = "queued"
+    file_format: Annotated[
+        Literal["csv", "ndjson"], Field(description="Формат файла")
+    ]
+    created_at: Annotated[float, Field(description="Время создания (unix)")]
+    started_at: Annotated[
+        Optional[float], Field(description="Время запуска (unix)")
+    ] = None
+    updated_at: Annotated[
+        Optional[float], Field(description="Время последнего обновления")
+    ] = None
+    finished_at: Annotated[
+        Optional[float], Field(description="Время завершения (unix)")
+    ] = None
+    error: Annotated[Optional[str], Field(description="Ошибка задачи")] = None
+    report: Annotated[
+        UserImportReportDTO,
+        Field(
+            default_factory=UserImportReportDTO,
+            description="Загруженные к этому моменту пакеты",
+        ),
+    ]
@@ -1,95 +1,229 @@
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, Optional
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.constants import LogMessages
+from app.common.constants import CacheKeys, LogMessages
 from app.common.exceptions import (
     AuthorizationErrorException,
+    ForbiddenException,
+    ReferralCodeNotFoundException,
     UserAlreadyExistsException,
 )
+from app.common.pagination import encode_cursor
 from app.config import settings
 from app.crud.user_dao import UserDAO
+from app.database import after_commit, get_async_session, session_scope
 from app.logger import logger
 from app.models.user import User
-from app.schemas.auth import ReferralsListDTO, UserCreateDTO, UserReadDTO
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.schemas.auth import (
+    ReferralReadDTO,
+    ReferralsListDTO,
+    ReferralsPageDTO,
+    UserCreateDTO,
+    UserPrincipalDTO,
+    UserReadDTO,
+)
+from app.services.cache import cached, delete_cached, get_entry, set_cached
+from app.services.password import (  # noqa: F401
+    get_password_hash,
+    password_hasher,
+    pwd_context,
+    verify_password,
+)
+from app.services.referral_code import ReferralCodeService
+from app.services.token_cache import hash_token, token_cache
+from app.services.token_codec import TokenError, token_codec
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password, hashed_password) -> bool:
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except ValueError as e:
-        logger.exception(e, exc_info=True)
-    return False
-
-
 class AuthService:
     @classmethod
     async def register(
         cls,
         user_data: UserCreateDTO,
-        referrer_id: int | None = None,
+        referral_code: Optional[str] = None,
+        session: Optional[AsyncSession] = None,
     ):
         """Регистрация нового пользователя.
 
+        Пользователь создается одним запросом INSERT ... ON CONFLICT
+        (email) DO NOTHING: занятый email, в том числе при одновременной
+        регистрации, определяется по пустому RETURNING. Хэш пароля
+        вычисляется до обращения к БД, поэтому соединение не занято на
+        время хэширования; проверка реферального кода и создание
+        пользователя выполняются в одной транзакции.
+
         Args:
             user_data: Учетные данные пользователя.
-            referrer_id: Уникальный идентификатор реферера.
+            referral_code: Реферальный код реферера. Ненайденный код
+                игнорируется.
+            session: Сессия. Если не задана, открывается отдельная
+                сессия после вычисления хэша.
         Raises:
             UserAlreadyExistsException: При регистрации на имеющийся email.
+            ReferralCodeExpiredException: Если время жизни кода истекло.
+            PasswordHashingBusyException: Пул хэширования паролей перегружен.
         """
-        existing_user = await UserDAO.get_one_or_none(email=user_data.email)
-        if existing_user:
-            logger.info(LogMessages.RE_REGISRATION.format(user_data.email))
-            raise UserAlreadyExistsException()
-        hashed_password = get_password_hash(
+        hashed_password = await password_hasher.hash(
             user_data.password.get_secret_value()
         )
-        await UserDAO.create(
-            email=user_data.email,
-            hashed_password=hashed_password,
-            referrer_id=referrer_id,
-        )
-        logger.info(LogMessages.NEW_REGISTRATION.format(user_data.email))
+        async with session_scope(session) as session:
+            referrer_id = None
+            if referral_code:
+                try:
+                    referrer_id = (
+                        await ReferralCodeService.get_referrer_user_id(
+                            referral_code, session
+                        )
+                    )
+                except ReferralCodeNotFoundException as e:
+                    logger.exception(e, exc_info=True)
+            user_id = await UserDAO.create_if_not_exists(
+                user_data.email, hashed_password, referrer_id, session
+            )
+            if user_id is None:
+                logger.info(LogMessages.RE_REGISRATION.format(user_data.email))
+                raise UserAlreadyExistsException()
+            logger.info(LogMessages.NEW_REGISTRATION.format(user_data.email))
+            # отрицательная запись для email нового пользователя и счетчик
+            # рефералов реферера больше не актуальны
+            stale_keys = [
+                CacheKeys.REFERRAL_CODE_BY_EMAIL.format(email=user_data.email)
+            ]
+            if referrer_id is not None:
+                stale_keys.append(
+                    CacheKeys.REFERRALS_COUNT.format(referrer_id=referrer_id)
+                )
+            await after_commit(session, lambda: delete_cached(*stale_keys))
 
     @classmethod
     async def authenticate_user(
         cls, email: EmailStr, password: str
     ) -> Optional[User]:
-        user = await UserDAO.get_one_or_none(email=email)
-        if user and verify_password(password, user.hashed_password):
-            logger.info(LogMessages.AUTHENTICATED.format(email))
-            return user
-        logger.info(LogMessages.AUTHENTICATION_FAILED.format(email))
-        return None
+        """Проверка учетных данных пользователя.
+
+        Пользователь читается в отдельной короткой транзакции, и
+        соединение с БД возвращается в пул до проверки пароля. Хэш,
+        вычисленный по устаревшей политике (другой схемой или с меньшей
+        стоимостью), при успешной проверке пересчитывается и записывается
+        одним UPDATE в своей транзакции.
+
+        Args:
+            email: Email пользователя.
+            password: Пароль.
+
+        Returns:
+            Пользователь или None, если учетные данные неверны.
+        """
+        user = await UserDAO.get_by_email(email)
+        verified, new_hash = False, None
+        if user:
+            verified, new_hash = await password_hasher.verify_and_update(
+                password, user.hashed_password
+            )
+        if not verified:
+            logger.info(LogMessages.AUTHENTICATION_FAILED.format(email))
+            return None
+        logger.info(LogMessages.AUTHENTICATED.format(email))
+        if new_hash and await UserDAO.update_password_hash(
+            user.id, user.hashed_password, new_hash
+        ):
+            logger.info(LogMessages.PASSWORD_REHASHED.format(email))
+        return user
 
     @classmethod
-    async def get_user_by_email(cls, email: EmailStr) -> Optional[User]:
-        return await UserDAO.get_one_or_none(email=email)
+    async def get_user_by_email(
+        cls, email: EmailStr, session: Optional[AsyncSession] = None
+    ) -> Optional[User]:
+        return await UserDAO.get_by_email(email, session)
 
     @classmethod
     async def get_users_by_referrer_id(
-        cls, referrer_id: int
+        cls, referrer_id: int, session: Optional[AsyncSession] = None
     ) -> ReferralsListDTO:
-        users = await UserDAO.get_all(referrer_id=referrer_id)
-        return ReferralsListDTO(referrals=users)
+        rows = await UserDAO.get_referrals(referrer_id, session)
+        return ReferralsListDTO.model_construct(
+            referrals=[ReferralReadDTO.from_row(row) for row in rows]
+        )
+
+    @classmethod
+    async def get_referrals_page(
+        cls,
+        referrer_id: int,
+        after_id: Optional[int] = None,
+        limit: int = settings.REFERRALS_PAGE_SIZE,
+        with_total: bool = False,
+        session: Optional[AsyncSession] = None,
+    ) -> ReferralsPageDTO:
+        """Страница рефералов с курсорной (keyset) пагинацией.
+
+        Args:
+            referrer_id: Идентификатор реферера.
+            after_id: Идентификатор последнего реферала предыдущей страницы.
+            limit: Размер страницы.
+            with_total: Вернуть общее количество рефералов.
+            session: Сессия запроса.
+
+        Returns:
+            ReferralsPageDTO: Рефералы и курсор следующей страницы.
+        """
+        rows = await UserDAO.get_referrals_page(
+            referrer_id, after_id, limit + 1, session
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].id)
+        total = None
+        if with_total:
+            total = await cls.count_referrals(referrer_id, session)
+        return ReferralsPageDTO(
+            referrals=[ReferralReadDTO.from_row(row) for row in rows],
+            next_cursor=next_cursor,
+            total=total,
+        )
+
+    @classmethod
+    @cached(CacheKeys.REFERRALS_COUNT)
+    async def count_referrals(
+        cls, referrer_id: int, session: Optional[AsyncSession] = None
+    ) -> int:
+        """Количество рефералов реферера.
+
+        Args:
+            referrer_id: Идентификатор реферера.
+            session: Сессия запроса.
+        """
+        return await UserDAO.count_referrals(referrer_id, session)
 
     @classmethod
     def user_info(cls, user: User) -> UserReadDTO:
         return UserReadDTO.model_validate(user)
 
+    @classmethod
+    async def get_user_info(
+        cls, user_id: int, session: Optional[AsyncSession] = None
+    ) -> UserReadDTO:
+        """Полная информация о пользователе с реферером и рефералами.
+
+        Args:
+            user_id: Идентификатор пользователя.
+            session: Сессия запроса.
+
+        Raises:
+            AuthorizationErrorException: Если пользователь не найден.
+        """
+        user = await UserDAO.get_by_id(user_id, session)
+        if user is None:
+            raise AuthorizationErrorException()
+        return cls.user_info(user)
+
     @classmethod
     def create_access_token(cld, user: User) -> str:
         to_encode = {"sub": str(user.id)}
@@ -97,26 +231,108 @@ class AuthService:
             seconds=settings.JWT_LIFETIME_SECONDS
         )
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, settings.ALGORITHM
+        return token_codec.encode(to_encode)
+
+    @classmethod
+    def decode_access_token(cls, token: str) -> dict:
+        try:
+            return token_codec.decode(token)
+        except TokenError:
+            raise AuthorizationErrorException()
+
+    @classmethod
+    async def verify_access_token(cls, token: str) -> int:
+        """Проверяет токен доступа.
+
+        Проверенные токены кэшируются в памяти процесса до истечения
+        срока, поэтому подпись проверяется один раз на токен.
+
+        Args:
+            token: Токен доступа.
+
+        Returns:
+            Идентификатор пользователя.
+
+        Raises:
+            AuthorizationErrorException: Токен некорректен, истек или
+                отозван.
+        """
+        token_hash = hash_token(token)
+        if settings.AUTH_TOKEN_CACHE_ENABLED:
+            user_id = token_cache.get_user_id(token_hash)
+            if user_id is not None:
+                return user_id
+        payload = cls.decode_access_token(token)
+        user_id_str: str = payload.get("sub")
+        if user_id_str is None:
+            raise AuthorizationErrorException()
+        revoked = token_cache.is_revoked(token_hash) or (
+            await get_entry(
+                CacheKeys.REVOKED_TOKEN.format(token_hash=token_hash)
+            )
+            is not None
         )
-        return encoded_jwt
+        if revoked:
+            raise AuthorizationErrorException()
+        user_id = int(user_id_str)
+        if settings.AUTH_TOKEN_CACHE_ENABLED and "exp" in payload:
+            token_cache.add_token(token_hash, user_id, payload["exp"])
+        return user_id
+
+    @classmethod
+    async def revoke_token(cls, token: str) -> None:
+        """Отзывает токен доступа до истечения его срока.
 
+        Отзыв записывается в Redis и рассылается остальным воркерам через
+        канал инвалидации кэша.
 
-async def current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
+        Args:
+            token: Токен доступа.
+        """
+        payload = cls.decode_access_token(token)
+        token_hash = hash_token(token)
+        exp = payload.get("exp", time.time() + settings.JWT_LIFETIME_SECONDS)
+        token_cache.revoke(token_hash, exp)
+        await set_cached(
+            CacheKeys.REVOKED_TOKEN.format(token_hash=token_hash),
+            True,
+            expire=max(int(exp - time.time()), 1),
         )
-    except JWTError:
-        raise AuthorizationErrorException()
-    user_id_str: str = payload.get("sub")
-    if user_id_str is None:
-        raise AuthorizationErrorException()
-    user_id = int(user_id_str)
-    user = await UserDAO.get_by_id(user_id)
-    if user is None:
-        raise AuthorizationErrorException()
+        logger.info(LogMessages.TOKEN_REVOKED.format(payload.get("sub")))
+
+    @classmethod
+    async def get_principal(
+        cls, user_id: int, session: Optional[AsyncSession] = None
+    ) -> UserPrincipalDTO:
+        """Пользователь с кэшированием в памяти процесса.
+
+        Raises:
+            AuthorizationErrorException: Пользователь не найден.
+        """
+        if settings.AUTH_TOKEN_CACHE_ENABLED:
+            principal = token_cache.get_principal(user_id)
+            if principal is not None:
+                return principal
+        row = await UserDAO.get_principal(user_id, session)
+        if row is None:
+            raise AuthorizationErrorException()
+        principal = UserPrincipalDTO.model_validate(row)
+        if settings.AUTH_TOKEN_CACHE_ENABLED:
+            token_cache.add_principal(principal)
+        return principal
+
+
+async def current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    session: AsyncSession = Depends(get_async_session),
+) -> UserPrincipalDTO:
+    user_id = await AuthService.verify_access_token(token)
+    return await AuthService.get_principal(user_id, session)
+
+
+async def admin_user(
+    user: UserPrincipalDTO = Depends(current_user),
+) -> UserPrincipalDTO:
+    if user.email not in settings.ADMIN_EMAILS:
+        raise ForbiddenException()
     return user
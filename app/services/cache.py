@@ -0,0 +1,555 @@
+import asyncio
+import inspect
+import time
+import types
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Final,
+    Optional,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+
+import orjson
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+from fastapi_cache.coder import Coder
+from pydantic import BaseModel
+
+from app.common.constants import LogMessages
+from app.config import settings
+from app.logger import logger
+
+T = TypeVar("T")
+
+# Значение отрицательной записи: кэшируемые результаты не сериализуются
+# в JSON null
+NOT_FOUND: Final = b"null"
+
+# Загрузки, выполняющиеся в этом процессе, по ключу кэша
+_inflight: dict[str, asyncio.Future] = {}
+
+
+@lru_cache(maxsize=None)
+def get_builder(tp: Any) -> Optional[Callable[[Any], Any]]:
+    """Функция, восстанавливающая значение типа tp из данных JSON.
+
+    Модели pydantic (в т.ч. вложенные и в списках) создаются через
+    model_construct без валидации. None - данные JSON используются как
+    есть.
+    """
+    origin = get_origin(tp)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(tp) if arg is not type(None)]
+        build = get_builder(args[0]) if len(args) == 1 else None
+        if build is None:
+            return None
+        return lambda data: None if data is None else build(data)
+    if origin is list:
+        build = get_builder(get_args(tp)[0])
+        if build is None:
+            return None
+        return lambda data: [build(item) for item in data]
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        model_construct = tp.model_construct
+        nested = {
+            name: build
+            for name, field in tp.model_fields.items()
+            if (build := get_builder(field.annotation)) is not None
+        }
+        if not nested:
+            return lambda data: model_construct(**data)
+
+        def build_model(data: dict) -> BaseModel:
+            for name, build in nested.items():
+                if data.get(name) is not None:
+                    data[name] = build(data[name])
+            return model_construct(**data)
+
+        return build_model
+    return None
+
+
+def default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError
+
+
+class OrjsonCoder(Coder):
+    """Кодек значений кэша на orjson.
+
+    Значения кэша записываются самим приложением, поэтому при чтении
+    модели pydantic не валидируются повторно (это основная часть
+    стоимости декодирования, особенно для полей EmailStr), а создаются
+    через model_construct.
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        return orjson.dumps(value, default=default)
+
+    @classmethod
+    def decode(cls, value: Union[str, bytes]) -> Any:
+        return orjson.loads(value)
+
+    @classmethod
+    def decode_as_type(cls, value: Union[str, bytes], tp: Any) -> Any:
+        data = orjson.loads(value)
+        build = get_builder(tp)
+        return build(data) if build is not None else data
+
+
+@dataclass
+class CacheEntry:
+    """Запись кэша: закодированное значение и срок его свежести.
+
+    В хранилище запись имеет вид "<fresh_until>:<payload>". После
+    fresh_until (unix time, 0 - без ограничения) значение считается
+    устаревшим, но еще CACHE_STALE_TTL секунд хранится и может быть
+    отдано, пока другой воркер обновляет его.
+    """
+
+    payload: bytes
+    fresh_until: float = 0.0
+
+    @property
+    def is_fresh(self) -> bool:
+        return not self.fresh_until or time.time() < self.fresh_until
+
+    @property
+    def is_not_found(self) -> bool:
+        return self.payload == NOT_FOUND
+
+    def dump(self) -> bytes:
+        return b"%.3f:%b" % (self.fresh_until, self.payload)
+
+    @classmethod
+    def load(cls, raw: Union[str, bytes]) -> Optional["CacheEntry"]:
+        if isinstance(raw, str):
+            raw = raw.encode()
+        fresh_until, separator, payload = raw.partition(b":")
+        try:
+            return cls(payload, float(fresh_until)) if separator else None
+        except ValueError:
+            return None
+
+
+def get_cache_backend() -> Optional[Backend]:
+    """Бэкенд кэша или None, если кэш не инициализирован или отключен."""
+    if not FastAPICache.get_enable():
+        return None
+    try:
+        return FastAPICache.get_backend()
+    except AssertionError:
+        return None
+
+
+def build_key(key: str) -> str:
+    """Полный ключ кэша с префиксом приложения.
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+    """
+    return f"{FastAPICache.get_prefix()}:{key}"
+
+
+def get_coder() -> type[Coder]:
+    try:
+        return FastAPICache.get_coder()
+    except AssertionError:
+        return OrjsonCoder
+
+
+def decode(payload: bytes, tp: Any) -> Any:
+    """Декодировать значение кэша в тип tp."""
+    coder = get_coder()
+    decode_as_type = getattr(coder, "decode_as_type", None)
+    if decode_as_type is not None:
+        return decode_as_type(payload, tp)
+    data = coder.decode(payload)
+    build = get_builder(tp)
+    return build(data) if build is not None else data
+
+
+def encode(value: Any) -> bytes:
+    """Закодировать значение кодеком кэша."""
+    payload = get_coder().encode(value)
+    return payload.encode() if isinstance(payload, str) else payload
+
+
+async def get_entry(key: str) -> Optional[CacheEntry]:
+    """Запись кэша или None при промахе и ошибке бэкенда.
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+    """
+    backend = get_cache_backend()
+    if backend is None:
+        return None
+    full_key = build_key(key)
+    try:
+        raw = await backend.get(full_key)
+    except Exception:
+        logger.warning(LogMessages.CACHE_GET_FAILED.format(full_key))
+        return None
+    return CacheEntry.load(raw) if raw is not None else None
+
+
+async def set_raw(
+    key: str, payload: bytes, expire: Optional[int] = None
+) -> None:
+    """Записать сериализованное значение в кэш.
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+        payload: Закодированное значение.
+        expire: Время свежести записи (секунд), 0 или None - без
+            ограничения. Запись хранится еще CACHE_STALE_TTL секунд.
+    """
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    full_key = build_key(key)
+    entry = CacheEntry(payload, time.time() + expire if expire else 0.0)
+    ttl = expire + settings.CACHE_STALE_TTL if expire else None
+    try:
+        await backend.set(full_key, entry.dump(), ttl)
+    except Exception:
+        logger.warning(LogMessages.CACHE_SET_FAILED.format(full_key))
+
+
+async def get_cached(key: str, tp: type[T]) -> Optional[T]:
+    """Значение из кэша или None при промахе и ошибке бэкенда.
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+        tp: Тип сохраненного значения.
+    """
+    entry = await get_entry(key)
+    if entry is None or entry.is_not_found:
+        return None
+    return decode(entry.payload, tp)
+
+
+async def set_cached(
+    key: str, value: Any, expire: Optional[int] = settings.CACHE_EXPIRE
+) -> None:
+    """Записать значение в кэш.
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+        value: Значение, поддерживаемое кодеком кэша.
+        expire: Время жизни записи (секунд), 0 или None - без ограничения.
+    """
+    if get_cache_backend() is None:
+        return
+    await set_raw(key, encode(value), expire)
+
+
+async def add_cached(
+    key: str, value: Any, expire: Optional[int] = settings.CACHE_EXPIRE
+) -> bool:
+    """Записать значение в кэш, только если ключа в нем нет.
+
+    В отличие от set_cached не заменяет значение, записанное при
+    изменении данных, поэтому подходит для фоновой загрузки (прогрева).
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+        value: Значение, поддерживаемое кодеком кэша.
+        expire: Время жизни записи (секунд), 0 или None - без ограничения.
+
+    Returns:
+        True, если значение записано.
+    """
+    backend = get_cache_backend()
+    if backend is None:
+        return False
+    full_key = build_key(key)
+    entry = CacheEntry(encode(value), time.time() + expire if expire else 0.0)
+    ttl = expire + settings.CACHE_STALE_TTL if expire else None
+    try:
+        add = getattr(backend, "add", None)
+        if add is not None:
+            return await add(full_key, entry.dump(), ttl)
+        if await backend.get(full_key) is not None:
+            return False
+        await backend.set(full_key, entry.dump(), ttl)
+        return True
+    except Exception:
+        logger.warning(LogMessages.CACHE_SET_FAILED.format(full_key))
+        return False
+
+
+async def add_cached_many(
+    values: dict[str, Any], expire: Optional[int] = settings.CACHE_EXPIRE
+) -> int:
+    """Записать значения отсутствующих в кэше ключей.
+
+    Как add_cached, но для бэкенда с add_many все значения записываются
+    одним обращением (конвейером Redis).
+
+    Args:
+        values: Ключ, построенный по шаблону из CacheKeys -> значение.
+        expire: Время жизни записей (секунд), 0 или None - без ограничения.
+
+    Returns:
+        Количество записанных значений.
+    """
+    backend = get_cache_backend()
+    if backend is None or not values:
+        return 0
+    add_many = getattr(backend, "add_many", None)
+    if add_many is None:
+        return sum(
+            [
+                await add_cached(key, value, expire)
+                for key, value in values.items()
+            ]
+        )
+    fresh_until = time.time() + expire if expire else 0.0
+    entries = {
+        build_key(key): CacheEntry(encode(value), fresh_until).dump()
+        for key, value in values.items()
+    }
+    ttl = expire + settings.CACHE_STALE_TTL if expire else None
+    try:
+        return await add_many(entries, ttl)
+    except Exception:
+        logger.warning(LogMessages.CACHE_SET_FAILED.format(", ".join(entries)))
+        return 0
+
+
+async def delete_cached(*keys: str) -> None:
+    """Удалить записи кэша.
+
+    Args:
+        keys: Ключи, построенные по шаблонам из CacheKeys.
+    """
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    for key in keys:
+        full_key = build_key(key)
+        try:
+            await backend.clear(key=full_key)
+        except Exception:
+            logger.warning(LogMessages.CACHE_DELETE_FAILED.format(full_key))
+
+
+async def acquire_lock(key: str) -> Optional[str]:
+    """Захватить блокировку обновления ключа между воркерами.
+
+    Args:
+        key: Ключ, построенный по шаблону из CacheKeys.
+
+    Returns:
+        Токен блокировки; "" если бэкенд не поддерживает блокировки или
+        недоступен; None, если блокировку удерживает другой воркер.
+    """
+    backend = get_cache_backend()
+    acquire = getattr(backend, "acquire_lock", None)
+    if acquire is None:
+        return ""
+    full_key = build_key(key)
+    try:
+        return await acquire(full_key, settings.CACHE_LOCK_TIMEOUT)
+    except Exception:
+        logger.warning(LogMessages.CACHE_LOCK_FAILED.format(full_key))
+        return ""
+
+
+async def release_lock(key: str, token: str) -> None:
+    """Освободить блокировку, захваченную acquire_lock."""
+    backend = get_cache_backend()
+    release = getattr(backend, "release_lock", None)
+    if release is None or not token:
+        return
+    full_key = build_key(key)
+    try:
+        await release(full_key, token)
+    except Exception:
+        logger.warning(LogMessages.CACHE_LOCK_FAILED.format(full_key))
+
+
+async def throttle(
+    limits: dict[str, tuple[int, float]]
+) -> Optional[tuple[str, float]]:
+    """Списать попытку из корзин маркеров (ограничение частоты).
+
+    При отсутствии бэкенда с поддержкой ограничения или его ошибке
+    попытка разрешается.
+
+    Args:
+        limits: Ключ корзины (по шаблону из CacheKeys) -> (число попыток,
+            период восстановления всех попыток в секундах).
+
+    Returns:
+        None, если попытка разрешена, иначе ключ исчерпанной корзины и
+        время до следующей разрешенной попытки (секунд).
+    """
+    backend = get_cache_backend()
+    check = getattr(backend, "throttle", None)
+    if check is None or not limits:
+        return None
+    full_limits = {build_key(key): limit for key, limit in limits.items()}
+    try:
+        rejected, wait = await check(full_limits)
+    except Exception:
+        logger.warning(LogMessages.CACHE_THROTTLE_FAILED)
+        return None
+    if not rejected:
+        return None
+    return list(limits)[rejected - 1], wait
+
+
+async def wait_for_entry(key: str) -> Optional[CacheEntry]:
+    """Ждать свежую запись от другого воркера не дольше CACHE_LOCK_WAIT."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+        entry = await get_entry(key)
+        if entry is not None and entry.is_fresh:
+            return entry
+    return None
+
+
+async def single_flight(key: str, load: Callable[[], Awaitable[T]]) -> T:
+    """Объединяет одновременные загрузки ключа в процессе.
+
+    Первый вызов выполняет load, остальные ожидают его результат (или
+    исключение). Если первый вызов отменен, ожидающие загружают сами.
+
+    Args:
+        key: Ключ загрузки.
+        load: Асинхронная функция загрузки значения.
+    """
+    future = _inflight.get(key)
+    if future is not None:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            return await load()
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        value = await load()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # исключение получат ожидающие, если они есть
+        future.exception()
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        del _inflight[key]
+
+
+def cached(
+    key: str,
+    expire: Optional[int] = settings.CACHE_EXPIRE,
+    not_found: Optional[type[Exception]] = None,
+    not_found_expire: int = settings.CACHE_NOT_FOUND_EXPIRE,
+    store_found: bool = True,
+) -> Callable[[Callable], Callable]:
+    """Кэширует результат асинхронной функции под стабильным ключом.
+
+    Ключ строится подстановкой аргументов вызова в шаблон (например,
+    CacheKeys.REFERRAL_CODE_BY_USER_ID), поэтому не зависит от repr
+    класса или сессии и может быть обновлен или удален при записи.
+    Значение десериализуется в тип, указанный в аннотации результата.
+    Если кэш не инициализирован или цепь Redis разомкнута, функция
+    вызывается напрямую.
+
+    Если задано исключение not_found, то его возникновение также
+    кэшируется (отрицательный кэш) на not_found_expire секунд, и
+    повторные вызовы с теми же аргументами возбуждают его без обращения к
+    функции.
+
+    При промахе одновременные вызовы в процессе ожидают одну загрузку, а
+    между воркерами загрузку выполняет владелец блокировки в Redis.
+    Остальные воркеры отдают устаревшее значение, если оно есть, или ждут
+    записи нового.
+
+    Args:
+        key: Шаблон ключа с именами аргументов функции.
+        expire: Время жизни записи (секунд), 0 или None - без ограничения.
+        not_found: Исключение "не найдено" для отрицательного кэша.
+        not_found_expire: Время жизни отрицательной записи (секунд).
+        store_found: Кэшировать ли успешные результаты.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        return_type = get_type_hints(func)["return"]
+        cached_exceptions = (not_found,) if not_found else ()
+
+        def usable(entry: Optional[CacheEntry]) -> bool:
+            if entry is None:
+                return False
+            if entry.is_not_found:
+                return not_found is not None
+            return store_found
+
+        def unpack(entry: CacheEntry) -> Any:
+            if entry.is_not_found:
+                raise not_found()
+            return decode(entry.payload, return_type)
+
+        async def load(
+            cache_key: str, stale: Optional[CacheEntry], *args, **kwargs
+        ) -> Any:
+            token = await acquire_lock(cache_key)
+            if token is None:
+                # запись обновляет другой воркер
+                if usable(stale):
+                    return unpack(stale)
+                entry = await wait_for_entry(cache_key)
+                if usable(entry):
+                    return unpack(entry)
+            try:
+                try:
+                    value = await func(*args, **kwargs)
+                except cached_exceptions:
+                    await set_raw(cache_key, NOT_FOUND, not_found_expire)
+                    raise
+                if store_found:
+                    await set_cached(cache_key, value, expire)
+                return value
+            finally:
+                if token:
+                    await release_lock(cache_key, token)
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            backend = get_cache_backend()
+            if backend is None or getattr(backend, "is_open", False):
+                # кэш недоступен: сразу к источнику данных
+                return await func(*args, **kwargs)
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            cache_key = key.format(**arguments.arguments)
+            entry = await get_entry(cache_key)
+            if usable(entry) and entry.is_fresh:
+                return unpack(entry)
+            return await single_flight(
+                cache_key, lambda: load(cache_key, entry, *args, **kwargs)
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Literal, Optional, Sequence
+
+from sqlalchemy import Row
+
+from app.common.constants import CacheKeys, LogMessages
+from app.config import settings
+from app.crud.referral_code_dao import ReferralCodeDAO
+from app.crud.user_dao import UserDAO
+from app.database import pin_to_primary, session_scope
+from app.logger import logger
+from app.schemas.referral_code import ReferralCodeReadDTO
+from app.services.cache import add_cached_many, delete_cached
+
+
+@dataclass
+class WarmupProgress:
+    """Ход прогрева кэша."""
+
+    status: Literal["idle", "running", "done", "failed"] = "idle"
+    total: int = 0
+    processed: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+class CacheWarmup:
+    """Прогрев кэша данными самых активных рефереров.
+
+    В кэш загружаются реферальные коды (по id, пользователю и email) и
+    количество рефералов рефереров с наибольшим числом рефералов. Рефереры
+    обрабатываются пакетами, одновременно выполняется не более
+    concurrency пакетов (каждый в своей сессии БД). Значения записываются
+    только в отсутствующие ключи и не заменяют записанные при изменении
+    данных.
+    """
+
+    def __init__(
+        self,
+        top: int = settings.CACHE_WARMUP_TOP_REFERRERS,
+        batch_size: int = settings.CACHE_WARMUP_BATCH_SIZE,
+        concurrency: int = settings.CACHE_WARMUP_CONCURRENCY,
+    ) -> None:
+        self.top = top
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.progress = WarmupProgress()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Прогрев не выполняется: завершен, прерван или не запускался."""
+        return self.progress.status != "running"
+
+    @staticmethod
+    def cache_values(
+        codes: Sequence[Row], counts: Sequence[Row]
+    ) -> dict[str, Any]:
+        """Значения кэша для строк кодов и количества рефералов.
+
+        Args:
+            codes: Строки (id, code, user_id, email).
+            counts: Строки (referrer_id, referrals).
+        """
+        values: dict[str, Any] = {}
+        for id, code, user_id, email in codes:
+            referral_code = ReferralCodeReadDTO.from_row((id, code))
+            values[CacheKeys.REFERRAL_CODE_BY_ID.format(id=id)] = referral_code
+            values[
+                CacheKeys.REFERRAL_CODE_BY_USER_ID.format(user_id=user_id)
+            ] = referral_code
+            values[CacheKeys.REFERRAL_CODE_BY_EMAIL.format(email=email)] = (
+                referral_code
+            )
+        for referrer_id, referrals in counts:
+            values[
+                CacheKeys.REFERRALS_COUNT.format(referrer_id=referrer_id)
+            ] = referrals
+        return values
+
+    async def warm_batch(self, referrers: Sequence[Row]) -> None:
+        """Загружает в кэш коды и количество рефералов пакета рефереров.
+
+        Значения пакета записываются одним конвейером. Код, удаленный или
+        замененный между чтением и записью, мог бы попасть в кэш уже после
+        удаления своего ключа, поэтому после записи данные пакета читаются
+        повторно из основной БД и ключи изменившихся значений удаляются.
+        Изменение, зафиксированное после повторного чтения, удаляет свой
+        ключ уже после записи прогрева.
+
+        Args:
+            referrers: Строки (referrer_id, referrals).
+        """
+        referrer_ids = [referrer_id for referrer_id, _ in referrers]
+        codes = await ReferralCodeDAO.get_codes_by_user_ids(referrer_ids)
+        values = self.cache_values(codes, referrers)
+        await add_cached_many(values)
+        async with session_scope() as session:
+            pin_to_primary(session)
+            current = self.cache_values(
+                await ReferralCodeDAO.get_codes_by_user_ids(
+                    referrer_ids, session
+                ),
+                await UserDAO.count_referrals_by_ids(referrer_ids, session),
+            )
+        stale = [
+            key for key, value in values.items() if current.get(key) != value
+        ]
+        if stale:
+            await delete_cached(*stale)
+        self.progress.processed += len(referrers)
+
+    async def run(self) -> None:
+        """Выполняет прогрев; ошибки записываются в ход прогрева и лог."""
+        self.progress = progress = WarmupProgress(
+            status="running", started_at=time.time()
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm(batch: Sequence[Row]) -> None:
+            async with semaphore:
+                await self.warm_batch(batch)
+
+        try:
+            referrers = await UserDAO.get_top_referrers(self.top)
+            progress.total = len(referrers)
+            batches = []
+            for start in range(0, len(referrers), self.batch_size):
+                end = start + self.batch_size
+                batches.append(warm(referrers[start:end]))
+            await asyncio.gather(*batches)
+        except Exception as e:
+            progress.status = "failed"
+            progress.error = repr(e)
+            logger.warning(LogMessages.CACHE_WARMUP_FAILED.format(repr(e)))
+        else:
+            progress.status = "done"
+            logger.info(
+                LogMessages.CACHE_WARMUP_FINISHED.format(
+                    progress.total, time.time() - progress.started_at
+                )
+            )
+        finally:
+            progress.finished_at = time.time()
+
+    def start(self) -> None:
+        """Запускает прогрев в фоне; до его окончания ready ложно."""
+        if self._task is None:
+            self.progress = WarmupProgress(status="running")
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            if self.progress.status == "running":
+                self.progress.status = "failed"
+
+
+cache_warmup = CacheWarmup()
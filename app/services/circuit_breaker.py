@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Literal, TypeVar
+
+from app.common.constants import LogMessages
+from app.config import settings
+from app.logger import logger
+
+T = TypeVar("T")
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен: цепь разомкнута."""
+
+
+@dataclass
+class CircuitBreakerStats:
+    """Счетчики вызовов через размыкатель."""
+
+    calls: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    rejected: int = 0
+    opened: int = 0
+
+
+class CircuitBreaker:
+    """Размыкатель цепи (circuit breaker) для вызовов внешнего сервиса.
+
+    Каждый вызов ограничен call_timeout. Если среди последних window
+    вызовов (но не менее min_calls) доля ошибок и таймаутов достигает
+    failure_rate, цепь размыкается: вызовы отклоняются без обращения к
+    сервису. Через reset_timeout секунд цепь становится полуоткрытой и
+    пропускает один пробный вызов: успешный замыкает цепь, ошибка снова
+    размыкает ее.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        call_timeout: float = settings.CACHE_BREAKER_CALL_TIMEOUT,
+        window: int = settings.CACHE_BREAKER_WINDOW,
+        min_calls: int = settings.CACHE_BREAKER_MIN_CALLS,
+        failure_rate: float = settings.CACHE_BREAKER_FAILURE_RATE,
+        reset_timeout: float = settings.CACHE_BREAKER_RESET_TIMEOUT,
+    ) -> None:
+        self.name = name
+        self.call_timeout = call_timeout
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self.state: CircuitState = "closed"
+        self.stats = CircuitBreakerStats()
+        self._results: deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Цепь разомкнута, и время до пробного вызова еще не истекло."""
+        return (
+            self.state == "open"
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    @property
+    def window_failure_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    async def call(
+        self, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any
+    ) -> T:
+        """Выполняет вызов через размыкатель.
+
+        Raises:
+            CircuitOpenError: Цепь разомкнута или пробный вызов уже идет.
+            asyncio.TimeoutError: Вызов не завершился за call_timeout.
+        """
+        if not self._allow():
+            self.stats.rejected += 1
+            raise CircuitOpenError(self.name)
+        probe = self.state == "half_open"
+        self.stats.calls += 1
+        try:
+            result = await asyncio.wait_for(
+                func(*args, **kwargs), self.call_timeout
+            )
+        except asyncio.CancelledError:
+            # отмена вызывающим не говорит о состоянии сервиса
+            if probe:
+                self._probing = False
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats.timeouts += 1
+            self.stats.failures += 1
+            self._record(False, probe)
+            raise
+        self._record(True, probe)
+        return result
+
+    def _allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if self.is_open:
+                return False
+            self._set_state("half_open")
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def _record(self, success: bool, probe: bool) -> None:
+        if probe:
+            self._probing = False
+            if success:
+                self._set_state("closed")
+            else:
+                self._open()
+            return
+        if self.state != "closed":
+            # результат вызова, начатого до размыкания
+            return
+        self._results.append(success)
+        if (
+            len(self._results) >= self.min_calls
+            and self.window_failure_rate >= self.failure_rate
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        logger.warning(
+            LogMessages.CIRCUIT_OPENED.format(
+                self.name, self.window_failure_rate
+            )
+        )
+        self._opened_at = time.monotonic()
+        self.stats.opened += 1
+        self._set_state("open")
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state == "closed" and self.state != "closed":
+            logger.info(LogMessages.CIRCUIT_CLOSED.format(self.name))
+        self.state = state
+        self._results.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failure_rate": self.window_failure_rate,
+            "calls": self.stats.calls,
+            "failures": self.stats.failures,
+            "timeouts": self.stats.timeouts,
+            "rejected": self.stats.rejected,
+            "opened": self.stats.opened,
+        }
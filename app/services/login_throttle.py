@@ -0,0 +1,96 @@
+import hashlib
+import math
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.common.constants import CacheKeys
+from app.common.exceptions import TooManyAttemptsException
+from app.config import settings
+from app.services.cache import throttle
+
+
+@dataclass
+class LoginThrottleStats:
+    """Счетчики проверок лимита попыток."""
+
+    allowed: int = 0
+    # "<scope>:<ip|email>" -> число отклоненных попыток
+    rejected: dict[str, int] = field(default_factory=dict)
+
+
+class LoginThrottle:
+    """Ограничение частоты попыток входа и регистрации.
+
+    Попытки списываются из корзин маркеров в Redis (атомарный Lua-скрипт)
+    отдельно для IP клиента и для email: не более attempts попыток,
+    восстанавливающихся за period секунд. Проверка выполняется до
+    проверки пароля, поэтому перебор паролей не занимает пул хэширования.
+    При недоступности Redis попытки разрешаются.
+    """
+
+    def __init__(
+        self,
+        ip_limit: tuple[int, float] = (
+            settings.LOGIN_THROTTLE_IP_ATTEMPTS,
+            settings.LOGIN_THROTTLE_IP_PERIOD,
+        ),
+        email_limit: tuple[int, float] = (
+            settings.LOGIN_THROTTLE_EMAIL_ATTEMPTS,
+            settings.LOGIN_THROTTLE_EMAIL_PERIOD,
+        ),
+        enabled: bool = settings.LOGIN_THROTTLE_ENABLED,
+    ) -> None:
+        self.ip_limit = ip_limit
+        self.email_limit = email_limit
+        self.enabled = enabled
+        self.stats = LoginThrottleStats()
+
+    async def check(
+        self, scope: str, ip: Optional[str], email: Optional[str]
+    ) -> None:
+        """Списывает попытку для IP и email.
+
+        Args:
+            scope: Вид попыток (login, register).
+            ip: IP клиента.
+            email: email (имя пользователя) из запроса.
+
+        Raises:
+            TooManyAttemptsException: Лимит исчерпан; в Retry-After -
+                секунд до следующей разрешенной попытки.
+        """
+        if not self.enabled:
+            return
+        limits: dict[str, tuple[int, float]] = {}
+        kinds: dict[str, str] = {}
+        for kind, value, limit in (
+            ("ip", ip, self.ip_limit),
+            ("email", email and email.lower(), self.email_limit),
+        ):
+            if value:
+                # по хэшу: длина ключа не зависит от значения из запроса
+                key = CacheKeys.AUTH_THROTTLE.format(
+                    scope=scope,
+                    kind=kind,
+                    value=hashlib.sha256(value.encode()).hexdigest(),
+                )
+                limits[key] = limit
+                kinds[key] = f"{scope}:{kind}"
+        result = await throttle(limits)
+        if result is None:
+            self.stats.allowed += 1
+            return
+        key, wait = result
+        rejected = self.stats.rejected
+        rejected[kinds[key]] = rejected.get(kinds[key], 0) + 1
+        raise TooManyAttemptsException(max(math.ceil(wait), 1))
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "allowed": self.stats.allowed,
+            "rejected": dict(self.stats.rejected),
+        }
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,243 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Literal, Optional, TypeVar
+
+import argon2
+from passlib.context import CryptContext
+
+from app.common.exceptions import PasswordHashingBusyException
+from app.config import settings
+from app.logger import logger
+
+T = TypeVar("T")
+
+ARGON2_MIN_MEMORY_COST = 8 * 1024
+
+
+def create_pwd_context(
+    scheme: Literal["argon2", "bcrypt"] = settings.PASSWORD_HASH_SCHEME,
+) -> CryptContext:
+    """Политика хэширования паролей.
+
+    Новые хэши вычисляются схемой scheme с параметрами PASSWORD_ARGON2_*
+    или PASSWORD_BCRYPT_ROUNDS. Хэши другой схемы, а также argon2 с
+    меньшей стоимостью проверяются, но считаются устаревшими и
+    пересчитываются при входе (verify_and_update).
+    """
+    return CryptContext(
+        schemes=[scheme, "bcrypt" if scheme == "argon2" else "argon2"],
+        deprecated="auto",
+        argon2__type="ID",
+        argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+        argon2__rounds=settings.PASSWORD_ARGON2_TIME_COST,
+        argon2__min_rounds=settings.PASSWORD_ARGON2_TIME_COST,
+        argon2__parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+        bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    )
+
+
+pwd_context = create_pwd_context()
+
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password, hashed_password) -> bool:
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    except ValueError as e:
+        logger.exception(e, exc_info=True)
+    return False
+
+
+def verify_and_update_password(
+    plain_password, hashed_password
+) -> tuple[bool, Optional[str]]:
+    """Проверяет пароль и пересчитывает устаревший хэш.
+
+    Returns:
+        Результат проверки и новый хэш, если хэш нужно заменить.
+    """
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except ValueError as e:
+        logger.exception(e, exc_info=True)
+    return False, None
+
+
+def measure_argon2(
+    time_cost: int, memory_cost: int, parallelism: int, samples: int = 5
+) -> float:
+    """Медианное время (секунд) вычисления хэша argon2id."""
+    hasher = argon2.PasswordHasher(
+        time_cost=time_cost,
+        memory_cost=memory_cost,
+        parallelism=parallelism,
+        type=argon2.Type.ID,
+    )
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("calibration")
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def calibrate_argon2(
+    target: float,
+    max_memory_cost: int = settings.PASSWORD_ARGON2_MEMORY_COST,
+    parallelism: int = settings.PASSWORD_ARGON2_PARALLELISM,
+    max_time_cost: int = 10,
+    samples: int = 5,
+    measure: Callable[[int, int, int, int], float] = measure_argon2,
+) -> dict[str, Any]:
+    """Подбирает параметры argon2id под целевое время хэширования.
+
+    Сначала выбирается наибольший объем памяти (не более max_memory_cost,
+    уменьшая вдвое), при котором один проход укладывается в target, затем
+    наибольшее число проходов, не превышающее target.
+
+    Args:
+        target: Целевое время вычисления хэша (секунд).
+        max_memory_cost: Максимальный объем памяти (КиБ).
+        parallelism: Число потоков вычисления хэша.
+        max_time_cost: Максимальное число проходов.
+        samples: Число замеров для каждого набора параметров.
+        measure: Функция замера (time_cost, memory_cost, parallelism,
+            samples) -> секунд.
+
+    Returns:
+        Параметры time_cost, memory_cost, parallelism и замеренное время
+        duration.
+    """
+    memory_cost = max_memory_cost
+    duration = measure(1, memory_cost, parallelism, samples)
+    while duration > target and memory_cost // 2 >= ARGON2_MIN_MEMORY_COST:
+        memory_cost //= 2
+        duration = measure(1, memory_cost, parallelism, samples)
+    time_cost = 1
+    while time_cost < max_time_cost:
+        next_duration = measure(
+            time_cost + 1, memory_cost, parallelism, samples
+        )
+        if next_duration > target:
+            break
+        time_cost += 1
+        duration = next_duration
+    return {
+        "time_cost": time_cost,
+        "memory_cost": memory_cost,
+        "parallelism": parallelism,
+        "duration": duration,
+    }
+
+
+class PasswordHasher:
+    """Хэширование и проверка паролей вне цикла событий.
+
+    Вычисление хэша занимает процессор на сотни миллисекунд, поэтому
+    выполняется в пуле потоков (bcrypt освобождает GIL) или процессов.
+    Одновременно выполняется и ожидает в очереди не более
+    workers + queue_size вычислений; сверх этого запрос отклоняется с
+    PasswordHashingBusyException (503), а не ждет неограниченно.
+    Фоновые задачи (импорт пользователей) используют тот же пул и
+    дожидаются свободного места (wait=True) вместо отказа.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        queue_size: int = settings.PASSWORD_HASH_QUEUE_SIZE,
+        executor_type: Literal[
+            "thread", "process"
+        ] = settings.PASSWORD_HASH_EXECUTOR,
+    ) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.executor_type = executor_type
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def run(
+        self, func: Callable[..., T], *args: Any, wait: bool = False
+    ) -> T:
+        """Выполняет func в пуле с учетом ограничения очереди.
+
+        Args:
+            func: Функция.
+            *args: Аргументы функции.
+            wait: Ждать свободного места вместо отказа.
+
+        Raises:
+            PasswordHashingBusyException: Пул и очередь заполнены.
+        """
+        loop = asyncio.get_running_loop()
+        while self.pending >= self.workers + self.queue_size:
+            if not wait:
+                self.rejected += 1
+                raise PasswordHashingBusyException()
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.pending += 1
+        future = self.executor.submit(func, *args)
+
+        def release(_: Future) -> None:
+            # место в очереди освобождается по завершении вычисления, а
+            # не при отмене ожидающего его запроса
+            loop.call_soon_threadsafe(self._release)
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        self.pending -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def hash(self, password: str, wait: bool = False) -> str:
+        return await self.run(get_password_hash, password, wait=wait)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        return await self.run(
+            verify_and_update_password, plain_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -1,17 +1,592 @@
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from redis import asyncio as aioredis
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Union
+from uuid import uuid4
 
 from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
 from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
 
+from app.common.constants import LogMessages
 from app.config import settings
+from app.logger import logger
+from app.services.cache import OrjsonCoder, get_cache_backend
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@dataclass
+class CacheTierStats:
+    """Счетчики попаданий и промахов уровня кэша."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class LocalCache:
+    """Кэш в памяти процесса с ограничением размера (LRU) и TTL."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheTierStats()
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return item[1]
+
+    def set(self, key: str, value: Any, expire: Optional[int] = None):
+        ttl = min(self.ttl, expire) if expire else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is None:
+            self._data.clear()
+            return
+        for key in [key for key in self._data if key.startswith(namespace)]:
+            del self._data[key]
+
+
+# Удаляет блокировку, только если она принадлежит вызывающему
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Корзины маркеров (token bucket) для ограничения частоты попыток.
+# KEYS - ключи корзин, ARGV - пары (емкость, мс на восстановление одного
+# маркера) для каждого ключа. Маркер списывается из всех корзин, только
+# если он есть в каждой. Возвращает {номер отклонившей корзины или 0,
+# мс до появления маркера}.
+THROTTLE_SCRIPT = """
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local tokens = {}
+local rejected, wait = 0, 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local interval = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(now - (tonumber(bucket[2]) or now), 0)
+    available = math.min(capacity, available + elapsed / interval)
+    tokens[i] = available
+    if available < 1 then
+        local key_wait = math.ceil((1 - available) * interval)
+        if key_wait > wait then
+            rejected, wait = i, key_wait
+        end
+    end
+end
+if rejected == 0 then
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+        local ttl = tonumber(ARGV[2 * i - 1]) * tonumber(ARGV[2 * i])
+        redis.call('PEXPIRE', key, math.ceil(ttl))
+    end
+end
+return {rejected, wait}
+"""
+
+
+class TwoTierBackend(RedisBackend):
+    """Redis бэкенд кэша с необязательным уровнем в памяти процесса (L1).
+
+    Чтение сначала выполняется из L1, при промахе - из Redis с записью
+    результата в L1. Запись и удаление ключа публикуются в канал Redis,
+    подписчики (другие воркеры и узлы) удаляют ключ из своего L1.
+    Короткий TTL L1 ограничивает расхождение при потере сообщения.
+
+    Также предоставляет блокировки обновления ключей между воркерами и
+    ограничение частоты попыток (throttle).
+    Другие кэши процесса могут подписаться на изменения ключей через
+    add_invalidation_listener.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        local: Optional[LocalCache] = None,
+        channel: str = settings.CACHE_INVALIDATION_CHANNEL,
+    ) -> None:
+        super().__init__(redis)
+        self.local = local
+        self.channel = channel
+        self.node_id = uuid4().hex
+        self.stats = CacheTierStats()
+        self._listener: Optional[asyncio.Task] = None
+        self._invalidation_listeners: list[Callable[[Optional[str]], None]] = (
+            []
+        )
+        self._release_lock = redis.register_script(RELEASE_LOCK_SCRIPT)
+        self._throttle = redis.register_script(THROTTLE_SCRIPT)
+
+    @property
+    def broadcasts(self) -> bool:
+        """Изменения ключей рассылаются другим воркерам."""
+        return self.local is not None or bool(self._invalidation_listeners)
+
+    def add_invalidation_listener(
+        self, listener: Callable[[Optional[str]], None]
+    ) -> None:
+        """Подписывает на изменения ключей другими воркерами.
+
+        Args:
+            listener: Вызывается с измененным ключом или с None, если
+                сообщения могли быть пропущены и нужно сбросить все.
+        """
+        self._invalidation_listeners.append(listener)
+
+    async def get_with_ttl(self, key: str) -> tuple[int, Optional[str]]:
+        ttl, value = await super().get_with_ttl(key)
+        self._count(value)
+        return ttl, value
+
+    async def get(self, key: str) -> Optional[str]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        value = await super().get(key)
+        self._count(value)
+        if value is not None and self.local is not None:
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str, expire: Optional[int] = None):
+        await super().set(key, value, expire)
+        if self.local is not None:
+            self.local.set(key, value, expire)
+        if self.broadcasts:
+            await self._publish(key=key)
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        result = await super().clear(namespace, key)
+        if self.local is not None:
+            if namespace:
+                self.local.clear(namespace)
+            elif key:
+                self.local.delete(key)
+        if self.broadcasts:
+            await self._publish(namespace=namespace, key=key)
+        return result
+
+    async def add(
+        self, key: str, value: bytes, expire: Optional[int] = None
+    ) -> bool:
+        """Записывает значение, только если ключа нет в Redis (SET NX).
+
+        Returns:
+            True, если значение записано.
+        """
+        added = await self.redis.set(key, value, ex=expire, nx=True)
+        if added and self.local is not None:
+            self.local.set(key, value, expire)
+        return bool(added)
+
+    async def add_many(
+        self, items: dict[str, bytes], expire: Optional[int] = None
+    ) -> int:
+        """Записывает значения отсутствующих в Redis ключей (SET NX).
+
+        Команды отправляются одним конвейером без транзакции.
+
+        Returns:
+            Количество записанных значений.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, ex=expire, nx=True)
+            results = await pipe.execute()
+        added = 0
+        for (key, value), result in zip(items.items(), results):
+            if result:
+                added += 1
+                if self.local is not None:
+                    self.local.set(key, value, expire)
+        return added
+
+    async def acquire_lock(self, key: str, timeout: float) -> Optional[str]:
+        """Захватывает блокировку обновления ключа.
+
+        Args:
+            key: Ключ кэша.
+            timeout: Время жизни блокировки (секунд).
+
+        Returns:
+            Токен блокировки или None, если она занята.
+        """
+        token = uuid4().hex
+        acquired = await self.redis.set(
+            f"{key}:lock", token, nx=True, px=int(timeout * 1000)
+        )
+        return token if acquired else None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        await self._release_lock(keys=[f"{key}:lock"], args=[token])
+
+    async def throttle(
+        self, limits: dict[str, tuple[int, float]]
+    ) -> tuple[int, float]:
+        """Списывает попытку из корзин маркеров атомарно.
+
+        Args:
+            limits: Ключ корзины -> (число попыток, период восстановления
+                всех попыток в секундах).
+
+        Returns:
+            Номер (с 1) корзины, в которой нет маркера, или 0, если
+            попытка разрешена, и время до появления маркера (секунд).
+        """
+        args = []
+        for attempts, period in limits.values():
+            args += [attempts, period * 1000 / attempts]
+        rejected, wait = await self._throttle(keys=list(limits), args=args)
+        return int(rejected), int(wait) / 1000
+
+    def _count(self, value: Optional[str]) -> None:
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
 
+    async def _publish(self, **message: Optional[str]) -> None:
+        await self.redis.publish(
+            self.channel, json.dumps({"node": self.node_id, **message})
+        )
 
-def init_redis_cache():
-    redis = aioredis.from_url(
+    def _invalidate(self, data: Union[str, bytes]) -> None:
+        message = json.loads(data)
+        if message.get("node") == self.node_id:
+            return
+        if message.get("namespace"):
+            if self.local is not None:
+                self.local.clear(message["namespace"])
+            key = None
+        elif message.get("key"):
+            if self.local is not None:
+                self.local.delete(message["key"])
+            key = message["key"]
+        else:
+            return
+        for listener in self._invalidation_listeners:
+            listener(key)
+
+    def _reset(self) -> None:
+        """Сбрасывает L1 и подписчиков: сообщения могли быть пропущены."""
+        if self.local is not None:
+            self.local.clear()
+        for listener in self._invalidation_listeners:
+            listener(None)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # сообщения, пропущенные до подписки, не придут
+                    self._reset()
+                    while True:
+                        # чтение с таймаутом, иначе при простое канала
+                        # сработает socket_timeout клиента
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is not None:
+                            self._invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(LogMessages.CACHE_INVALIDATION_FAILED.format(e))
+                self._reset()
+                await asyncio.sleep(1)
+
+    def start(self) -> None:
+        """Запускает прием сообщений об изменении ключей."""
+        if self.broadcasts and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await self.redis.close(close_connection_pool=True)
+
+    def get_stats(self) -> list[dict[str, Any]]:
+        """Счетчики попаданий и промахов по уровням кэша."""
+        tiers = []
+        if self.local is not None:
+            tiers.append(
+                {
+                    "tier": "local",
+                    "hits": self.local.stats.hits,
+                    "misses": self.local.stats.misses,
+                    "evictions": self.local.stats.evictions,
+                    "size": len(self.local),
+                    "maxsize": self.local.maxsize,
+                }
+            )
+        tiers.append(
+            {
+                "tier": "redis",
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+            }
+        )
+        return tiers
+
+
+class CircuitBreakerBackend(Backend):
+    """Бэкенд кэша, обращающийся к вложенному через размыкатель цепи.
+
+    Пока цепь разомкнута, чтение возвращает промах, а блокировки не
+    захватываются, поэтому запросы не ждут недоступный Redis. Ключи,
+    изменение которых не дошло до хранилища (из-за размыкания цепи или
+    ошибки), запоминаются и удаляются после ее замыкания, иначе в кэше
+    остались бы значения, устаревшие за время недоступности. При
+    переполнении очереди удаления очищается весь кэш приложения.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        breaker: CircuitBreaker,
+        max_pending_deletes: int = settings.CACHE_BREAKER_MAX_PENDING_DELETES,
+    ) -> None:
+        self.backend = backend
+        self.breaker = breaker
+        self.max_pending_deletes = max_pending_deletes
+        self._pending_deletes: set[str] = set()
+        self._pending_overflow = False
+        self._replay: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.breaker.is_open
+
+    @property
+    def pending_deletes(self) -> int:
+        return len(self._pending_deletes)
+
+    async def get_with_ttl(self, key: str) -> tuple[int, Optional[str]]:
+        return await self._read((0, None), self.backend.get_with_ttl, key)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._read(None, self.backend.get, key)
+
+    async def set(self, key: str, value: str, expire: Optional[int] = None):
+        await self._write(key, None, self.backend.set, key, value, expire)
+
+    async def add(
+        self, key: str, value: bytes, expire: Optional[int] = None
+    ) -> bool:
+        return await self._write(
+            key, False, self.backend.add, key, value, expire
+        )
+
+    async def add_many(
+        self, items: dict[str, bytes], expire: Optional[int] = None
+    ) -> int:
+        try:
+            result = await self.breaker.call(
+                self.backend.add_many, items, expire
+            )
+        except Exception as e:
+            for key in items:
+                self._defer_delete(key)
+            if isinstance(e, CircuitOpenError):
+                return 0
+            raise
+        self._schedule_replay()
+        return result
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        if not namespace and not key:
+            return 0
+        return await self._write(
+            None if namespace else key, 0, self.backend.clear, namespace, key
+        )
+
+    async def acquire_lock(self, key: str, timeout: float) -> Optional[str]:
+        return await self._read("", self.backend.acquire_lock, key, timeout)
+
+    async def release_lock(self, key: str, token: str) -> None:
+        await self._read(None, self.backend.release_lock, key, token)
+
+    async def throttle(
+        self, limits: dict[str, tuple[int, float]]
+    ) -> tuple[int, float]:
+        return await self._read((0, 0.0), self.backend.throttle, limits)
+
+    async def _read(self, default: Any, method: Callable, *args: Any) -> Any:
+        try:
+            result = await self.breaker.call(method, *args)
+        except CircuitOpenError:
+            return default
+        self._schedule_replay()
+        return result
+
+    async def _write(
+        self, key: Optional[str], default: Any, method: Callable, *args: Any
+    ) -> Any:
+        try:
+            result = await self.breaker.call(method, *args)
+        except CircuitOpenError:
+            self._defer_delete(key)
+            return default
+        except Exception:
+            self._defer_delete(key)
+            raise
+        self._schedule_replay()
+        return result
+
+    def _defer_delete(self, key: Optional[str]) -> None:
+        """Запоминает ключ для удаления; None - очистить весь кэш."""
+        if self._pending_overflow:
+            return
+        if key is None or len(self._pending_deletes) >= (
+            self.max_pending_deletes
+        ):
+            logger.warning(
+                LogMessages.CACHE_PENDING_DELETES_OVERFLOW.format(
+                    FastAPICache.get_prefix()
+                )
+            )
+            self._pending_overflow = True
+            self._pending_deletes.clear()
+            return
+        self._pending_deletes.add(key)
+
+    def _schedule_replay(self) -> None:
+        if (
+            (self._pending_deletes or self._pending_overflow)
+            and self._replay is None
+            and self.breaker.state == "closed"
+        ):
+            self._replay = asyncio.create_task(self._replay_deletes())
+
+    async def _replay_deletes(self) -> None:
+        try:
+            if self._pending_overflow:
+                self._pending_overflow = False
+                try:
+                    # без таймаута размыкателя: KEYS по всему кэшу
+                    await self.backend.clear(
+                        namespace=FastAPICache.get_prefix()
+                    )
+                except Exception:
+                    self._defer_delete(None)
+                    return
+            while self._pending_deletes:
+                key = self._pending_deletes.pop()
+                try:
+                    await self.breaker.call(self.backend.clear, None, key)
+                except Exception:
+                    self._defer_delete(key)
+                    return
+        finally:
+            self._replay = None
+
+    def add_invalidation_listener(
+        self, listener: Callable[[Optional[str]], None]
+    ) -> None:
+        self.backend.add_invalidation_listener(listener)
+
+    def start(self) -> None:
+        self.backend.start()
+
+    async def stop(self) -> None:
+        if self._replay is not None:
+            self._replay.cancel()
+            self._replay = None
+        await self.backend.stop()
+
+    def get_stats(self) -> list[dict[str, Any]]:
+        return self.backend.get_stats()
+
+    def get_breaker_stats(self) -> dict[str, Any]:
+        return {
+            **self.breaker.get_stats(),
+            "pending_deletes": self.pending_deletes,
+            "pending_flush": self._pending_overflow,
+        }
+
+
+def create_redis_client() -> aioredis.Redis:
+    """Клиент Redis с ограниченным пулом соединений и таймаутами.
+
+    Ответы не декодируются: значения кэша хранятся в виде байт,
+    закодированных OrjsonCoder.
+    """
+    pool = aioredis.BlockingConnectionPool.from_url(
         settings.redis_url,
-        encoding="utf8",
-        decode_responses=True,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def init_redis_cache() -> Union[TwoTierBackend, CircuitBreakerBackend]:
+    local = (
+        LocalCache(settings.CACHE_LOCAL_MAXSIZE, settings.CACHE_LOCAL_TTL)
+        if settings.CACHE_LOCAL_ENABLED
+        else None
+    )
+    backend: Union[TwoTierBackend, CircuitBreakerBackend] = TwoTierBackend(
+        create_redis_client(), local
     )
-    FastAPICache.init(RedisBackend(redis), prefix="refcache")
+    if settings.CACHE_BREAKER_ENABLED:
+        backend = CircuitBreakerBackend(backend, CircuitBreaker("redis"))
+    FastAPICache.init(
+        backend,
+        prefix="refcache",
+        coder=OrjsonCoder,
+    )
+    return backend
+
+
+def get_cache_stats() -> list[dict[str, Any]]:
+    """Счетчики уровней кэша или пустой список, если кэш не запущен."""
+    backend = get_cache_backend()
+    if not isinstance(backend, (TwoTierBackend, CircuitBreakerBackend)):
+        return []
+    return backend.get_stats()
+
+
+def get_cache_breaker_stats() -> Optional[dict[str, Any]]:
+    """Состояние размыкателя цепи Redis или None, если он не используется."""
+    backend = get_cache_backend()
+    if not isinstance(backend, CircuitBreakerBackend):
+        return None
+    return backend.get_breaker_stats()
@@ -1,49 +1,82 @@
+import hashlib
+import secrets
+import string
+import time
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 
-from fastapi_cache.decorator import cache
-from jose import jwt
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.constants import LogMessages, Messages
+from app.common.constants import CacheKeys, LogMessages, Messages
 from app.common.exceptions import (
     ReferralCodeExpiredException,
     ReferralCodeNotFoundException,
 )
 from app.config import settings
 from app.crud.referral_code_dao import ReferralCodeDAO
-from app.crud.user_dao import UserDAO
+from app.database import after_commit
 from app.logger import logger
 from app.models.base import pk_type
-from app.models.user import User
+from app.schemas.auth import UserPrincipalDTO
 from app.schemas.referral_code import ReferralCodeReadDTO
+from app.services.cache import (
+    NOT_FOUND,
+    cached,
+    decode,
+    delete_cached,
+    get_cached,
+    get_entry,
+    set_cached,
+    set_raw,
+    single_flight,
+)
+from app.services.token_codec import TokenError, TokenExpiredError, token_codec
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+
+def hash_code(referral_code: str) -> str:
+    """sha256 кода для ключей кэша: длина ключа не зависит от кода."""
+    return hashlib.sha256(referral_code.encode()).hexdigest()
 
 
 class ReferralCodeService:
     @classmethod
-    async def generate_code(cls, user_id: pk_type, life_time: int) -> str:
+    async def generate_code(
+        cls, user_id: pk_type, expires_at: datetime
+    ) -> str:
         """Генерирует реферальный код для пользователя.
 
+        Формат задается REFERRAL_CODE_FORMAT: случайная строка base62
+        длины REFERRAL_CODE_LENGTH (владелец и срок хранятся только в БД)
+        или JWT с владельцем и сроком в полезной нагрузке.
+
         Args:
             user_id: Идентификатор пользователя.
-            life_time: Срок жизни реферального кода (минут).
+            expires_at: Время истечения срока жизни кода.
         Returns:
             Реферальный код.
 
         """
-        expire = datetime.now(timezone.utc) + timedelta(minutes=life_time)
-        payload = {"sub": str(user_id), "exp": expire}
-        referral_code = jwt.encode(
-            payload, key=settings.SECRET_KEY, algorithm=settings.ALGORITHM
+        if settings.REFERRAL_CODE_FORMAT == "jwt":
+            payload = {"sub": str(user_id), "exp": expires_at}
+            return token_codec.encode(payload)
+        return "".join(
+            secrets.choice(BASE62_ALPHABET)
+            for _ in range(settings.REFERRAL_CODE_LENGTH)
         )
-        return referral_code
 
     @classmethod
-    @cache(expire=settings.CACHE_EXPIRE)
-    async def get_by_id(cls, id: pk_type) -> ReferralCodeReadDTO:
+    @cached(CacheKeys.REFERRAL_CODE_BY_ID)
+    async def get_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ) -> ReferralCodeReadDTO:
         """Возвращает реферальный код с заданным идентификатором.
 
         Args:
             id: Идентификатор объекта в БД.
+            session: Сессия запроса.
 
         Returns:
             Реферальный код с заданным id.
@@ -52,18 +85,24 @@ class ReferralCodeService:
             ReferralCodeNotFoundException: Если код заданным id не найден.
         """
 
-        obj = await ReferralCodeDAO.get_by_id(id)
-        if not obj:
+        row = await ReferralCodeDAO.get_code_by_id(id, session)
+        if not row:
             raise ReferralCodeNotFoundException()
-        return ReferralCodeReadDTO.model_validate(obj)
+        return ReferralCodeReadDTO.from_row(row)
 
     @classmethod
-    @cache(expire=settings.CACHE_EXPIRE)
-    async def get_by_user_id(cls, user_id: pk_type) -> ReferralCodeReadDTO:
+    @cached(
+        CacheKeys.REFERRAL_CODE_BY_USER_ID,
+        not_found=ReferralCodeNotFoundException,
+    )
+    async def get_by_user_id(
+        cls, user_id: pk_type, session: Optional[AsyncSession] = None
+    ) -> ReferralCodeReadDTO:
         """Возвращает реферальный код для заданного пользователя.
 
         Args:
             user_id: Идентификатор пользователя в БД.
+            session: Сессия запроса.
 
         Returns:
             ReferralCodeReadDTO: Реферальный код пользователя.
@@ -72,18 +111,24 @@ class ReferralCodeService:
             ReferralCodeNotFoundException: Если код для пользователя не найден.
         """
 
-        referral_code = await ReferralCodeDAO.get_by_user_id(user_id)
-        if not referral_code:
+        row = await ReferralCodeDAO.get_code_by_user_id(user_id, session)
+        if not row:
             raise ReferralCodeNotFoundException()
-        return ReferralCodeReadDTO.model_validate(referral_code)
+        return ReferralCodeReadDTO.from_row(row)
 
     @classmethod
-    @cache(expire=settings.CACHE_EXPIRE)
-    async def get_by_user_email(cls, email: EmailStr) -> ReferralCodeReadDTO:
+    @cached(
+        CacheKeys.REFERRAL_CODE_BY_EMAIL,
+        not_found=ReferralCodeNotFoundException,
+    )
+    async def get_by_user_email(
+        cls, email: EmailStr, session: Optional[AsyncSession] = None
+    ) -> ReferralCodeReadDTO:
         """Возвращает реферальный код для заданного email пользователя.
 
         Args:
             email: email адрес пользователя.
+            session: Сессия запроса.
 
         Returns:
             ReferralCodeReadDTO: Реферальный код пользователя.
@@ -92,90 +137,167 @@ class ReferralCodeService:
             ReferralCodeNotFoundException: если код для пользователя не найден.
         """
 
-        user = await UserDAO.get_one_or_none(email=email)
-        if not user:
-            raise ReferralCodeNotFoundException()
-        referral_code = await ReferralCodeDAO.get_by_user_id(user.id)
-        if not referral_code:
+        row = await ReferralCodeDAO.get_code_by_user_email(email, session)
+        if not row:
             raise ReferralCodeNotFoundException()
-        return ReferralCodeReadDTO.model_validate(referral_code)
+        return ReferralCodeReadDTO.from_row(row)
 
     @classmethod
     async def renew_user_code(
-        cls, user: User, life_time: int
+        cls,
+        user: UserPrincipalDTO,
+        life_time: int,
+        session: Optional[AsyncSession] = None,
     ) -> ReferralCodeReadDTO:
         """Обновляет реферальный код для пользователя.
 
         Args:
             user: Пользователь, для которого обновляется/генерируется код.
             life_time: Срок жизни реферального кода (минут).
+            session: Сессия запроса.
 
         Returns:
             ReferralCodeReadDTO: Реферальный код пользователя.
         """
 
-        new_code = await cls.generate_code(user.id, life_time)
-        old_code = await ReferralCodeDAO.get_by_user_id(user.id)
-        if old_code:
-            new_code = await ReferralCodeDAO.update_(
-                old_code.id,
-                code=new_code,
-            )
-            logger.info(LogMessages.REFCODE_UPDATED.format(user.id))
-        else:
-            new_code = await ReferralCodeDAO.create(
-                user_id=user.id,
-                code=new_code,
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=life_time)
+        new_code = await cls.generate_code(user.id, expires_at)
+        referral_code = await ReferralCodeDAO.upsert(
+            ["user_id"],
+            session,
+            user_id=user.id,
+            code=new_code,
+            expires_at=expires_at,
+        )
+        logger.info(LogMessages.REFCODE_UPDATED.format(user.id))
+        referral_code_dto = ReferralCodeReadDTO.model_validate(referral_code)
+        await after_commit(
+            session, lambda: cls.cache_code(user, referral_code_dto)
+        )
+        return referral_code_dto
+
+    @classmethod
+    async def cache_code(
+        cls, user: UserPrincipalDTO, referral_code: ReferralCodeReadDTO
+    ):
+        """Записывает новый код пользователя во все ключи кэша.
+
+        Отрицательные записи для пользователя и нового кода, а также
+        результат проверки прежнего кода при этом заменяются или удаляются.
+
+        Args:
+            user: Владелец кода.
+            referral_code: Реферальный код пользователя.
+        """
+        await set_cached(
+            CacheKeys.REFERRAL_CODE_BY_ID.format(id=referral_code.id),
+            referral_code,
+        )
+        await set_cached(
+            CacheKeys.REFERRAL_CODE_BY_USER_ID.format(user_id=user.id),
+            referral_code,
+        )
+        await set_cached(
+            CacheKeys.REFERRAL_CODE_BY_EMAIL.format(email=user.email),
+            referral_code,
+        )
+        await cls.evict_check(user.id)
+        await delete_cached(
+            CacheKeys.REFERRAL_CODE_CHECK.format(
+                code_hash=hash_code(referral_code.code)
             )
-            logger.info(LogMessages.REFCODE_CREATED.format(user.id))
-        return ReferralCodeReadDTO.model_validate(new_code)
+        )
+
+    @classmethod
+    async def evict_code(cls, id: pk_type, user_id: pk_type, email: str):
+        """Удаляет код пользователя из всех ключей кэша.
+
+        Args:
+            id: Идентификатор кода.
+            user_id: Идентификатор владельца кода.
+            email: email владельца кода.
+        """
+        await delete_cached(
+            CacheKeys.REFERRAL_CODE_BY_ID.format(id=id),
+            CacheKeys.REFERRAL_CODE_BY_USER_ID.format(user_id=user_id),
+            CacheKeys.REFERRAL_CODE_BY_EMAIL.format(email=email),
+        )
+        await cls.evict_check(user_id)
+
+    @classmethod
+    async def evict_check(cls, user_id: pk_type):
+        """Удаляет закэшированный результат проверки кода пользователя.
+
+        Args:
+            user_id: Идентификатор владельца кода.
+        """
+        pointer = CacheKeys.REFERRAL_CODE_CHECK_BY_USER.format(user_id=user_id)
+        key = await get_cached(pointer, str)
+        if key is not None:
+            await delete_cached(key, pointer)
 
     @classmethod
-    async def delete_by_id(cls, id: pk_type):
+    async def delete_by_id(
+        cls, id: pk_type, session: Optional[AsyncSession] = None
+    ):
         """Удалить реферальный код с заданным идентификатором.
 
         Args:
             id: идентификатор удаляемого объекта.
+            session: Сессия запроса.
 
         Raises:
             ReferralCodeNotFoundException: если код с заданным id не найден.
 
         """
-        referral_code = await ReferralCodeDAO.get_by_id(id)
-        if not referral_code:
+        deleted = await ReferralCodeDAO.delete_code_by_id(id, session)
+        if not deleted:
             raise ReferralCodeNotFoundException(
                 detail=Messages.REFERRAL_CODE_FOR_USER_NOT_FOUND
             )
-        await ReferralCodeDAO.delete_(id)
         logger.info(LogMessages.REFCODE_DELETED.format(id))
+        await after_commit(session, lambda: cls.evict_code(*deleted))
 
     @classmethod
-    async def delete_by_user_id(cls, user_id: pk_type):
+    async def delete_by_user_id(
+        cls, user_id: pk_type, session: Optional[AsyncSession] = None
+    ):
         """Удалить реферальный код для заданного пользователя.
 
         Args:
             user_id: Идентификатор пользователя.
+            session: Сессия запроса.
 
         Raises:
             ReferralCodeNotFoundException: Если код для пользователя не найден.
 
         """
-        referral_code = await ReferralCodeDAO.get_by_user_id(user_id)
-        if not referral_code:
+        deleted = await ReferralCodeDAO.delete_code_by_user_id(
+            user_id, session
+        )
+        if not deleted:
             raise ReferralCodeNotFoundException(
                 detail=Messages.REFERRAL_CODE_FOR_USER_NOT_FOUND
             )
-        await ReferralCodeDAO.delete_(referral_code.id)
         logger.info(
-            LogMessages.USER_REFCODE_DELETED.format(referral_code.id, user_id)
+            LogMessages.USER_REFCODE_DELETED.format(deleted.id, user_id)
         )
+        await after_commit(session, lambda: cls.evict_code(*deleted))
 
     @classmethod
-    async def get_referrer_user_id(cls, referral_code: str) -> pk_type:
+    async def get_referrer_user_id(
+        cls, referral_code: str, session: Optional[AsyncSession] = None
+    ) -> pk_type:
         """Возвращает user_id для валидного реферального кода.
 
+        Результат проверки кэшируется по sha256 кода: успешный - до
+        истечения срока жизни кода (не дольше CACHE_EXPIRE), отрицательный
+        для замененного кода - на CACHE_NOT_FOUND_EXPIRE. Записи удаляются
+        при обновлении и удалении кода пользователя.
+
         Args:
             referral_code: Реферальный код.
+            session: Сессия запроса.
 
         Returns:
             Идентификатор пользователя выдавшего код.
@@ -186,18 +308,76 @@ class ReferralCodeService:
         """
         if not referral_code:
             raise ReferralCodeNotFoundException()
-        try:
-            payload = jwt.decode(
-                referral_code,
-                key=settings.SECRET_KEY,
-                algorithms=settings.ALGORITHM,
-            )
-            user_id = int(payload.get("sub"))
-        except jwt.ExpiredSignatureError:
-            raise ReferralCodeExpiredException()
-        except jwt.JWTError:
-            raise ReferralCodeNotFoundException()
-        user_code_in_db = await ReferralCodeDAO.get_by_user_id(user_id)
-        if not user_code_in_db or user_code_in_db.code != referral_code:
+        key = CacheKeys.REFERRAL_CODE_CHECK.format(
+            code_hash=hash_code(referral_code)
+        )
+        entry = await get_entry(key)
+        if entry is not None and entry.is_fresh:
+            if entry.is_not_found:
+                raise ReferralCodeNotFoundException()
+            return decode(entry.payload, int)
+        return await single_flight(
+            key, lambda: cls.check_referral_code(referral_code, key, session)
+        )
+
+    @classmethod
+    async def check_referral_code(
+        cls,
+        referral_code: str,
+        key: str,
+        session: Optional[AsyncSession] = None,
+    ) -> pk_type:
+        """Проверяет код и кэширует результат под key.
+
+        Код ищется по уникальному индексу в БД. Коды формата JWT (выданные
+        до перехода на короткие коды или при REFERRAL_CODE_FORMAT=jwt)
+        сначала проверяются по подписи, срок жизни берется из кода, если
+        он не задан в БД.
+
+        Args:
+            referral_code: Реферальный код.
+            key: Ключ кэша результата проверки.
+            session: Сессия запроса.
+
+        Returns:
+            Идентификатор пользователя выдавшего код.
+
+        Raises:
+            ReferralCodeNotFoundException: Если код для пользователя не найден.
+            ReferralCodeExpiredException: Если время жизни кода истекло.
+        """
+        owner_id: Optional[pk_type] = None
+        expires_at: Optional[float] = None
+        if "." in referral_code:
+            try:
+                payload = token_codec.decode(referral_code)
+                owner_id = int(payload["sub"])
+            except TokenExpiredError:
+                raise ReferralCodeExpiredException()
+            except (TokenError, KeyError, TypeError, ValueError):
+                # проверка подписи не обращается к БД, результат не
+                # кэшируется
+                raise ReferralCodeNotFoundException()
+            expires_at = payload.get("exp")
+        row = await ReferralCodeDAO.get_code_owner(referral_code, session)
+        if not row or owner_id not in (None, row.user_id):
+            await set_raw(key, NOT_FOUND, settings.CACHE_NOT_FOUND_EXPIRE)
             raise ReferralCodeNotFoundException()
+        user_id = row.user_id
+        if row.expires_at is not None:
+            expires_at = row.expires_at.timestamp()
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            raise ReferralCodeExpiredException()
+        expire = settings.CACHE_EXPIRE
+        if expires_at is not None:
+            remaining = int(expires_at - now)
+            expire = min(remaining, expire) if expire else remaining
+        if expires_at is None or expire > 0:
+            await set_cached(key, user_id, expire)
+            await set_cached(
+                CacheKeys.REFERRAL_CODE_CHECK_BY_USER.format(user_id=user_id),
+                key,
+                expire,
+            )
         return user_id
@@ -0,0 +1,82 @@
+import hashlib
+import time
+from typing import Optional
+
+from app.common.constants import CacheKeys
+from app.config import settings
+from app.schemas.auth import UserPrincipalDTO
+from app.services.cache import build_key
+from app.services.redis_cache import LocalCache
+
+
+def hash_token(token: str) -> str:
+    """sha256 токена: сам токен не хранится в кэше и ключах Redis."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """Кэш проверенных токенов доступа и пользователей в памяти процесса.
+
+    Проверенный токен хранится по sha256 до истечения его срока (exp),
+    поэтому повторные запросы с тем же токеном не проверяют подпись.
+    Пользователь (принципал) хранится principal_ttl секунд, чтобы не
+    читать его из БД на каждый запрос. Отозванные токены хранятся до exp
+    в отдельном списке процесса и в Redis (CacheKeys.REVOKED_TOKEN);
+    отзыв токена другим воркером приходит через канал инвалидации.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = settings.AUTH_TOKEN_CACHE_MAXSIZE,
+        principal_ttl: float = settings.AUTH_PRINCIPAL_CACHE_TTL,
+    ) -> None:
+        ttl = settings.JWT_LIFETIME_SECONDS
+        self.tokens = LocalCache(maxsize, ttl)
+        self.revoked = LocalCache(maxsize, ttl)
+        self.principals = LocalCache(maxsize, principal_ttl)
+
+    def get_user_id(self, token_hash: str) -> Optional[int]:
+        """Идентификатор пользователя проверенного неотозванного токена."""
+        return self.tokens.get(token_hash)
+
+    def add_token(self, token_hash: str, user_id: int, exp: float) -> None:
+        expire = exp - time.time()
+        if expire > 0:
+            self.tokens.set(token_hash, user_id, expire)
+
+    def is_revoked(self, token_hash: str) -> bool:
+        return self.revoked.get(token_hash) is not None
+
+    def revoke(self, token_hash: str, exp: float) -> None:
+        self.tokens.delete(token_hash)
+        expire = exp - time.time()
+        if expire > 0:
+            self.revoked.set(token_hash, True, expire)
+
+    def get_principal(self, user_id: int) -> Optional[UserPrincipalDTO]:
+        return self.principals.get(user_id)
+
+    def add_principal(self, principal: UserPrincipalDTO) -> None:
+        self.principals.set(principal.id, principal)
+
+    def invalidate(self, key: Optional[str]) -> None:
+        """Обработчик изменения ключа кэша другим воркером.
+
+        Отозванный в другом воркере токен удаляется из проверенных, и
+        следующий запрос с ним проверит отзыв в Redis. None - сообщения
+        могли быть пропущены, кэш проверенных токенов сбрасывается.
+        """
+        if key is None:
+            self.tokens.clear()
+            return
+        prefix = build_key(CacheKeys.REVOKED_TOKEN.format(token_hash=""))
+        if key.startswith(prefix):
+            self.tokens.delete(key.removeprefix(prefix))
+
+    def clear(self) -> None:
+        self.tokens.clear()
+        self.revoked.clear()
+        self.principals.clear()
+
+
+token_cache = TokenCache()
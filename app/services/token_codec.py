@@ -0,0 +1,194 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import time
+from abc import ABC, abstractmethod
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Literal
+
+import jwt as pyjwt
+import orjson
+from jose import ExpiredSignatureError, JWTError
+from jose import jwt as jose_jwt
+
+from app.common.constants import LogMessages
+from app.config import settings
+from app.logger import logger
+
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class TokenError(Exception):
+    """Токен некорректен: формат, подпись или срок действия."""
+
+
+class TokenExpiredError(TokenError):
+    """Срок действия токена истек."""
+
+
+class TokenCodec(ABC):
+    """Выпуск и проверка подписанных токенов (JWT).
+
+    Полезная нагрузка - словарь; datetime в exp, iat и nbf кодируются
+    как время Unix. decode проверяет подпись и срок действия.
+    """
+
+    def __init__(self, secret: str, algorithm: str) -> None:
+        self.secret = secret
+        self.algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, payload: dict[str, Any]) -> str:
+        """Выпускает подписанный токен с полезной нагрузкой payload."""
+
+    @abstractmethod
+    def decode(self, token: str) -> dict[str, Any]:
+        """Проверяет токен и возвращает полезную нагрузку.
+
+        Raises:
+            TokenExpiredError: Срок действия токена истек.
+            TokenError: Токен некорректен.
+        """
+
+
+class JoseCodec(TokenCodec):
+    """Кодек на python-jose."""
+
+    def encode(self, payload: dict[str, Any]) -> str:
+        return jose_jwt.encode(payload, self.secret, self.algorithm)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            return jose_jwt.decode(
+                token, self.secret, algorithms=[self.algorithm]
+            )
+        except ExpiredSignatureError:
+            raise TokenExpiredError()
+        except JWTError as e:
+            raise TokenError(str(e))
+
+
+class PyJWTCodec(TokenCodec):
+    """Кодек на PyJWT."""
+
+    def encode(self, payload: dict[str, Any]) -> str:
+        return pyjwt.encode(payload, self.secret, self.algorithm)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            return pyjwt.decode(
+                token, self.secret, algorithms=[self.algorithm]
+            )
+        except pyjwt.ExpiredSignatureError:
+            raise TokenExpiredError()
+        except pyjwt.InvalidTokenError as e:
+            raise TokenError(str(e))
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class HS256Codec(TokenCodec):
+    """Минимальная реализация JWT HS256.
+
+    Заголовок кодируется один раз, ключ HMAC подготавливается при
+    создании и копируется для каждого токена. Принимаются только токены
+    с alg HS256; проверяются подпись, exp и nbf (как в PyJWT).
+    """
+
+    header = {"alg": "HS256", "typ": "JWT"}
+
+    def __init__(self, secret: str, algorithm: str = "HS256") -> None:
+        if algorithm != "HS256":
+            raise ValueError(f"HS256Codec не поддерживает {algorithm}")
+        super().__init__(secret, algorithm)
+        self._hmac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self._header = b64encode(orjson.dumps(self.header))
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, payload: dict[str, Any]) -> str:
+        claims = dict(payload)
+        for claim in TIME_CLAIMS:
+            if isinstance(claims.get(claim), datetime):
+                claims[claim] = timegm(claims[claim].utctimetuple())
+        signing_input = self._header + b"." + b64encode(orjson.dumps(claims))
+        signature = b64encode(self._sign(signing_input))
+        return (signing_input + b"." + signature).decode()
+
+    def _check_header(self, segment: bytes) -> None:
+        if segment == self._header:
+            return
+        header = orjson.loads(b64decode(segment))
+        if not isinstance(header, dict) or header.get("alg") != "HS256":
+            raise TokenError("Недопустимый алгоритм")
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            data = token.encode("ascii")
+            signing_input, _, signature = data.rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+            if not header or not payload or b"." in payload:
+                raise TokenError("Некорректный формат")
+            self._check_header(header)
+            if not hmac.compare_digest(
+                self._sign(signing_input), b64decode(signature)
+            ):
+                raise TokenError("Неверная подпись")
+            claims = orjson.loads(b64decode(payload))
+        except (UnicodeError, binascii.Error, orjson.JSONDecodeError) as e:
+            raise TokenError(str(e))
+        if not isinstance(claims, dict):
+            raise TokenError("Некорректная полезная нагрузка")
+        self._check_times(claims)
+        return claims
+
+    @staticmethod
+    def _check_times(claims: dict[str, Any]) -> None:
+        now = time.time()
+        for claim in TIME_CLAIMS:
+            value = claims.get(claim)
+            if value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))
+            ):
+                raise TokenError(f"{claim} должен быть числом")
+        if "exp" in claims and claims["exp"] <= now:
+            raise TokenExpiredError()
+        if "nbf" in claims and claims["nbf"] > now:
+            raise TokenError("Токен еще не действителен")
+
+
+TOKEN_CODECS: dict[str, type[TokenCodec]] = {
+    "jose": JoseCodec,
+    "pyjwt": PyJWTCodec,
+    "hs256": HS256Codec,
+}
+
+
+def create_token_codec(
+    backend: Literal["jose", "pyjwt", "hs256"] = settings.TOKEN_CODEC,
+    secret: str = settings.SECRET_KEY,
+    algorithm: str = settings.ALGORITHM,
+) -> TokenCodec:
+    """Кодек токенов выбранной реализации (TOKEN_CODEC).
+
+    hs256 поддерживает только алгоритм HS256; для другого ALGORITHM
+    используется python-jose.
+    """
+    if backend == "hs256" and algorithm != "HS256":
+        logger.warning(LogMessages.TOKEN_CODEC_FALLBACK.format(algorithm))
+        backend = "jose"
+    return TOKEN_CODECS[backend](secret, algorithm)
+
+
+token_codec = create_token_codec()
@@ -0,0 +1,349 @@
+import asyncio
+import codecs
+import csv
+import json
+import tempfile
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Literal, Optional
+
+from fastapi import UploadFile
+from pydantic import ValidationError
+
+from app.common.constants import CacheKeys, LogMessages, Messages
+from app.common.exceptions import ImportJobNotFoundException
+from app.config import settings
+from app.crud.user_dao import UserDAO
+from app.logger import logger
+from app.schemas.user_import import (
+    UserImportBatchDTO,
+    UserImportErrorDTO,
+    UserImportJobDTO,
+    UserImportReportDTO,
+    UserImportRowDTO,
+)
+from app.services.cache import delete_cached, get_cached, set_cached
+from app.services.password import password_hasher
+
+CHUNK_SIZE = 64 * 1024
+CSV_FIELDS = ["email", "password", "hashed_password", "referral_code"]
+# сколько задач импорта хранится в памяти процесса
+JOBS_KEEP = 100
+
+
+async def iter_lines(upload: UploadFile) -> AsyncIterator[bytes]:
+    """Построчное чтение загруженного файла без загрузки в память.
+
+    Строки возвращаются без декодирования, чтобы некорректная кодировка
+    одной строки не прерывала чтение файла; BOM удаляется из первой.
+    """
+    tail = b""
+    first = True
+    while chunk := await upload.read(CHUNK_SIZE):
+        if first:
+            chunk = chunk.removeprefix(codecs.BOM_UTF8)
+            first = False
+        *lines, tail = (tail + chunk).split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if tail:
+        yield tail.rstrip(b"\r")
+
+
+class UserImportService:
+    @classmethod
+    def parse_line(
+        cls,
+        line: bytes,
+        file_format: Literal["csv", "ndjson"],
+        header: Optional[list[str]],
+    ) -> UserImportRowDTO:
+        """Разбирает строку файла импорта.
+
+        Args:
+            line: Строка файла.
+            file_format: Формат файла.
+            header: Имена колонок CSV.
+
+        Raises:
+            ValueError: Если строка некорректна (в т.ч. не в UTF-8).
+        """
+        text = line.decode("utf-8")
+        if file_format == "ndjson":
+            data = json.loads(text)
+        else:
+            values = next(csv.reader([text]))
+            data = {
+                name: value or None
+                for name, value in zip(header or CSV_FIELDS, values)
+            }
+        return UserImportRowDTO.model_validate(data)
+
+    @classmethod
+    async def hash_passwords(
+        cls, rows: list[UserImportRowDTO]
+    ) -> list[tuple[str, str, Optional[str]]]:
+        """Параллельно вычисляет хэши паролей строк пакета.
+
+        Хэши вычисляются в общем пуле password_hasher: одновременно не
+        более BULK_IMPORT_HASH_WORKERS вычислений, которые при заполненной
+        входами и регистрациями очереди ждут места, а не отклоняются.
+
+        Returns:
+            Записи (email, hashed_password, referral_code) для COPY.
+        """
+        semaphore = asyncio.Semaphore(settings.BULK_IMPORT_HASH_WORKERS)
+
+        async def hash_password(password: str) -> str:
+            async with semaphore:
+                return await password_hasher.hash(password, wait=True)
+
+        pending = {
+            index: hash_password(row.password)
+            for index, row in enumerate(rows)
+            if not row.hashed_password
+        }
+        hashes = dict(zip(pending, await asyncio.gather(*pending.values())))
+        return [
+            (
+                row.email,
+                row.hashed_password or hashes[index],
+                row.referral_code,
+            )
+            for index, row in enumerate(rows)
+        ]
+
+    @classmethod
+    async def load_batch(
+        cls, number: int, rows: list[UserImportRowDTO]
+    ) -> UserImportBatchDTO:
+        """Загружает пакет пользователей в отдельной транзакции.
+
+        После фиксации транзакции из кэша удаляется количество рефералов
+        рефереров, получивших новых рефералов.
+
+        Args:
+            number: Номер пакета.
+            rows: Корректные строки пакета.
+        """
+        started = time.perf_counter()
+        records = await cls.hash_passwords(rows)
+        inserted, unresolved, referrer_ids = await UserDAO.copy_import_batch(
+            records
+        )
+        if referrer_ids:
+            await delete_cached(
+                *(
+                    CacheKeys.REFERRALS_COUNT.format(referrer_id=referrer_id)
+                    for referrer_id in referrer_ids
+                )
+            )
+        logger.info(
+            LogMessages.USERS_IMPORT_BATCH.format(number, len(rows), inserted)
+        )
+        return UserImportBatchDTO(
+            batch=number,
+            received=len(rows),
+            inserted=inserted,
+            skipped=len(rows) - inserted,
+            unresolved_referral_codes=unresolved,
+            elapsed=time.perf_counter() - started,
+        )
+
+    @classmethod
+    async def import_users(
+        cls,
+        upload: UploadFile,
+        file_format: Literal["csv", "ndjson"] = "csv",
+        report: Optional[UserImportReportDTO] = None,
+        on_batch: Optional[
+            Callable[[UserImportReportDTO], Awaitable[None]]
+        ] = None,
+    ) -> UserImportReportDTO:
+        """Массовый импорт пользователей из CSV или NDJSON файла.
+
+        CSV файл должен начинаться со строки заголовка с колонками
+        email, password или hashed_password, referral_code (необязательно).
+        Каждый пакет из BULK_IMPORT_BATCH_SIZE строк загружается через
+        COPY в отдельной транзакции, поэтому уже загруженные пакеты
+        сохраняются при ошибке в последующих.
+
+        Args:
+            upload: Загруженный файл.
+            file_format: Формат файла.
+            report: Отчет, заполняемый по мере загрузки пакетов.
+            on_batch: Вызывается с отчетом после загрузки каждого пакета.
+
+        Returns:
+            UserImportReportDTO: Отчет о загрузке по пакетам и ошибки строк.
+        """
+        if report is None:
+            report = UserImportReportDTO()
+        header = None
+        batch: list[UserImportRowDTO] = []
+        line_number = 0
+
+        async def load(rows: list[UserImportRowDTO]) -> None:
+            result = await cls.load_batch(len(report.batches) + 1, rows)
+            report.batches.append(result)
+            report.received += result.received
+            report.inserted += result.inserted
+            if on_batch is not None:
+                await on_batch(report)
+
+        async for line in iter_lines(upload):
+            line_number += 1
+            if not line.strip():
+                continue
+            if file_format == "csv" and header is None:
+                header = [
+                    name.strip()
+                    for name in next(csv.reader([line.decode("utf-8")]))
+                ]
+                continue
+            try:
+                batch.append(cls.parse_line(line, file_format, header))
+            except (ValueError, ValidationError) as e:
+                report.invalid += 1
+                if len(report.errors) < settings.BULK_IMPORT_MAX_ERRORS:
+                    report.errors.append(
+                        UserImportErrorDTO(line=line_number, error=str(e))
+                    )
+                continue
+            if len(batch) >= settings.BULK_IMPORT_BATCH_SIZE:
+                await load(batch)
+                batch = []
+        if batch:
+            await load(batch)
+        return report
+
+
+class UserImportJobs:
+    """Фоновые задачи импорта пользователей.
+
+    Загруженный файл копируется во временный файл, и импорт выполняется
+    после ответа на запрос; задачи процесса выполняются по одной. Ход
+    задачи (отчет по загруженным пакетам) записывается в Redis после
+    каждого пакета, поэтому его можно получить через любой воркер.
+
+    Задача не переживает перезапуск воркера: пакеты, загруженные до
+    остановки, остаются в БД (каждый в своей транзакции), а состояние
+    задачи перестает обновляться (updated_at). Повторный импорт того же
+    файла безопасен - пользователи с уже занятыми email пропускаются.
+    """
+
+    def __init__(self, keep: int = JOBS_KEEP) -> None:
+        self.keep = keep
+        self.jobs: dict[str, UserImportJobDTO] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def save(self, job: UserImportJobDTO) -> None:
+        job.updated_at = time.time()
+        await set_cached(
+            CacheKeys.USER_IMPORT_JOB.format(job_id=job.id),
+            job,
+            expire=settings.BULK_IMPORT_JOB_TTL,
+        )
+
+    async def get(self, job_id: str) -> UserImportJobDTO:
+        """Состояние задачи импорта.
+
+        Raises:
+            ImportJobNotFoundException: Задача не найдена.
+        """
+        job = self.jobs.get(job_id) or await get_cached(
+            CacheKeys.USER_IMPORT_JOB.format(job_id=job_id), UserImportJobDTO
+        )
+        if job is None:
+            raise ImportJobNotFoundException()
+        return job
+
+    async def start(
+        self,
+        upload: UploadFile,
+        file_format: Literal["csv", "ndjson"] = "csv",
+    ) -> UserImportJobDTO:
+        """Создает задачу импорта файла и запускает ее в фоне.
+
+        Args:
+            upload: Загруженный файл.
+            file_format: Формат файла.
+
+        Returns:
+            UserImportJobDTO: Задача в состоянии queued.
+        """
+        spooled = UploadFile(
+            tempfile.TemporaryFile(), filename=upload.filename
+        )
+        while chunk := await upload.read(CHUNK_SIZE):
+            await spooled.write(chunk)
+        await spooled.seek(0)
+        job = UserImportJobDTO(
+            id=uuid.uuid4().hex,
+            file_format=file_format,
+            created_at=time.time(),
+        )
+        self.jobs[job.id] = job
+        self.prune()
+        await self.save(job)
+        task = asyncio.create_task(self.run(job, spooled))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def run(self, job: UserImportJobDTO, upload: UploadFile) -> None:
+        """Выполняет задачу; ошибки записываются в задачу и лог."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        try:
+            async with self._lock:
+                job.status = "running"
+                job.started_at = time.time()
+                await self.save(job)
+                await UserImportService.import_users(
+                    upload,
+                    job.file_format,
+                    job.report,
+                    on_batch=lambda report: self.save(job),
+                )
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = Messages.IMPORT_JOB_INTERRUPTED
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = repr(e)
+            logger.warning(
+                LogMessages.USERS_IMPORT_FAILED.format(job.id, repr(e))
+            )
+        else:
+            job.status = "done"
+            logger.info(
+                LogMessages.USERS_IMPORT_FINISHED.format(
+                    job.id, job.report.received, job.report.inserted
+                )
+            )
+        finally:
+            job.finished_at = time.time()
+            await upload.close()
+            await self.save(job)
+
+    def prune(self) -> None:
+        """Удаляет из памяти самые старые завершенные задачи сверх keep."""
+        finished = [
+            job.id
+            for job in self.jobs.values()
+            if job.status in ("done", "failed")
+        ]
+        for job_id in finished[: max(len(self.jobs) - self.keep, 0)]:
+            del self.jobs[job_id]
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+user_import_jobs = UserImportJobs()
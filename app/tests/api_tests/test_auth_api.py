@@ -2,6 +2,8 @@ import pytest
 from httpx import AsyncClient
 
 from app.config import settings
+from app.services.login_throttle import login_throttle
+from app.tests.cache_backends import ThrottleDictBackend
 
 
 @pytest.mark.parametrize("route", [settings.API_V1_PREFIX + "/auth/me"])
@@ -66,3 +68,26 @@ async def test_register_existent_email(route, ac: AsyncClient):
         headers={"Content-Type": "application/json"},
     )
     assert response.status_code == 409
+
+
+@pytest.mark.parametrize("cache_backend", [ThrottleDictBackend], indirect=True)
+async def test_login_throttle_keys_clients_behind_proxy(
+    ac: AsyncClient, cache_backend, monkeypatch
+):
+    # ac подключается с 127.0.0.1 - доверенного прокси по умолчанию
+    monkeypatch.setattr(login_throttle, "enabled", True)
+    monkeypatch.setattr(login_throttle, "ip_limit", (1, 60))
+
+    async def login(ip: str, email: str):
+        response = await ac.post(
+            settings.API_V1_PREFIX + "/auth/login",
+            data={"username": email, "password": "wrong"},
+            headers={"X-Forwarded-For": ip},
+        )
+        return response
+
+    assert (await login("10.0.0.1", "a@example.com")).status_code == 401
+    response = await login("10.0.0.1", "b@example.com")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert (await login("10.0.0.2", "c@example.com")).status_code == 401
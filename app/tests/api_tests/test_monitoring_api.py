@@ -0,0 +1,28 @@
+from httpx import AsyncClient
+
+from app.config import settings
+
+monitoring_route = settings.API_V1_PREFIX + "/monitoring"
+
+
+async def test_db_pool_stats(ac: AsyncClient):
+    response = await ac.get(monitoring_route + "/db_pool")
+    assert response.status_code == 200
+    assert response.json()["pool_class"]
+
+
+async def test_cache_stats(ac: AsyncClient):
+    response = await ac.get(monitoring_route + "/cache")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+async def test_ready_without_warmup(ac: AsyncClient):
+    response = await ac.get(monitoring_route + "/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "idle"
+
+
+async def test_cache_breaker_stats(ac: AsyncClient):
+    response = await ac.get(monitoring_route + "/cache_breaker")
+    assert response.status_code == 200
@@ -69,3 +69,28 @@ async def test_get_referral_code_by_email(
     assert response.status_code == status
     if status == 200:
         assert response.json() == refcode
+
+
+@pytest.mark.parametrize("route", [referrals_route])
+async def test_referrals_pagination(route, ac: AsyncClient):
+    response = await ac.get(route + "/1", params={"limit": 1})
+    assert response.status_code == 200
+    page = response.json()
+    assert page["referrals"] == user_id1_referrals["referrals"][:1]
+    assert page["next_cursor"]
+
+    response = await ac.get(
+        route + "/1",
+        params={"limit": 1, "cursor": page["next_cursor"], "with_total": True},
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert page["referrals"] == user_id1_referrals["referrals"][1:]
+    assert "next_cursor" not in page
+    assert page["total"] == 2
+
+
+@pytest.mark.parametrize("route", [referrals_route])
+async def test_referrals_invalid_cursor(route, ac: AsyncClient):
+    response = await ac.get(route + "/1", params={"cursor": "!!!"})
+    assert response.status_code == 400
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional, TypeVar
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+
+B = TypeVar("B", bound=Backend)
+
+
+class DictBackend(Backend):
+    """Бэкенд кэша в словаре без учета времени жизни."""
+
+    def __init__(self):
+        self.store: dict[str, bytes] = {}
+
+    async def get_with_ttl(self, key: str) -> tuple[int, Optional[bytes]]:
+        return -1, self.store.get(key)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None):
+        self.store[key] = value
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        return int(self.store.pop(key, None) is not None)
+
+
+class LockingDictBackend(DictBackend):
+    """Бэкенд с блокировками; блокировки из locked "держит" другой воркер."""
+
+    def __init__(self):
+        super().__init__()
+        self.locked: set[str] = set()
+
+    async def acquire_lock(self, key: str, timeout: float) -> Optional[str]:
+        if key in self.locked:
+            return None
+        self.locked.add(key)
+        return "token"
+
+    async def release_lock(self, key: str, token: str):
+        self.locked.discard(key)
+
+
+class ThrottleDictBackend(DictBackend):
+    """Бэкенд со счетчиками попыток вместо корзин маркеров Redis."""
+
+    def __init__(self, error: Optional[Exception] = None):
+        super().__init__()
+        self.attempts: dict[str, int] = {}
+        self.error = error
+
+    async def throttle(
+        self, limits: dict[str, tuple[int, float]]
+    ) -> tuple[int, float]:
+        if self.error is not None:
+            raise self.error
+        for number, (key, (attempts, period)) in enumerate(limits.items()):
+            if self.attempts.get(key, 0) >= attempts:
+                return number + 1, period / attempts
+        for key in limits:
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+        return 0, 0.0
+
+
+@contextmanager
+def installed_cache(backend: B) -> Iterator[B]:
+    """Бэкенд кэша приложения на время блока."""
+    FastAPICache.reset()
+    FastAPICache.init(backend, prefix="test")
+    try:
+        yield backend
+    finally:
+        FastAPICache.reset()
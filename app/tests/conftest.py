@@ -14,6 +14,7 @@ from app.main import app
 from app.models.base import Base
 from app.models.referral_code import ReferralCode
 from app.models.user import User
+from app.tests.cache_backends import DictBackend, installed_cache
 
 
 @pytest_asyncio.fixture(autouse=True, scope="session")
@@ -68,6 +69,17 @@ def event_loop():
     res._close()
 
 
+@pytest.fixture
+def cache_backend(request):
+    """Бэкенд кэша приложения на время теста.
+
+    По умолчанию DictBackend; другой задается фабрикой бэкенда через
+    @pytest.mark.parametrize("cache_backend", [...], indirect=True).
+    """
+    with installed_cache(getattr(request, "param", DictBackend)()) as backend:
+        yield backend
+
+
 # Фикстура асинхронного клиента для каждого из тестов
 @pytest.fixture(autouse=True, scope="session")
 async def ac() -> AsyncIterator[AsyncClient]:
@@ -0,0 +1,83 @@
+"""Проверка планов запросов DAO.
+
+Запросы, выполняемые DAO, перехватываются и повторно выполняются с
+EXPLAIN при отключенном последовательном сканировании. Если план все
+равно содержит Seq Scan, значит подходящего индекса нет.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.crud.referral_code_dao import ReferralCodeDAO
+from app.crud.user_dao import UserDAO
+from app.database import engine
+
+
+@contextmanager
+def capture_queries():
+    queries = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        queries.append((statement, parameters))
+
+    event.listen(
+        engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        yield queries
+    finally:
+        event.remove(
+            engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+
+
+async def explain(statement, parameters) -> str:
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        result = await conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+        return "\n".join(row[0] for row in result)
+
+
+@pytest.mark.parametrize(
+    "dao_call",
+    [
+        lambda: UserDAO.get_by_id(1),
+        lambda: UserDAO.get_by_email("user1@example.com"),
+        lambda: UserDAO.get_all(referrer_id=1),
+        lambda: UserDAO.get_referrals_page(1, after_id=2, limit=10),
+        lambda: UserDAO.count_referrals(1),
+        lambda: ReferralCodeDAO.get_by_id(1),
+        lambda: ReferralCodeDAO.get_by_user_id(1),
+        lambda: ReferralCodeDAO.get_code_by_user_id(1),
+        lambda: ReferralCodeDAO.get_code_by_user_email("user1@example.com"),
+        lambda: UserDAO.get_referrals(1),
+    ],
+    ids=[
+        "user_get_by_id",
+        "user_get_by_email",
+        "user_get_all_by_referrer_id",
+        "user_get_referrals_page",
+        "user_count_referrals",
+        "referral_code_get_by_id",
+        "referral_code_get_by_user_id",
+        "referral_code_get_code_by_user_id",
+        "referral_code_get_code_by_user_email",
+        "user_get_referrals",
+    ],
+)
+async def test_dao_query_uses_index(dao_call):
+    with capture_queries() as queries:
+        await dao_call()
+    selects = [
+        (statement, parameters)
+        for statement, parameters in queries
+        if statement.lstrip().upper().startswith("SELECT")
+    ]
+    assert selects, "Запросы DAO не перехвачены"
+    for statement, parameters in selects:
+        plan = await explain(statement, parameters)
+        assert "Seq Scan" not in plan, f"{statement}\n{plan}"
@@ -70,3 +70,62 @@ async def test_create_delete_upate_ref_code(code, user_id):
     await ReferralCodeDAO.delete_(id)
     obj = await ReferralCodeDAO.get_by_id(id)
     assert not obj, "Объект не удален из базы"
+
+
+@pytest.mark.parametrize(
+    "code, user_id",
+    [
+        ("upsert_refcode", 3),
+    ],
+)
+async def test_upsert_ref_code(code, user_id):
+    obj = await ReferralCodeDAO.upsert(["user_id"], code=code, user_id=user_id)
+    assert obj, "Функция не вернула созданный объект"
+    assert obj.code == code
+    id = obj.id
+
+    # повторный upsert обновляет существующую запись
+    code = code + "_updated"
+    obj = await ReferralCodeDAO.upsert(["user_id"], code=code, user_id=user_id)
+    assert obj.id == id
+    assert obj.code == code
+
+    objects = await ReferralCodeDAO.upsert_many(
+        [{"code": code + "_many", "user_id": user_id}], ["user_id"]
+    )
+    assert len(objects) == 1
+    assert objects[0].id == id
+    assert objects[0].code == code + "_many"
+
+    await ReferralCodeDAO.delete_(id)
+    obj = await ReferralCodeDAO.get_by_id(id)
+    assert not obj, "Объект не удален из базы"
+
+
+@pytest.mark.parametrize(
+    "email, id, code",
+    [
+        ("user1@example.com", 1, "refcode1"),
+        ("user2@example.com", 2, "refcode2"),
+        ("user3@example.com", None, None),
+        ("unknown@example.com", None, None),
+    ],
+)
+async def test_referral_code_projection_by_email(email, id, code):
+    row = await ReferralCodeDAO.get_code_by_user_email(email)
+    if id:
+        assert tuple(row) == (id, code)
+    else:
+        assert row is None
+
+
+@pytest.mark.parametrize(
+    "code, user_id",
+    [("refcode1", 1), ("refcode2", 2), ("unknown_code", None)],
+)
+async def test_referral_code_owner_by_code(code, user_id):
+    row = await ReferralCodeDAO.get_code_owner(code)
+    if user_id:
+        assert tuple(row) == (user_id, None)
+    else:
+        assert row is None
@@ -1,6 +1,8 @@
 import pytest
 
+from app.crud.referral_code_dao import ReferralCodeDAO
 from app.crud.user_dao import UserDAO
+from app.database import async_session_maker
 
 # from app.users.dao import UsersDAO
 
@@ -25,6 +27,23 @@ async def test_user_get_by_id(user_id, email, referrer_id, exists):
         assert not user
 
 
+@pytest.mark.parametrize(
+    "user_id, email, exists",
+    [
+        (1, "user1@example.com", True),
+        (100, "unknown@example.com", False),
+    ],
+)
+async def test_user_get_principal(user_id, email, exists):
+    principal = await UserDAO.get_principal(user_id)
+    if exists:
+        assert principal
+        assert principal.id == user_id
+        assert principal.email == email
+    else:
+        assert not principal
+
+
 @pytest.mark.parametrize(
     "user_id, email, exists",
     [
@@ -44,6 +63,23 @@ async def test_user_get_one_or_none_by_email(user_id, email, exists):
         assert not user
 
 
+@pytest.mark.parametrize(
+    "user_id, email, exists",
+    [
+        (1, "user1@example.com", True),
+        (100, "unknown@example.com", False),
+    ],
+)
+async def test_user_get_by_email(user_id, email, exists):
+    user = await UserDAO.get_by_email(email)
+    if exists:
+        assert user
+        assert user_id == user.id
+        assert email == user.email
+    else:
+        assert not user
+
+
 @pytest.mark.parametrize(
     "referrer_id, referral_ids",
     [
@@ -81,3 +117,45 @@ async def test_create_delete_user(email, hashed_password):
     await UserDAO.delete_(id)
     user = await UserDAO.get_by_id(id)
     assert not user, "Объект не удален из базы"
+
+
+async def test_shared_session_commits_once():
+    email = "uow_user@example.com"
+    async with async_session_maker() as session:
+        async with session.begin():
+            user = await UserDAO.create(
+                session, email=email, hashed_password="any_password"
+            )
+            await ReferralCodeDAO.create(
+                session, user_id=user.id, code="uow_code"
+            )
+            # до фиксации транзакции изменения не видны другим сессиям
+            assert not await UserDAO.get_one_or_none(email=email)
+    user = await UserDAO.get_one_or_none(email=email)
+    assert user, "Транзакция не зафиксирована"
+    assert await ReferralCodeDAO.get_by_user_id(user.id)
+    await UserDAO.delete_(user.id)
+
+
+async def test_shared_session_rolls_back_on_error():
+    email = "uow_rollback@example.com"
+    with pytest.raises(RuntimeError):
+        async with async_session_maker() as session:
+            async with session.begin():
+                await UserDAO.create(
+                    session, email=email, hashed_password="any_password"
+                )
+                raise RuntimeError()
+    assert not await UserDAO.get_one_or_none(email=email)
+
+
+async def test_create_if_not_exists_skips_existing_email():
+    assert not await UserDAO.create_if_not_exists("user1@example.com", "any")
+    id = await UserDAO.create_if_not_exists(
+        "insert_user@example.com", "any_password", referrer_id=1
+    )
+    assert id, "Функция не вернула идентификатор созданного пользователя"
+    user = await UserDAO.get_by_id(id)
+    assert user.email == "insert_user@example.com"
+    assert user.referrer_id == 1
+    await UserDAO.delete_(id)
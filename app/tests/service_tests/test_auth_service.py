@@ -1,9 +1,23 @@
+import asyncio
+import time
+
 import pytest
+from passlib.context import CryptContext
+from sqlalchemy import event
 
-from app.common.exceptions import UserAlreadyExistsException
+from app.common.exceptions import (
+    PasswordHashingBusyException,
+    UserAlreadyExistsException,
+)
 from app.crud.user_dao import UserDAO
+from app.database import engine
 from app.schemas.auth import UserCreateDTO
 from app.services.auth import AuthService, get_password_hash, verify_password
+from app.services.password import (
+    PasswordHasher,
+    calibrate_argon2,
+    password_hasher,
+)
 
 user2 = {
     "email": "user2@example.com",
@@ -30,6 +44,111 @@ async def test_verify_password():
     assert not verify_password(pwd, hashed_pwd + "err")
 
 
+async def test_password_hasher_runs_off_loop():
+    hasher = PasswordHasher(workers=2, queue_size=0)
+    try:
+        hashed_pwd = await hasher.hash("some_password")
+        assert await hasher.verify("some_password", hashed_pwd)
+        assert not await hasher.verify("wrong", hashed_pwd)
+        assert hasher.pending == 0
+    finally:
+        hasher.shutdown()
+
+
+async def test_password_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    try:
+        results = await asyncio.gather(
+            *(hasher.run(time.sleep, 0.1) for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert (
+            sum(
+                isinstance(result, PasswordHashingBusyException)
+                for result in results
+            )
+            == 1
+        )
+        assert hasher.rejected == 1
+        assert hasher.pending == 0
+        await hasher.run(time.sleep, 0)
+    finally:
+        hasher.shutdown()
+
+
+async def test_password_hasher_waits_when_requested():
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    try:
+        await asyncio.gather(
+            *(hasher.run(time.sleep, 0.05, wait=True) for _ in range(3))
+        )
+        assert hasher.rejected == 0
+        assert hasher.pending == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_calibrate_argon2_fits_target():
+    def measure(time_cost, memory_cost, parallelism, samples):
+        return 0.1 * time_cost * memory_cost / 65536
+
+    params = calibrate_argon2(0.25, 65536, 1, measure=measure)
+    assert (params["time_cost"], params["memory_cost"]) == (2, 65536)
+    params = calibrate_argon2(0.03, 65536, 1, measure=measure)
+    assert (params["time_cost"], params["memory_cost"]) == (1, 16384)
+
+
+async def test_login_rehashes_legacy_hash():
+    legacy_hash = CryptContext(schemes=["bcrypt"]).hash("legacy")
+    user = await UserDAO.create(
+        email="legacy@example.com", hashed_password=legacy_hash
+    )
+    try:
+        assert await AuthService.authenticate_user(
+            "legacy@example.com", "legacy"
+        )
+        rehashed = await UserDAO.get_by_email("legacy@example.com")
+        assert rehashed.hashed_password.startswith("$argon2id$")
+        assert await AuthService.authenticate_user(
+            "legacy@example.com", "legacy"
+        )
+    finally:
+        await UserDAO.delete_(user.id)
+
+
+async def test_login_releases_connection_before_hashing(monkeypatch):
+    checked_out = 0
+    during_hashing = []
+
+    def checkout(*args):
+        nonlocal checked_out
+        checked_out += 1
+
+    def checkin(*args):
+        nonlocal checked_out
+        checked_out -= 1
+
+    verify_and_update = password_hasher.verify_and_update
+
+    async def recording_verify_and_update(*args):
+        during_hashing.append(checked_out)
+        return await verify_and_update(*args)
+
+    monkeypatch.setattr(
+        password_hasher, "verify_and_update", recording_verify_and_update
+    )
+    event.listen(engine.sync_engine, "checkout", checkout)
+    event.listen(engine.sync_engine, "checkin", checkin)
+    try:
+        assert await AuthService.authenticate_user(
+            "user1@example.com", "user1"
+        )
+    finally:
+        event.remove(engine.sync_engine, "checkout", checkout)
+        event.remove(engine.sync_engine, "checkin", checkin)
+    assert during_hashing == [0]
+
+
 async def test_register_new_user():
     user_data = UserCreateDTO(**new_user4)
     await AuthService.register(user_data)
@@ -38,6 +157,14 @@ async def test_register_new_user():
     assert user.email == new_user4["email"]
 
 
+async def test_register_with_referral_code():
+    user_data = UserCreateDTO(email="referred@example.com", password="ref")
+    await AuthService.register(user_data, "refcode1")
+    user = await UserDAO.get_by_email("referred@example.com")
+    assert user.referrer_id == 1
+    await UserDAO.delete_(user.id)
+
+
 @pytest.mark.parametrize(
     "user_dict",
     [(user1), (user2)],
@@ -96,3 +223,16 @@ async def test_get_users_by_referrer_id(referrer_id, users_id):
     dto = await AuthService.get_users_by_referrer_id(referrer_id)
     assert len(dto.referrals) == len(users_id)
     assert {user.id for user in dto.referrals} == set(users_id)
+
+
+async def test_concurrent_registrations_for_one_email():
+    user_data = UserCreateDTO(email="race@example.com", password="race")
+    results = await asyncio.gather(
+        *(AuthService.register(user_data) for _ in range(5)),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if result is not None]
+    assert len(errors) == 4
+    assert all(isinstance(e, UserAlreadyExistsException) for e in errors)
+    user = await UserDAO.get_by_email("race@example.com")
+    await UserDAO.delete_(user.id)
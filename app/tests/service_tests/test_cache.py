@@ -0,0 +1,245 @@
+import asyncio
+
+import pytest
+
+from app.common.exceptions import ReferralCodeNotFoundException
+from app.crud.referral_code_dao import ReferralCodeDAO
+from app.crud.user_dao import UserDAO
+from app.schemas.auth import UserPrincipalDTO
+from app.services.cache import CacheEntry, add_cached, set_raw
+from app.services.cache_warmup import CacheWarmup
+from app.services.referral_code import ReferralCodeService
+from app.tests.cache_backends import LockingDictBackend
+
+
+async def test_cached_read_uses_stable_key(cache_backend, monkeypatch):
+    dto = await ReferralCodeService.get_by_user_id(1)
+    assert "test:referral_code:user:1" in cache_backend.store
+    assert await ReferralCodeService.get_referrer_user_id("refcode1") == 1
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_by_user_id", fail)
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_owner", fail)
+    assert await ReferralCodeService.get_by_user_id(1) == dto
+    assert await ReferralCodeService.get_referrer_user_id("refcode1") == 1
+
+
+async def test_renew_writes_through_and_delete_evicts(cache_backend):
+    user = await UserDAO.create(
+        email="cached@example.com", hashed_password="dummy"
+    )
+    principal = UserPrincipalDTO(id=user.id, email=user.email)
+    keys = (
+        f"test:referral_code:user:{user.id}",
+        f"test:referral_code:email:{user.email}",
+    )
+    try:
+        first = await ReferralCodeService.renew_user_code(principal, 10)
+        assert await ReferralCodeService.get_by_user_email(user.email) == first
+
+        renewed = await ReferralCodeService.renew_user_code(principal, 20)
+        assert renewed.code != first.code
+        assert await ReferralCodeService.get_by_user_id(user.id) == renewed
+        assert await ReferralCodeService.get_by_user_email(user.email) == (
+            renewed
+        )
+        assert f"test:referral_code:id:{renewed.id}" in cache_backend.store
+
+        await ReferralCodeService.delete_by_user_id(user.id)
+        for key in keys:
+            assert key not in cache_backend.store
+        assert f"test:referral_code:id:{renewed.id}" not in cache_backend.store
+    finally:
+        await UserDAO.delete_(user.id)
+
+
+async def test_not_found_is_cached(cache_backend, monkeypatch):
+    email = "nobody@example.com"
+    with pytest.raises(ReferralCodeNotFoundException):
+        await ReferralCodeService.get_by_user_email(email)
+    entry = CacheEntry.load(
+        cache_backend.store[f"test:referral_code:email:{email}"]
+    )
+    assert entry.is_not_found
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_by_user_email", fail)
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_owner", fail)
+    with pytest.raises(ReferralCodeNotFoundException):
+        await ReferralCodeService.get_by_user_email(email)
+
+
+async def test_created_code_replaces_not_found_entry(cache_backend):
+    user = await UserDAO.create(
+        email="negative@example.com", hashed_password="dummy"
+    )
+    principal = UserPrincipalDTO(id=user.id, email=user.email)
+    try:
+        with pytest.raises(ReferralCodeNotFoundException):
+            await ReferralCodeService.get_by_user_id(user.id)
+        with pytest.raises(ReferralCodeNotFoundException):
+            await ReferralCodeService.get_by_user_email(user.email)
+
+        created = await ReferralCodeService.renew_user_code(principal, 10)
+        assert await ReferralCodeService.get_by_user_id(user.id) == created
+        assert await ReferralCodeService.get_by_user_email(user.email) == (
+            created
+        )
+        assert (
+            await ReferralCodeService.get_referrer_user_id(created.code)
+            == user.id
+        )
+    finally:
+        await UserDAO.delete_(user.id)
+
+
+def count_calls(monkeypatch, dao, name: str, delay: float = 0.05) -> list:
+    """Подменяет метод DAO, считая вызовы и замедляя каждый на delay."""
+    calls = []
+    original = getattr(dao, name)
+
+    async def counted(*args, **kwargs):
+        calls.append(args)
+        await asyncio.sleep(delay)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(dao, name, counted)
+    return calls
+
+
+async def test_stampede_loads_once(cache_backend, monkeypatch):
+    calls = count_calls(monkeypatch, ReferralCodeDAO, "get_code_by_user_id")
+    results = await asyncio.gather(
+        *(ReferralCodeService.get_by_user_id(1) for _ in range(200))
+    )
+    assert len(calls) == 1
+    assert {result.code for result in results} == {"refcode1"}
+
+    await asyncio.gather(
+        *(ReferralCodeService.get_by_user_id(1) for _ in range(200))
+    )
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("cache_backend", [LockingDictBackend], indirect=True)
+async def test_stampede_serves_stale_while_other_worker_reloads(
+    cache_backend, monkeypatch
+):
+    calls = count_calls(monkeypatch, ReferralCodeDAO, "get_code_by_user_id")
+    stale = CacheEntry(b'{"id":1,"code":"stale"}', fresh_until=1.0)
+    cache_backend.store["test:referral_code:user:1"] = stale.dump()
+    cache_backend.locked.add("test:referral_code:user:1")
+
+    results = await asyncio.gather(
+        *(ReferralCodeService.get_by_user_id(1) for _ in range(50))
+    )
+    assert not calls
+    assert {result.code for result in results} == {"stale"}
+
+
+@pytest.mark.parametrize("cache_backend", [LockingDictBackend], indirect=True)
+async def test_stampede_waits_for_other_worker(cache_backend, monkeypatch):
+    calls = count_calls(monkeypatch, ReferralCodeDAO, "get_code_by_user_id")
+    cache_backend.locked.add("test:referral_code:user:2")
+
+    async def other_worker():
+        await asyncio.sleep(0.1)
+        await set_raw("referral_code:user:2", b'{"id":2,"code":"fresh"}', 60)
+
+    results, _ = await asyncio.gather(
+        asyncio.gather(
+            *(ReferralCodeService.get_by_user_id(2) for _ in range(50))
+        ),
+        other_worker(),
+    )
+    assert not calls
+    assert {result.code for result in results} == {"fresh"}
+
+
+async def test_validation_is_cached_until_code_is_renewed(
+    cache_backend, monkeypatch
+):
+    user = await UserDAO.create(
+        email="validated@example.com", hashed_password="dummy"
+    )
+    principal = UserPrincipalDTO(id=user.id, email=user.email)
+    try:
+        old = await ReferralCodeService.renew_user_code(principal, 10)
+        calls = count_calls(
+            monkeypatch, ReferralCodeDAO, "get_code_owner", delay=0
+        )
+        for _ in range(10):
+            assert (
+                await ReferralCodeService.get_referrer_user_id(old.code)
+                == user.id
+            )
+        assert len(calls) == 1
+
+        new = await ReferralCodeService.renew_user_code(principal, 10)
+        with pytest.raises(ReferralCodeNotFoundException):
+            await ReferralCodeService.get_referrer_user_id(old.code)
+        assert (
+            await ReferralCodeService.get_referrer_user_id(new.code) == user.id
+        )
+    finally:
+        await UserDAO.delete_(user.id)
+
+
+async def test_warmup_loads_top_referrers(cache_backend, monkeypatch):
+    await add_cached("referrals:count:1", 100)
+    warmup = CacheWarmup(top=10, batch_size=1, concurrency=2)
+    await warmup.run()
+    assert warmup.progress.status == "done"
+    assert warmup.progress.processed == warmup.progress.total == 1
+    assert warmup.ready
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_by_user_id", fail)
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_by_user_email", fail)
+    monkeypatch.setattr(ReferralCodeDAO, "get_code_owner", fail)
+    code = await ReferralCodeService.get_by_user_id(1)
+    assert code.code == "refcode1"
+    assert await ReferralCodeService.get_by_user_email(
+        "user1@example.com"
+    ) == (code)
+    # значение, записанное до прогрева, не заменяется
+    assert (
+        CacheEntry.load(cache_backend.store["test:referrals:count:1"]).payload
+        == b"100"
+    )
+
+
+async def test_warmup_drops_code_changed_during_write(
+    cache_backend, monkeypatch
+):
+    get_codes = ReferralCodeDAO.get_codes_by_user_ids
+    reads = []
+
+    async def renewed_after_first_read(user_ids, session=None):
+        rows = await get_codes(user_ids, session)
+        reads.append(rows)
+        if len(reads) == 1:
+            # код заменен и удален из кэша между чтением и записью
+            return [
+                (id, "oldcode", user_id, email)
+                for id, _, user_id, email in rows
+            ]
+        return rows
+
+    monkeypatch.setattr(
+        ReferralCodeDAO, "get_codes_by_user_ids", renewed_after_first_read
+    )
+    warmup = CacheWarmup(top=10, batch_size=10, concurrency=1)
+    await warmup.run()
+    assert warmup.progress.status == "done"
+    assert len(reads) == 2
+    assert not any(
+        key.startswith("test:referral_code:") for key in cache_backend.store
+    )
+    assert "test:referrals:count:1" in cache_backend.store
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from typing import Optional
+
+import pytest
+import pytest_asyncio
+from redis import asyncio as aioredis
+
+from app.crud.referral_code_dao import ReferralCodeDAO
+from app.services.cache import delete_cached
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.redis_cache import CircuitBreakerBackend, TwoTierBackend
+from app.services.referral_code import ReferralCodeService
+from app.tests.cache_backends import installed_cache
+
+
+class StandInRedis:
+    """Заглушка Redis на локальном TCP-порту для внедрения отказов.
+
+    Режимы: "ok" - пустой кэш (GET возвращает null, запись успешна),
+    "hang" - принимает команды и не отвечает, "drop" - закрывает
+    соединение.
+    """
+
+    replies = {b"SET": b"+OK\r\n", b"DEL": b":1\r\n", b"EVALSHA": b":1\r\n"}
+
+    def __init__(self):
+        self.mode = "ok"
+        self.commands: list[list[bytes]] = []
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._released = asyncio.Event()
+
+    @staticmethod
+    async def read_command(
+        reader: asyncio.StreamReader,
+    ) -> Optional[list[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        command = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            command.append((await reader.readexactly(size + 2))[:-2])
+        return command
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while (command := await self.read_command(reader)) is not None:
+                if self.mode == "drop":
+                    break
+                if self.mode == "hang":
+                    await self._released.wait()
+                    break
+                self.commands.append(command)
+                writer.write(self.replies.get(command[0], b"$-1\r\n"))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._released.set()
+        self._server.close()
+        await self._server.wait_closed()
+
+
+@pytest_asyncio.fixture
+async def stand_in_redis():
+    server = StandInRedis()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest_asyncio.fixture
+async def breaker_backend(stand_in_redis):
+    redis = aioredis.Redis(
+        host="127.0.0.1",
+        port=stand_in_redis.port,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+    )
+    breaker = CircuitBreaker(
+        "redis",
+        call_timeout=0.05,
+        window=4,
+        min_calls=4,
+        failure_rate=0.5,
+        reset_timeout=0.2,
+    )
+    backend = CircuitBreakerBackend(TwoTierBackend(redis), breaker)
+    with installed_cache(backend):
+        yield backend
+    await backend.stop()
+
+
+@pytest.fixture
+def dao_calls(monkeypatch) -> list:
+    calls = []
+
+    async def get_code_by_user_id(user_id, session=None):
+        calls.append(user_id)
+        return user_id, f"refcode{user_id}"
+
+    monkeypatch.setattr(
+        ReferralCodeDAO, "get_code_by_user_id", get_code_by_user_id
+    )
+    return calls
+
+
+async def test_breaker_opens_on_failure_rate_and_probes():
+    breaker = CircuitBreaker(
+        "test", call_timeout=1, window=4, min_calls=4, reset_timeout=0.05
+    )
+
+    async def fail():
+        raise ConnectionError
+
+    async def succeed():
+        return "ok"
+
+    await breaker.call(succeed)
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+    await breaker.call(succeed)
+    assert breaker.state == "closed"
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+
+    await asyncio.sleep(0.05)
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+    assert breaker.state == "open"
+
+    await asyncio.sleep(0.05)
+    assert await breaker.call(succeed) == "ok"
+    assert breaker.state == "closed"
+    assert breaker.stats.opened == 2
+    assert breaker.stats.rejected == 1
+
+
+@pytest.mark.parametrize("mode", ["hang", "drop"])
+async def test_unavailable_redis_is_bypassed(
+    mode, stand_in_redis, breaker_backend, dao_calls
+):
+    stand_in_redis.mode = mode
+    for _ in range(4):
+        dto = await ReferralCodeService.get_by_user_id(1)
+        assert dto.code == "refcode1"
+    assert breaker_backend.breaker.state == "open"
+    assert breaker_backend.is_open
+
+    started = time.perf_counter()
+    for _ in range(100):
+        await ReferralCodeService.get_by_user_id(1)
+    # без размыкателя каждый вызов ждал бы call_timeout
+    assert time.perf_counter() - started < 0.5
+    assert len(dao_calls) == 104
+
+
+async def test_deletes_are_replayed_after_recovery(
+    stand_in_redis, breaker_backend, dao_calls
+):
+    stand_in_redis.mode = "hang"
+    for _ in range(4):
+        await ReferralCodeService.get_by_user_id(1)
+    assert breaker_backend.is_open
+
+    await delete_cached("referral_code:user:1")
+    assert breaker_backend.pending_deletes == 1
+
+    stand_in_redis.mode = "ok"
+    await asyncio.sleep(0.2)
+    await ReferralCodeService.get_by_user_id(2)
+    assert breaker_backend.breaker.state == "closed"
+    await asyncio.sleep(0.05)
+    assert breaker_backend.pending_deletes == 0
+    assert [b"DEL", b"test:referral_code:user:1"] in stand_in_redis.commands
@@ -0,0 +1,43 @@
+import pytest
+
+from app.common.exceptions import TooManyAttemptsException
+from app.services.login_throttle import LoginThrottle
+from app.tests.cache_backends import ThrottleDictBackend
+
+
+@pytest.mark.parametrize("cache_backend", [ThrottleDictBackend], indirect=True)
+async def test_attempts_over_limit_are_rejected(cache_backend):
+    throttle = LoginThrottle(
+        ip_limit=(3, 60), email_limit=(2, 3.5), enabled=True
+    )
+    await throttle.check("login", "10.0.0.1", "user@example.com")
+    await throttle.check("login", "10.0.0.1", "USER@example.com")
+    with pytest.raises(TooManyAttemptsException) as e:
+        await throttle.check("login", "10.0.0.1", "user@example.com")
+    assert e.value.status_code == 429
+    assert e.value.headers == {"Retry-After": "2"}
+
+    await throttle.check("login", "10.0.0.1", "other@example.com")
+    with pytest.raises(TooManyAttemptsException):
+        await throttle.check("login", "10.0.0.1", "another@example.com")
+    # лимиты регистрации и входа независимы
+    await throttle.check("register", "10.0.0.1", "user@example.com")
+    assert throttle.get_stats() == {
+        "enabled": True,
+        "allowed": 4,
+        "rejected": {"login:email": 1, "login:ip": 1},
+    }
+
+
+@pytest.mark.parametrize(
+    "cache_backend",
+    [lambda: ThrottleDictBackend(ConnectionError())],
+    indirect=True,
+)
+async def test_unavailable_redis_allows_attempts(cache_backend):
+    throttle = LoginThrottle(
+        ip_limit=(1, 60), email_limit=(1, 60), enabled=True
+    )
+    for _ in range(3):
+        await throttle.check("login", "10.0.0.1", "user@example.com")
+    assert throttle.stats.allowed == 3
@@ -0,0 +1,56 @@
+import json
+
+from redis import asyncio as aioredis
+
+from app.services.redis_cache import LocalCache, TwoTierBackend
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats.evictions == 1
+    assert cache.stats.hits == 3
+    assert cache.stats.misses == 1
+
+
+def test_local_cache_expires_entries():
+    cache = LocalCache(maxsize=10, ttl=60)
+    cache.set("a", "1", expire=-1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_invalidation_message_from_other_node_drops_local_key():
+    redis = aioredis.from_url("redis://localhost")
+    backend = TwoTierBackend(redis, LocalCache(maxsize=10, ttl=60))
+    backend.local.set("refcache:a", "1")
+    backend.local.set("refcache:b", "2")
+
+    backend._invalidate(json.dumps({"node": backend.node_id, "key": "a"}))
+    backend._invalidate(json.dumps({"node": "other", "key": "refcache:a"}))
+    assert backend.local.get("refcache:a") is None
+    assert backend.local.get("refcache:b") == "2"
+
+    backend._invalidate(json.dumps({"node": "other", "namespace": "refcache"}))
+    assert len(backend.local) == 0
+
+
+def test_invalidation_listeners_receive_changed_keys():
+    redis = aioredis.from_url("redis://localhost")
+    backend = TwoTierBackend(redis)
+    assert not backend.broadcasts
+    keys = []
+    backend.add_invalidation_listener(keys.append)
+    assert backend.broadcasts
+
+    backend._invalidate(json.dumps({"node": backend.node_id, "key": "a"}))
+    backend._invalidate(json.dumps({"node": "other", "key": "test:a"}))
+    backend._invalidate(json.dumps({"node": "other", "namespace": "test"}))
+    backend._reset()
+    assert keys == ["test:a", None, None]
@@ -1,4 +1,6 @@
 import asyncio
+import re
+from datetime import datetime, timedelta, timezone
 
 import pytest
 
@@ -9,6 +11,7 @@ from app.common.exceptions import (
 from app.crud.referral_code_dao import ReferralCodeDAO
 from app.crud.user_dao import UserDAO
 from app.services.referral_code import ReferralCodeService
+from app.services.token_codec import token_codec
 
 refcode1 = {"id": 1, "code": "refcode1", "user_id": 1}
 refcode2 = {"id": 2, "code": "refcode2", "user_id": 2}
@@ -112,3 +115,47 @@ async def test_referrer_user_id_raises_exception_for_expired_code():
     code = await ReferralCodeDAO.get_by_id(code_dto.id)
     assert not code, "Код не удален из базы"
     await UserDAO.delete_(user.id)
+
+
+async def test_concurrent_renewals_for_one_user():
+    user = await UserDAO.create(
+        email="concurrent@example.com", hashed_password="dummy"
+    )
+    results = await asyncio.gather(
+        *(
+            ReferralCodeService.renew_user_code(user, life_time=30 + i)
+            for i in range(20)
+        )
+    )
+    assert len({dto.id for dto in results}) == 1, "Создано несколько кодов"
+    code = await ReferralCodeDAO.get_by_user_id(user.id)
+    assert code.code in {dto.code for dto in results}
+    await UserDAO.delete_(user.id)
+
+
+async def test_renewed_code_is_short_and_expires_in_db():
+    user = await UserDAO.create(**dummy_user)
+    code_dto = await ReferralCodeService.renew_user_code(user, life_time=30)
+    assert re.fullmatch("[0-9A-Za-z]{12}", code_dto.code)
+    code = await ReferralCodeDAO.get_by_id(code_dto.id)
+    expire = datetime.now(timezone.utc) + timedelta(minutes=30)
+    assert abs((code.expires_at - expire).total_seconds()) < 5
+    await UserDAO.delete_(user.id)
+
+
+@pytest.mark.parametrize("user_id, code", [(1, "refcode1"), (2, "refcode2")])
+async def test_code_without_expiry_is_valid(user_id, code):
+    assert await ReferralCodeService.get_referrer_user_id(code) == user_id
+
+
+async def test_legacy_jwt_code_is_accepted():
+    user = await UserDAO.create(**dummy_user)
+    expire = datetime.now(timezone.utc) + timedelta(minutes=30)
+    code = token_codec.encode({"sub": str(user.id), "exp": expire})
+    await ReferralCodeDAO.create(code=code, user_id=user.id)
+    assert await ReferralCodeService.get_referrer_user_id(code) == user.id
+
+    expired = token_codec.encode({"sub": str(user.id), "exp": 1})
+    with pytest.raises(ReferralCodeExpiredException):
+        await ReferralCodeService.get_referrer_user_id(expired)
+    await UserDAO.delete_(user.id)
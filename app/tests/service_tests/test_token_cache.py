@@ -0,0 +1,69 @@
+import pytest
+
+from app.common.constants import CacheKeys
+from app.common.exceptions import AuthorizationErrorException
+from app.crud.user_dao import UserDAO
+from app.models.user import User
+from app.services.auth import AuthService, current_user
+from app.services.cache import build_key, set_cached
+from app.services.token_cache import hash_token, token_cache
+from app.services.token_codec import token_codec
+
+
+@pytest.fixture
+def cache_backend(cache_backend):
+    token_cache.clear()
+    yield cache_backend
+    token_cache.clear()
+
+
+@pytest.fixture
+def calls(monkeypatch) -> dict:
+    calls = {"decode": 0, "principal": 0}
+    decode = token_codec.decode
+
+    def counting_decode(token):
+        calls["decode"] += 1
+        return decode(token)
+
+    async def get_principal(user_id, session=None):
+        calls["principal"] += 1
+        return {"id": user_id, "email": f"user{user_id}@example.com"}
+
+    monkeypatch.setattr(token_codec, "decode", counting_decode)
+    monkeypatch.setattr(UserDAO, "get_principal", get_principal)
+    return calls
+
+
+def access_token(user_id: int) -> str:
+    return AuthService.create_access_token(User(id=user_id))
+
+
+async def test_verified_token_and_principal_are_cached(cache_backend, calls):
+    token = access_token(1)
+    for _ in range(3):
+        principal = await current_user(token)
+        assert principal.id == 1
+    assert calls == {"decode": 1, "principal": 1}
+
+    with pytest.raises(AuthorizationErrorException):
+        await current_user(token + "err")
+
+
+async def test_revoked_token_is_rejected(cache_backend, calls):
+    token = access_token(1)
+    await current_user(token)
+    await AuthService.revoke_token(token)
+    with pytest.raises(AuthorizationErrorException):
+        await current_user(token)
+
+    # токен, отозванный другим воркером: запись в Redis и сообщение в
+    # канале инвалидации
+    token = access_token(2)
+    await current_user(token)
+    key = CacheKeys.REVOKED_TOKEN.format(token_hash=hash_token(token))
+    await set_cached(key, True)
+    await current_user(token)
+    token_cache.invalidate(build_key(key))
+    with pytest.raises(AuthorizationErrorException):
+        await current_user(token)
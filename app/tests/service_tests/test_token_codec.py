@@ -0,0 +1,74 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.token_codec import (
+    TOKEN_CODECS,
+    HS256Codec,
+    JoseCodec,
+    TokenCodec,
+    TokenError,
+    TokenExpiredError,
+    b64encode,
+    create_token_codec,
+)
+
+SECRET = "secret"
+
+
+@pytest.fixture(params=sorted(TOKEN_CODECS))
+def codec(request):
+    return create_token_codec(request.param, SECRET, "HS256")
+
+
+def test_encoded_token_is_decoded_by_every_codec(codec):
+    expire = datetime.now(timezone.utc) + timedelta(minutes=5)
+    token = codec.encode({"sub": "1", "exp": expire})
+    for backend in TOKEN_CODECS:
+        payload = create_token_codec(backend, SECRET, "HS256").decode(token)
+        assert payload == {"sub": "1", "exp": int(expire.timestamp())}
+
+
+def test_expired_token_is_rejected(codec):
+    token = codec.encode({"sub": "1", "exp": int(time.time()) - 10})
+    with pytest.raises(TokenExpiredError):
+        codec.decode(token)
+
+
+def test_invalid_tokens_are_rejected(codec):
+    token = codec.encode({"sub": "1", "exp": int(time.time()) + 60})
+    header, payload, signature = token.split(".")
+    forged = b64encode(b'{"sub":"2","exp":9999999999}').decode()
+    unsigned = b64encode(b'{"alg":"none","typ":"JWT"}').decode()
+    other_key = create_token_codec("hs256", "other", "HS256")
+    for invalid in (
+        "",
+        "not a token",
+        token + "x",
+        f"{header}.{forged}.{signature}",
+        f"{unsigned}.{payload}.",
+        f"{header}.{payload}.{signature}.{signature}",
+        other_key.encode({"sub": "1"}),
+    ):
+        with pytest.raises(TokenError):
+            codec.decode(invalid)
+
+
+def test_hs256_codec_checks_algorithm_and_claims():
+    with pytest.raises(ValueError):
+        HS256Codec(SECRET, "HS512")
+    codec = HS256Codec(SECRET)
+    with pytest.raises(TokenError):
+        codec.decode(codec.encode({"sub": "1", "exp": "never"}))
+    with pytest.raises(TokenError):
+        codec.decode(codec.encode({"sub": "1", "nbf": time.time() + 60}))
+
+
+def test_hs256_falls_back_to_jose_for_other_algorithms():
+    codec = create_token_codec("hs256", SECRET, "HS512")
+    assert isinstance(codec, JoseCodec)
+    token = codec.encode({"sub": "1"})
+    assert codec.decode(token) == {"sub": "1"}
+    with pytest.raises(TypeError):
+        TokenCodec(SECRET, "HS256")
@@ -0,0 +1,149 @@
+import asyncio
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import UploadFile
+
+from app.common.exceptions import ImportJobNotFoundException
+from app.crud.referral_code_dao import ReferralCodeDAO
+from app.crud.user_dao import UserDAO
+from app.services.auth import AuthService
+from app.services.user_import import UserImportJobs, UserImportService
+
+csv_content = (
+    "email,password,hashed_password,referral_code\n"
+    "import1@example.com,import1,,refcode1\n"
+    "import2@example.com,,$2b$12$dummyhash,\n"
+    "not_an_email,import3,,\n"
+    "user1@example.com,user1,,\n"
+    "import4@example.com,,,\n"
+)
+
+ndjson_content = (
+    '{"email": "import5@example.com", "hashed_password": "hash"}\n'
+    '{"email": "import5@example.com", "hashed_password": "hash"}\n'
+    "not a json\n"
+)
+
+
+async def test_import_users_csv():
+    upload = UploadFile(io.BytesIO(csv_content.encode()), filename="u.csv")
+    report = await UserImportService.import_users(upload, "csv")
+    assert report.received == 3
+    assert report.inserted == 2
+    assert report.invalid == 2
+    assert {error.line for error in report.errors} == {4, 6}
+    assert report.batches[0].skipped == 1
+
+    user = await UserDAO.get_one_or_none(email="import1@example.com")
+    assert user
+    assert user.referrer_id == 1
+    assert user.hashed_password != "import1"
+    user2 = await UserDAO.get_one_or_none(email="import2@example.com")
+    assert user2
+    assert user2.referrer_id is None
+    await UserDAO.delete_(user.id)
+    await UserDAO.delete_(user2.id)
+
+
+async def test_import_users_ndjson():
+    upload = UploadFile(
+        io.BytesIO(ndjson_content.encode()), filename="u.ndjson"
+    )
+    report = await UserImportService.import_users(upload, "ndjson")
+    assert report.received == 2
+    assert report.inserted == 1
+    assert report.invalid == 1
+    user = await UserDAO.get_one_or_none(email="import5@example.com")
+    assert user
+    await UserDAO.delete_(user.id)
+
+
+def upload_csv(*rows: str) -> UploadFile:
+    content = "\n".join(
+        ("email,password,hashed_password,referral_code",) + rows
+    )
+    return UploadFile(io.BytesIO(content.encode()), filename="u.csv")
+
+
+async def test_import_reports_invalid_utf8_line():
+    content = (
+        b"\xef\xbb\xbfemail,password,hashed_password,referral_code\n"
+        b"import9@example.com,,hash,\n"
+        b"bad\xff@example.com,,hash,\n"
+    )
+    upload = UploadFile(io.BytesIO(content), filename="u.csv")
+    report = await UserImportService.import_users(upload, "csv")
+    assert (report.inserted, report.invalid) == (1, 1)
+    assert [error.line for error in report.errors] == [3]
+    user = await UserDAO.get_one_or_none(email="import9@example.com")
+    await UserDAO.delete_(user.id)
+
+
+async def test_import_evicts_cached_referrals_count(cache_backend):
+    before = await AuthService.count_referrals(1)
+    assert "test:referrals:count:1" in cache_backend.store
+    await UserImportService.import_users(
+        upload_csv("import6@example.com,,hash,refcode1"), "csv"
+    )
+    assert "test:referrals:count:1" not in cache_backend.store
+    assert await AuthService.count_referrals(1) == before + 1
+    user = await UserDAO.get_one_or_none(email="import6@example.com")
+    await UserDAO.delete_(user.id)
+
+
+async def test_import_ignores_expired_referral_code():
+    referrer = await UserDAO.create(
+        email="expired_referrer@example.com", hashed_password="dummy"
+    )
+    await ReferralCodeDAO.create(
+        user_id=referrer.id,
+        code="expiredcode",
+        expires_at=datetime.now(timezone.utc) - timedelta(minutes=1),
+    )
+    try:
+        report = await UserImportService.import_users(
+            upload_csv(
+                "import7@example.com,,hash,expiredcode",
+                "import8@example.com,,hash,unknowncode",
+            ),
+            "csv",
+        )
+        assert report.inserted == 2
+        assert report.batches[0].unresolved_referral_codes == 2
+        user = await UserDAO.get_one_or_none(email="import7@example.com")
+        assert user.referrer_id is None
+        await UserDAO.delete_(user.id)
+        user = await UserDAO.get_one_or_none(email="import8@example.com")
+        await UserDAO.delete_(user.id)
+    finally:
+        await UserDAO.delete_(referrer.id)
+
+
+async def test_import_job_reports_progress():
+    jobs = UserImportJobs()
+    upload = UploadFile(
+        io.BytesIO(ndjson_content.encode()), filename="u.ndjson"
+    )
+    job = await jobs.start(upload, "ndjson")
+    assert job.status == "queued"
+    # файл запроса больше не нужен задаче
+    await upload.close()
+    for _ in range(100):
+        job = await jobs.get(job.id)
+        if job.status in ("done", "failed"):
+            break
+        await asyncio.sleep(0.05)
+    assert job.status == "done"
+    assert job.finished_at is not None
+    assert [batch.inserted for batch in job.report.batches] == [1]
+    assert (job.report.received, job.report.invalid) == (2, 1)
+    user = await UserDAO.get_one_or_none(email="import5@example.com")
+    assert user
+    await UserDAO.delete_(user.id)
+
+
+async def test_import_job_not_found():
+    with pytest.raises(ImportJobNotFoundException):
+        await UserImportJobs().get("unknown")
@@ -0,0 +1,96 @@
+"""Сравнение кодеков значений кэша.
+
+Запуск (подключение к БД и Redis не требуется):
+
+    python -m benchmarks.bench_cache_coder --referrals 100 1000 10000
+
+Для ReferralCodeReadDTO и ReferralsListDTO разного размера выводятся
+время кодирования, время декодирования в DTO и размер значения:
+
+- JsonCoder: кодек fastapi-cache по умолчанию, после декодирования
+  значение валидируется в DTO;
+- pydantic: dump_json/validate_json (TypeAdapter);
+- OrjsonCoder: кодек кэша приложения, DTO создается без валидации.
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi_cache.coder import JsonCoder
+from pydantic import TypeAdapter
+
+from app.schemas.auth import ReferralReadDTO, ReferralsListDTO
+from app.schemas.referral_code import ReferralCodeReadDTO
+from app.services.cache import OrjsonCoder
+from app.services.referral_code import ReferralCodeService
+
+
+def measure(call, min_time: float = 0.2) -> float:
+    call()
+    iterations = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_time:
+        call()
+        iterations += 1
+    return (time.perf_counter() - started) / iterations
+
+
+def coders(tp):
+    adapter = TypeAdapter(tp)
+    return {
+        "JsonCoder": (
+            JsonCoder.encode,
+            lambda data: adapter.validate_python(JsonCoder.decode(data)),
+        ),
+        "pydantic": (adapter.dump_json, adapter.validate_json),
+        "OrjsonCoder": (
+            OrjsonCoder.encode,
+            lambda data: OrjsonCoder.decode_as_type(data, tp),
+        ),
+    }
+
+
+def report(name: str, value):
+    for coder, (encode, decode) in coders(type(value)).items():
+        data = encode(value)
+        assert decode(data) == value
+        encode_time = measure(lambda: encode(value))
+        decode_time = measure(lambda: decode(data))
+        print(
+            f"{name:<28}{coder:<14}{encode_time * 1e6:12.1f}us"
+            f"{decode_time * 1e6:14.1f}us{len(data):12}"
+        )
+
+
+async def make_code() -> str:
+    return await ReferralCodeService.generate_code(
+        1, datetime.now(timezone.utc) + timedelta(days=1)
+    )
+
+
+def main(referrals: list[int]):
+    import asyncio
+
+    print(
+        f"{'value':<28}{'coder':<14}{'encode':>14}{'decode':>16}{'bytes':>12}"
+    )
+    code = asyncio.run(make_code())
+    report("ReferralCodeReadDTO", ReferralCodeReadDTO(id=1, code=code))
+    for count in referrals:
+        value = ReferralsListDTO(
+            referrals=[
+                ReferralReadDTO(id=i, email=f"referral{i}@example.com")
+                for i in range(count)
+            ]
+        )
+        report(f"ReferralsListDTO[{count}]", value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--referrals", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    args = parser.parse_args()
+    main(args.referrals)
@@ -0,0 +1,110 @@
+"""Задержка посторонних запросов во время массового входа.
+
+Запуск (используется БД из .env, для MODE=TEST - тестовая БД):
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 50
+
+Приложение вызывается в процессе через httpx. Пока выполняются logins
+запросов POST /auth/login (не более concurrency одновременно), каждые
+10 мс отправляется GET /monitoring/db_pool, не использующий БД, и
+замеряется его задержка от запланированного момента. Варианты:
+
+- inline: хэш пароля проверяется в цикле событий, как до переноса в пул;
+- pool: проверка в пуле PasswordHasher (PASSWORD_HASH_*), при
+  заполнении очереди вход отклоняется с 503.
+
+Для входа создается временный пользователь, удаляемый по завершении.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+from httpx import AsyncClient
+
+from app.config import settings
+from app.crud.user_dao import UserDAO
+from app.main import app
+from app.services.password import get_password_hash, password_hasher
+
+EMAIL = "bench_login@example.com"
+PASSWORD = "bench_password"
+
+
+async def run_inline(func, *args):
+    return func(*args)
+
+
+async def probe(client: AsyncClient, stop: asyncio.Event) -> list[float]:
+    """Задержки запросов, отправляемых по расписанию каждые 10 мс.
+
+    Задержка отсчитывается от запланированного момента отправки, поэтому
+    включает и время, на которое цикл событий был занят.
+    """
+    latencies = []
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        scheduled += 0.01
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+        await client.get(settings.API_V1_PREFIX + "/monitoring/db_pool")
+        latencies.append(time.perf_counter() - scheduled)
+        scheduled = max(scheduled, time.perf_counter())
+    return latencies
+
+
+async def storm(client: AsyncClient, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> int:
+        async with semaphore:
+            response = await client.post(
+                settings.API_V1_PREFIX + "/auth/login",
+                data={"username": EMAIL, "password": PASSWORD},
+            )
+            return response.status_code
+
+    return Counter(await asyncio.gather(*(login() for _ in range(logins))))
+
+
+async def run(name: str, logins: int, concurrency: int):
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop))
+        started = time.perf_counter()
+        statuses = await storm(client, logins, concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        latencies = sorted(await probe_task)
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    print(
+        f"{name:<8}{logins / elapsed:10.1f}/s{p50 * 1e3:10.1f}ms"
+        f"{p99 * 1e3:10.1f}ms{latencies[-1] * 1e3:10.1f}ms   "
+        + ", ".join(f"{code}: {count}" for code, count in statuses.items())
+    )
+
+
+async def main(logins: int, concurrency: int):
+    user = await UserDAO.create(
+        email=EMAIL, hashed_password=get_password_hash(PASSWORD)
+    )
+    try:
+        print(f"{'mode':<8}{'logins':>12}{'p50':>12}{'p99':>12}{'max':>12}")
+        hasher_run = password_hasher.run
+        password_hasher.run = run_inline
+        await run("inline", logins, concurrency)
+        password_hasher.run = hasher_run
+        await run("pool", logins, concurrency)
+    finally:
+        password_hasher.shutdown()
+        await UserDAO.delete_(user.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency))
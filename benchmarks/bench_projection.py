@@ -0,0 +1,114 @@
+"""Сравнение чтения через ORM-сущности и через проекцию колонок.
+
+Запуск (используется БД из .env, для MODE=TEST - тестовая БД):
+
+    python -m benchmarks.bench_projection --iterations 500 --referrals 2000
+
+Для каждого варианта выводится процессорное время и пиковый объем
+выделенной памяти на один вызов. Рефералы для замеров создаются у
+временного пользователя и удаляются по завершении.
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from app.crud.referral_code_dao import ReferralCodeDAO
+from app.crud.user_dao import UserDAO
+from app.database import async_session_maker
+from app.schemas.auth import ReferralReadDTO, ReferralsListDTO
+from app.schemas.referral_code import ReferralCodeReadDTO
+
+
+async def measure(name, call, iterations, alloc_iterations=50):
+    await call()
+    cpu_started = time.process_time()
+    for _ in range(iterations):
+        await call()
+    cpu = (time.process_time() - cpu_started) / iterations
+
+    tracemalloc.start()
+    peak_total = 0
+    for _ in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await call()
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    peak = peak_total / alloc_iterations
+    print(
+        f"{name:<40} cpu {cpu * 1e6:10.1f} us   peak {peak / 1024:10.1f} KiB"
+    )
+
+
+async def main(iterations: int, referrals: int):
+    referrer = await UserDAO.create(
+        email="bench_referrer@example.com", hashed_password="x"
+    )
+    await ReferralCodeDAO.create(user_id=referrer.id, code="bench_code")
+    await UserDAO.create_list(
+        [
+            {
+                "email": f"bench_referral_{i}@example.com",
+                "hashed_password": "x",
+                "referrer_id": referrer.id,
+            }
+            for i in range(referrals)
+        ]
+    )
+    try:
+        async with async_session_maker() as session:
+
+            async def code_orm():
+                session.expunge_all()
+                obj = await ReferralCodeDAO.get_by_user_id(
+                    referrer.id, session
+                )
+                return ReferralCodeReadDTO.model_validate(obj)
+
+            async def code_projection():
+                session.expunge_all()
+                row = await ReferralCodeDAO.get_code_by_user_id(
+                    referrer.id, session
+                )
+                return ReferralCodeReadDTO.from_row(row)
+
+            async def referrals_orm():
+                session.expunge_all()
+                users = await UserDAO.get_all(session, referrer_id=referrer.id)
+                return ReferralsListDTO(referrals=users)
+
+            async def referrals_projection():
+                session.expunge_all()
+                rows = await UserDAO.get_referrals(referrer.id, session)
+                return ReferralsListDTO.model_construct(
+                    referrals=[ReferralReadDTO.from_row(row) for row in rows]
+                )
+
+            await measure("get_by_user_id: ORM", code_orm, iterations)
+            await measure(
+                "get_by_user_id: projection", code_projection, iterations
+            )
+            list_iterations = max(iterations // 10, 1)
+            await measure(
+                f"referrals ({referrals}): ORM", referrals_orm, list_iterations
+            )
+            await measure(
+                f"referrals ({referrals}): projection",
+                referrals_projection,
+                list_iterations,
+            )
+    finally:
+        # рефералы не удаляются каскадно вместе с реферером
+        for row in await UserDAO.get_referrals(referrer.id):
+            await UserDAO.delete_(row.id)
+        await UserDAO.delete_(referrer.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--referrals", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.referrals))
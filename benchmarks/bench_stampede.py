@@ -0,0 +1,96 @@
+"""Нагрузочный тест cache stampede для ReferralCodeService.get_by_user_id.
+
+Запуск (используются БД и Redis из .env):
+
+    python -m benchmarks.bench_stampede --workers 4 --concurrency 200
+
+Ключ кэша кода пользователя удаляется, после чего каждый из workers
+процессов одновременно выполняет concurrency вызовов. Выводится число
+SELECT к таблице referral_code по процессам: при объединении загрузок
+суммарно выполняется один запрос, без него - workers * concurrency.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from fastapi_cache import FastAPICache
+from sqlalchemy import event
+
+from app.common.constants import CacheKeys
+from app.database import engine
+from app.services.cache import delete_cached
+from app.services.redis_cache import init_redis_cache
+from app.services.referral_code import ReferralCodeService
+
+
+def count_queries() -> list[str]:
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if "FROM referral_code" in statement:
+            statements.append(statement)
+
+    return statements
+
+
+async def run_worker(user_id: int, concurrency: int, start_at: float):
+    backend = init_redis_cache()
+    statements = count_queries()
+    await asyncio.sleep(max(start_at - time.time(), 0))
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            ReferralCodeService.get_by_user_id(user_id)
+            for _ in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    await backend.stop()
+    await engine.dispose()
+    return len(statements), elapsed
+
+
+def worker(user_id: int, concurrency: int, start_at: float, results):
+    results.put(asyncio.run(run_worker(user_id, concurrency, start_at)))
+
+
+async def reset_key(user_id: int):
+    backend = init_redis_cache()
+    await delete_cached(
+        CacheKeys.REFERRAL_CODE_BY_USER_ID.format(user_id=user_id)
+    )
+    await backend.stop()
+    FastAPICache.reset()
+
+
+def main(user_id: int, workers: int, concurrency: int):
+    asyncio.run(reset_key(user_id))
+    results = multiprocessing.Queue()
+    start_at = time.time() + 2
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(user_id, concurrency, start_at, results)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    stats = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    for number, (queries, elapsed) in enumerate(stats):
+        print(f"worker {number}: {queries} queries, {elapsed * 1e3:.1f} ms")
+    total = sum(queries for queries, _ in stats)
+    print(f"total: {total} queries for {workers * concurrency} calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    main(args.user_id, args.workers, args.concurrency)
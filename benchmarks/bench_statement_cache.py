@@ -0,0 +1,125 @@
+"""Накладные расходы Python на подготовку SQL для частых DAO-запросов.
+
+Запуск (подключение к БД не требуется):
+
+    python -m benchmarks.bench_statement_cache --iterations 20000
+
+Для каждого запроса сравниваются два варианта:
+
+- build: конструкция select(...).filter_by(...).options(...) строится
+  заново при каждом вызове, как было в DAO до перехода на готовые
+  запросы;
+- prebuilt: готовый запрос из модуля DAO с параметрами через bindparam.
+
+Замеряется время построения конструкции, вычисления ключа кэша и
+получения скомпилированного SQL из кэша компиляции (то же, что делает
+Connection.execute). Для справки выводится время полной компиляции без
+кэша (query_cache_size=0).
+"""
+
+import argparse
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.util import LRUCache
+
+from app.crud import referral_code_dao, user_dao
+from app.models.referral_code import ReferralCode
+from app.models.user import User
+
+QUERIES = {
+    "UserDAO.get_by_id": (
+        lambda: select(User)
+        .filter_by(id=1)
+        .options(joinedload(User.referrer))
+        .options(joinedload(User.referral_code))
+        .options(selectinload(User.referrals)),
+        user_dao.USER_BY_ID_QUERY,
+    ),
+    "UserDAO.get_by_email": (
+        lambda: select(User).filter_by(email="user@example.com"),
+        user_dao.USER_BY_EMAIL_QUERY,
+    ),
+    "UserDAO.get_principal": (
+        lambda: select(User.id, User.email).filter_by(id=1),
+        user_dao.USER_PRINCIPAL_QUERY,
+    ),
+    "UserDAO.get_referrals_page": (
+        lambda: select(User.id, User.email)
+        .where(User.referrer_id == 1)
+        .order_by(User.id)
+        .limit(100)
+        .where(User.id > 100),
+        user_dao.REFERRALS_PAGE_QUERY,
+    ),
+    "UserDAO.count_referrals": (
+        lambda: select(func.count()).where(User.referrer_id == 1),
+        user_dao.REFERRALS_COUNT_QUERY,
+    ),
+    "ReferralCodeDAO.get_by_user_id": (
+        lambda: select(ReferralCode)
+        .filter_by(user_id=1)
+        .options(joinedload(ReferralCode.user)),
+        referral_code_dao.REFERRAL_CODE_BY_USER_ID_QUERY,
+    ),
+    "ReferralCodeDAO.get_code_by_user_id": (
+        lambda: select(ReferralCode.id, ReferralCode.code).filter_by(
+            user_id=1
+        ),
+        referral_code_dao.CODE_BY_USER_ID_QUERY,
+    ),
+    "ReferralCodeDAO.get_code_by_user_email": (
+        lambda: select(ReferralCode.id, ReferralCode.code)
+        .join(User, User.id == ReferralCode.user_id)
+        .where(User.email == "user@example.com"),
+        referral_code_dao.CODE_BY_USER_EMAIL_QUERY,
+    ),
+}
+
+
+def compile_cached(statement, dialect, cache):
+    compiled, _, _ = statement._compile_w_cache(
+        dialect, compiled_cache=cache, column_keys=[]
+    )
+    return compiled
+
+
+def measure(call, iterations: int) -> float:
+    call()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - started) / iterations
+
+
+def main(iterations: int):
+    dialect = asyncpg_dialect()
+    cache = LRUCache(500)
+    print(
+        f"{'query':<40}{'build':>12}{'prebuilt':>12}"
+        f"{'speedup':>10}{'no cache':>12}"
+    )
+    for name, (build, prebuilt) in QUERIES.items():
+        before = measure(
+            lambda: compile_cached(build(), dialect, cache), iterations
+        )
+        after = measure(
+            lambda: compile_cached(prebuilt, dialect, cache), iterations
+        )
+        uncached = measure(
+            lambda: compile_cached(prebuilt, dialect, None),
+            max(iterations // 20, 1),
+        )
+        print(
+            f"{name:<40}{before * 1e6:10.1f}us{after * 1e6:10.1f}us"
+            f"{before / after:9.1f}x{uncached * 1e6:10.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
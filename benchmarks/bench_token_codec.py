@@ -0,0 +1,57 @@
+"""Сравнение реализаций JWT (TOKEN_CODEC).
+
+Запуск (подключение к БД и Redis не требуется):
+
+    python -m benchmarks.bench_token_codec
+
+Для каждой реализации выводятся время выпуска токена доступа и его
+проверки, а также число проверок в секунду. Перед замером проверяется,
+что токены каждой реализации принимаются всеми остальными.
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.services.token_codec import TOKEN_CODECS, create_token_codec
+
+
+def measure(call, min_time: float = 0.5) -> float:
+    call()
+    iterations = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_time:
+        call()
+        iterations += 1
+    return (time.perf_counter() - started) / iterations
+
+
+def main(min_time: float):
+    codecs = {
+        name: create_token_codec(name, settings.SECRET_KEY, settings.ALGORITHM)
+        for name in TOKEN_CODECS
+    }
+    expire = datetime.now(timezone.utc) + timedelta(hours=1)
+    payload = {"sub": "1", "exp": expire}
+    for name, codec in codecs.items():
+        token = codec.encode(payload)
+        for other in codecs.values():
+            assert other.decode(token) == codec.decode(token)
+
+    print(f"{'codec':<8}{'encode':>12}{'decode':>14}{'decode/s':>14}")
+    for name, codec in codecs.items():
+        token = codec.encode(payload)
+        encode_time = measure(lambda: codec.encode(payload), min_time)
+        decode_time = measure(lambda: codec.decode(token), min_time)
+        print(
+            f"{name:<8}{encode_time * 1e6:10.1f}us{decode_time * 1e6:12.1f}us"
+            f"{1 / decode_time:14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args()
+    main(args.min_time)